@@ -21,13 +21,13 @@ def initialize_core_imports():
 
 def initialize_full_imports():
     print(f"{LIGHT_BLUE} 🕰️  Initializing full imports...{RESET_COLOR}")
-    global tiktoken, stream_response, handle_user_menu, build_prompt
+    global get_model_encoding, stream_response, handle_user_menu, build_prompt
     global create_litellm_client, calculate_token_count
     global initialize_token_counter, get_token_counts, add_initial_image_tokens, add_image_tokens, print_token_counts
     global check_cost_exceeds_maximum, print_configuration, print_tokens, calculate_image_token_cost
 
     print(f"{LIGHT_BLUE} 🕰️  Loading tiktoken...{RESET_COLOR}")
-    import tiktoken
+    from lib.tokenization import get_model_encoding
 
     print(f"{LIGHT_BLUE} 🕰️  Loading stream_response...{RESET_COLOR}")
     from lib.streaming_response import stream_response
@@ -63,14 +63,7 @@ def initialize_full_imports():
 
 def initialize_encoding(args):
     print(f"{LIGHT_BLUE} 🕰️  Initializing encodings...{RESET_COLOR}")
-    try:
-        encoding = tiktoken.encoding_for_model(args.model.split("/")[-1])
-    except Exception as e:
-        print(
-            f"{LIGHT_BLUE} 💁‍♀️ Defaulting to 'cl100k_base' - no model-specific encoding for {args.model}.{RESET_COLOR}"
-        )
-        encoding = tiktoken.get_encoding("cl100k_base")
-    args.encoding = encoding
+    args.encoding = get_model_encoding(args.model)
 
 
 def handle_models_flag(args):
@@ -83,6 +76,17 @@ def handle_models_flag(args):
     return True
 
 
+def handle_compact_embeddings_cache_flag(args):
+    print(f"{LIGHT_BLUE} 🕰️  Compacting embeddings cache...{RESET_COLOR}")
+    from lib.embedding_util import compact_embeddings_cache
+    imported, size = compact_embeddings_cache(args.dir, args.embedding_cache_size * 1024 * 1024)
+    print(
+        f"{LIGHT_ORANGE}Embeddings cache compacted: {imported:,} legacy files packed, "
+        f"{size / (1024 * 1024):,.1f} MB cached.{RESET_COLOR}"
+    )
+    return True
+
+
 def get_requirements(args):
     initialize_core_imports()
     if args.requirements:
@@ -132,7 +136,7 @@ def process_requirements(args, requirements):
         total_image_tokens = 0
         for image_path in args.images:
             image_tokens = calculate_image_token_cost(
-                image_path, args.encoding
+                image_path, args.model
             )
             total_image_tokens += image_tokens
             print(
@@ -215,6 +219,10 @@ def main():
     if args.models is not None:
         return handle_models_flag(args)
 
+    # Handle --compact-embeddings-cache flag
+    if args.compact_embeddings_cache:
+        return handle_compact_embeddings_cache_flag(args)
+
     # Get requirements
     requirements = get_requirements(args)
 
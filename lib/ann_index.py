@@ -0,0 +1,200 @@
+"""
+This module provides approximate nearest-neighbour search over a matrix of embedding vectors,
+for codebases with too many chunks to score every one against each query.
+
+The index is an inverted file (IVF): spherical k-means splits the vectors into lists around
+centroids, and a query scores only the vectors of the lists whose centroids are most similar to
+it. Those candidates are then scored exactly against their full vectors, so the results are the
+true top matches among the candidates and only recall is traded for speed. The number of lists
+probed is the knob: more probes find more of the true top matches, and slower.
+
+New vectors are assigned to the nearest existing centroid as the codebase changes, and the
+centroids are only trained again once the number of vectors has doubled or halved.
+
+Classes:
+    IVFIndex: An inverted file index of vectors grouped by their nearest centroid.
+
+Constants:
+    ANN_PROBES: Default number of lists probed per query.
+    KMEANS_ITERATIONS: Number of k-means iterations when training centroids.
+"""
+import math
+import os
+
+import numpy as np
+
+from lib.vector_search import normalize_rows, top_k
+
+ANN_PROBES = 32
+
+KMEANS_ITERATIONS = 10
+
+# Vectors sampled per list to train the centroids
+TRAINING_SAMPLES_PER_LIST = 64
+
+# Vectors scored against the centroids at once, bounding the memory of a score block
+ASSIGN_BLOCK_ROWS = 65536
+
+
+class IVFIndex:
+    """
+    An inverted file index of L2-normalised vectors grouped by their nearest centroid.
+
+    Attributes:
+        centroids (numpy.ndarray): The float32 matrix of L2-normalised centroids, one row per
+            list.
+        assignments (numpy.ndarray): The list of each indexed vector, by row.
+        trained_rows (int): Number of vectors when the centroids were trained.
+    """
+    def __init__(self, centroids, assignments, trained_rows):
+        self.centroids = centroids
+        self.assignments = assignments
+        self.trained_rows = trained_rows
+
+    @classmethod
+    def train(cls, vectors, lists=None, iterations=KMEANS_ITERATIONS, seed=0):
+        """
+        Train centroids on a sample of the vectors with spherical k-means and index every vector.
+
+        Args:
+            vectors (numpy.ndarray): A matrix of L2-normalised row vectors.
+            lists (int, optional): Number of lists. Defaults to the square root of the number
+                of vectors.
+            iterations (int, optional): Number of k-means iterations. Defaults to
+                KMEANS_ITERATIONS.
+            seed (int, optional): Seed of the random sampling, so training is repeatable.
+                Defaults to 0.
+
+        Returns:
+            IVFIndex: The index.
+        """
+        row_count = vectors.shape[0]
+        if lists is None:
+            lists = int(math.sqrt(row_count))
+        lists = max(1, min(lists, row_count))
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(row_count, lists * TRAINING_SAMPLES_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(row_count, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, lists, replace=False)]
+
+        for _ in range(iterations):
+            labels = _nearest(centroids, sample)
+            counts = np.bincount(labels, minlength=lists)
+            sums = np.zeros_like(centroids)
+            order = np.argsort(labels, kind="stable")
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            filled = counts > 0
+            sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            # Lists left empty restart from random sample vectors
+            empty = np.flatnonzero(counts == 0)
+            sums[empty] = sample[rng.choice(sample_size, len(empty))]
+            centroids = normalize_rows(sums)
+
+        return cls(centroids, _nearest(centroids, vectors), row_count)
+
+    def needs_training(self, row_count):
+        """
+        Check whether the centroids should be trained again for a number of vectors.
+
+        Args:
+            row_count (int): The number of vectors.
+
+        Returns:
+            bool: True if the number of vectors has doubled or halved since training.
+        """
+        return row_count > 2 * self.trained_rows or 2 * row_count < self.trained_rows
+
+    def update(self, kept_rows, new_vectors):
+        """
+        Get the index of a matrix made of some rows of the indexed one followed by new vectors,
+        keeping the trained centroids.
+
+        Args:
+            kept_rows (list): The rows of the indexed matrix that are kept, in their new order.
+            new_vectors (numpy.ndarray): The L2-normalised vectors appended after them.
+
+        Returns:
+            IVFIndex: The index of the new matrix.
+        """
+        assignments = [self.assignments[np.asarray(kept_rows, dtype=np.int64)]]
+        if len(new_vectors):
+            assignments.append(_nearest(self.centroids, new_vectors))
+        return IVFIndex(self.centroids, np.concatenate(assignments), self.trained_rows)
+
+    def search(self, vectors, query_vector, k, probes=ANN_PROBES, min_score=None):
+        """
+        Find the rows of the indexed matrix most similar to a query, scoring only the rows in
+        the lists whose centroids are most similar to it.
+
+        More lists than probes are scored when those hold fewer than k rows.
+
+        Args:
+            vectors (numpy.ndarray): The indexed matrix of L2-normalised row vectors.
+            query_vector (list): The query's embedding, which need not be normalised.
+            k (int): Maximum number of rows to return.
+            probes (int, optional): Number of lists to score. Defaults to ANN_PROBES.
+            min_score (float, optional): Rows scoring below this similarity are skipped.
+                Defaults to None.
+
+        Returns:
+            tuple: Arrays of the selected row numbers and their scores, most similar first.
+        """
+        if vectors.shape[0] == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32)[np.newaxis, :])[0]
+        order = np.argsort(-(self.centroids @ query), kind="stable")
+        sizes = np.cumsum(np.bincount(self.assignments, minlength=len(self.centroids))[order])
+        probe_count = max(probes, int(np.searchsorted(sizes, k)) + 1)
+
+        probed = np.zeros(len(self.centroids), dtype=bool)
+        probed[order[:probe_count]] = True
+        candidates = np.flatnonzero(probed[self.assignments])
+        rows, scores = top_k(np.asarray(vectors[candidates]), query, k, min_score)
+        return candidates[rows], scores
+
+    def save(self, path):
+        """
+        Write the index to a .npz file, replacing the previous one atomically.
+
+        Args:
+            path (str): The file path.
+        """
+        with open(f"{path}.tmp", "wb") as index_file:
+            np.savez(
+                index_file,
+                centroids=self.centroids,
+                assignments=self.assignments,
+                trained_rows=np.int64(self.trained_rows),
+            )
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index written by save.
+
+        Args:
+            path (str): The file path.
+
+        Returns:
+            IVFIndex: The index, or None if the file is missing or corrupt.
+        """
+        try:
+            with np.load(path) as index_file:
+                return cls(
+                    index_file["centroids"],
+                    index_file["assignments"],
+                    int(index_file["trained_rows"]),
+                )
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def _nearest(centroids, vectors):
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK_ROWS])
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
@@ -7,9 +7,17 @@ ARG_KEYS = [
     "dir",
     "auto-write",
     "focused",
+    "focused-min-score",
+    "retrieval",
+    "focused-context",
     "model",
     "max-tokens",
     "model-embedding",
+    "embedding-batch-tokens",
+    "embedding-concurrency",
+    "embedding-cache-size",
+    "ann-threshold",
+    "ann-probes",
     "mode",
     "ignore",
     "resources",
@@ -17,7 +25,9 @@ ARG_KEYS = [
     "models",
     "max-estimated-cost",
     "max-file-size",
+    "scan-workers",
     "images",
+    "downscale-images",
     "temperature",
 ]
 
@@ -52,7 +62,30 @@ def parse_arguments():
         "--focused",
         type=int,
         default=0,
-        help="Enable focused mode to limit file context provided based on relevancy using embeddings - accepts an integer containing number of file chunks to limit context to.",
+        help="Enable focused mode to limit file context provided based on relevancy using embeddings - accepts an integer containing number of file chunks to limit context to. Chunks are grouped by file, so at most that many files are included.",
+        action=ProvidedAction,
+    )
+    parser.add_argument(
+        "--focused-min-score",
+        type=float,
+        default=None,
+        help="Minimum similarity score (-1 to 1) for a file chunk to be included in focused mode.",
+        action=ProvidedAction,
+    )
+    parser.add_argument(
+        "--retrieval",
+        type=str,
+        default="embedding",
+        choices=["embedding", "bm25", "hybrid"],
+        help='How focused mode ranks file chunks: "embedding" for similarity using the embedding model, "bm25" for local keyword search with no network requests, or "hybrid" to combine both.',
+        action=ProvidedAction,
+    )
+    parser.add_argument(
+        "--focused-context",
+        type=str,
+        default="file",
+        choices=["file", "chunk"],
+        help='What focused mode sends for each relevant file: "file" for the whole file, or "chunk" for only the matching chunks and a few surrounding lines. Chunk context only applies in question mode, since implementation responses replace whole files.',
         action=ProvidedAction,
     )
     parser.add_argument(
@@ -76,6 +109,47 @@ def parse_arguments():
         help="LLM provider/model to use for embeddings with LiteLLM, default to openai/text-embedding-3-small.",
         action=ProvidedAction,
     )
+    parser.add_argument(
+        "--embedding-batch-tokens",
+        type=int,
+        default=100000,
+        help="Maximum number of tokens sent in one embedding request when indexing the codebase for focused mode.",
+        action=ProvidedAction,
+    )
+    parser.add_argument(
+        "--embedding-concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of embedding requests in flight at once when indexing the codebase for focused mode.",
+        action=ProvidedAction,
+    )
+    parser.add_argument(
+        "--embedding-cache-size",
+        type=int,
+        default=512,
+        help="Maximum size in MB of the embeddings cache; the least recently used embeddings are evicted beyond it.",
+        action=ProvidedAction,
+    )
+    parser.add_argument(
+        "--ann-threshold",
+        type=int,
+        default=200000,
+        help="Number of file chunks from which focused mode searches embeddings approximately with an IVF index instead of scoring every chunk, 0 to always search exactly.",
+        action=ProvidedAction,
+    )
+    parser.add_argument(
+        "--ann-probes",
+        type=int,
+        default=32,
+        help="Number of IVF lists scored per approximate embedding search; higher finds more of the exact results, and is slower.",
+        action=ProvidedAction,
+    )
+    parser.add_argument(
+        "--compact-embeddings-cache",
+        action="store_true",
+        help="Compact the embeddings cache of the working directory, packing any older per-chunk cache files into it, then exit.",
+        default=False,
+    )
     parser.add_argument(
         "--mode",
         type=str,
@@ -112,6 +186,12 @@ def parse_arguments():
         help="List of image file paths to include in the prompt context",
         action=ProvidedAction,
     )
+    parser.add_argument(
+        "--downscale-images",
+        action="store_true",
+        help="Downscale images larger than the model's provider uses before sending them, to cut upload size. Requires Pillow.",
+        default=False,
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
@@ -139,6 +219,13 @@ def parse_arguments():
         help="Maximum file size in bytes for files to be included in the prompt.",
         action=ProvidedAction,
     )
+    parser.add_argument(
+        "--scan-workers",
+        type=int,
+        default=8,
+        help="Number of threads used to filter and read files while scanning the codebase, 1 to scan serially.",
+        action=ProvidedAction,
+    )
     parser.add_argument(
         "--temperature",
         type=float,
@@ -162,6 +249,24 @@ def parse_arguments():
             "max-estimated-cost must be a non-negative number with at most two decimal places"
         )
 
+    if cli_args.scan_workers < 1:
+        parser.error("scan-workers must be at least 1")
+
+    if cli_args.embedding_batch_tokens < 1:
+        parser.error("embedding-batch-tokens must be at least 1")
+
+    if cli_args.embedding_concurrency < 1:
+        parser.error("embedding-concurrency must be at least 1")
+
+    if cli_args.embedding_cache_size < 1:
+        parser.error("embedding-cache-size must be at least 1")
+
+    if cli_args.ann_threshold < 0:
+        parser.error("ann-threshold must not be negative")
+
+    if cli_args.ann_probes < 1:
+        parser.error("ann-probes must be at least 1")
+
     # First check for the global configuration file
     global_config_path = os.path.expanduser("~/.config/arcodeconf.yml")
 
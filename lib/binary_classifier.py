@@ -0,0 +1,183 @@
+"""
+This module decides whether files found while scanning a codebase are binary.
+
+Classification runs through a series of increasingly expensive checks: the file extension, a
+verdict cached for the file's current size and modification time, a sniff of the first few
+kilobytes for NUL bytes and valid UTF-8, and only when the sniff is inconclusive a libmagic MIME
+lookup. A single libmagic handle is shared by the whole process.
+
+Classes:
+    BinaryClassifier: Classifies files as binary or text and counts how each verdict was reached.
+
+Constants:
+    SNIFF_BYTES: Number of leading bytes read when sniffing a file's content.
+    EXCLUDED_MIME_TYPES: MIME types that libmagic reports as application/* but are text.
+"""
+import codecs
+import os
+import threading
+from collections import Counter
+
+import magic
+
+from lib.constants import binary_extensions
+
+SNIFF_BYTES = 8192
+
+EXCLUDED_MIME_TYPES = [
+    "application/xhtml+xml",
+    "application/xml",
+    "application/json",
+    "application/javascript",
+]
+
+# Text encodings whose byte streams legitimately contain NUL bytes
+WIDE_TEXT_BOMS = (
+    codecs.BOM_UTF32_BE,
+    codecs.BOM_UTF16_LE,
+    codecs.BOM_UTF16_BE,
+)
+
+
+class BinaryClassifier:
+    """
+    Classifies files as binary or text.
+
+    Attributes:
+        cache (dict): Verdicts keyed by file path, each stored with the size and modification
+            time the verdict was made for.
+        stats (Counter): Number of verdicts reached by each decision path since the stats were
+            last reset - "extension", "cache", "sniff" and "magic", plus "manifest" for verdicts
+            reused from the file manifest without consulting the classifier.
+    """
+    def __init__(self):
+        self.cache = {}
+        self.stats = Counter()
+        self._magic = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """
+        Drop cached verdicts, decision counts and the shared libmagic handle.
+        """
+        with self._lock:
+            self.cache = {}
+            self.stats = Counter()
+            self._magic = None
+
+    def reset_stats(self):
+        """
+        Reset the decision counts, keeping cached verdicts, so the counts cover a single scan.
+        """
+        with self._lock:
+            self.stats = Counter()
+
+    def is_binary(self, filename, stat_result=None):
+        """
+        Check if a given file is binary.
+
+        Args:
+            filename (str): The filename to check.
+            stat_result (os.stat_result, optional): The file's stat result when the caller
+                already has one, e.g. from a directory listing. Defaults to None.
+
+        Returns:
+            bool: True if the file is binary, False otherwise.
+        """
+        if os.path.splitext(filename)[1].lower() in binary_extensions:
+            self.count_decision("extension")
+            return True
+
+        if stat_result is None:
+            try:
+                stat_result = os.stat(filename)
+            except OSError:
+                stat_result = None
+
+        if stat_result is None:
+            # Nothing to key a cached verdict on, or to sniff - defer to libmagic
+            self.count_decision("magic")
+            return self._is_binary_mime(filename)
+
+        key = (stat_result.st_size, stat_result.st_mtime_ns)
+        cached = self.cache.get(filename)
+        if cached is not None and cached[0] == key:
+            self.count_decision("cache")
+            return cached[1]
+
+        verdict = self._sniff(filename)
+        if verdict is None:
+            self.count_decision("magic")
+            verdict = self._is_binary_mime(filename)
+        else:
+            self.count_decision("sniff")
+
+        self.cache[filename] = (key, verdict)
+        return verdict
+
+    def get_stats(self):
+        """
+        Get the number of verdicts reached by each decision path.
+
+        Returns:
+            dict: Counts keyed by decision path.
+        """
+        with self._lock:
+            return dict(self.stats)
+
+    def count_decision(self, decision):
+        """
+        Count a verdict reached by a decision path.
+
+        Args:
+            decision (str): The decision path, e.g. "manifest" for a verdict reused from the file
+                manifest.
+        """
+        with self._lock:
+            self.stats[decision] += 1
+
+    def _sniff(self, filename):
+        """
+        Classify a file from its first SNIFF_BYTES bytes.
+
+        Returns:
+            bool: True if the content is binary, False if it is UTF-8 text, or None when the
+                  sniff is inconclusive.
+        """
+        try:
+            with open(filename, "rb") as file:
+                head = file.read(SNIFF_BYTES)
+        except OSError:
+            return None
+
+        if head.startswith(WIDE_TEXT_BOMS):
+            return None
+        if b"\x00" in head:
+            return True
+
+        # A full read may cut a multi-byte character in half, so only a short
+        # read is decoded as final
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        try:
+            decoder.decode(head, final=len(head) < SNIFF_BYTES)
+        except UnicodeDecodeError:
+            return None
+        return False
+
+    def _is_binary_mime(self, filename):
+        with self._lock:
+            if self._magic is None:
+                self._magic = magic.Magic(mime=True)
+            mime_type = self._magic.from_file(filename)
+
+        # Exclude specific MIME types that should not be considered binary
+        if mime_type in EXCLUDED_MIME_TYPES:
+            return False
+
+        return ('application/' in mime_type or
+                'image/' in mime_type or
+                'audio/' in mime_type or
+                'video/' in mime_type)
+
+
+binary_classifier = BinaryClassifier()
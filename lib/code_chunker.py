@@ -0,0 +1,281 @@
+"""
+This module splits file contents into chunks for retrieval.
+
+Code is split along its structure: Python files at the top-level statements, functions and
+classes found by the ast module, and other files at unindented blocks delimited by blank lines
+and braces. Each chunk stays within a token budget; small neighbouring blocks are merged and
+blocks over the budget are split further, down to content-defined line boundaries. Those
+boundaries are chosen from the content of the lines around them rather than from running
+character counts, so editing one part of a file leaves the chunks elsewhere in the file - and
+their cached embeddings - unchanged.
+
+Classes:
+    Chunk: A chunk of a file with the range of lines it spans.
+
+Functions:
+    chunk_code: Splits a file's contents into chunks along its syntax.
+    split_into_chunks: Splits text into chunks at content-defined line boundaries.
+    estimate_tokens: Estimates the number of tokens in a text.
+
+Constants:
+    MAX_CHUNK_TOKENS: Token budget of a chunk.
+    MIN_CHUNK_TOKENS: Size below which neighbouring blocks are merged into one chunk.
+    MAX_CHUNK_CHARS: Maximum number of characters in a content-defined chunk.
+    MIN_CHUNK_CHARS: Number of characters a content-defined chunk holds before it may end at a
+        boundary line.
+"""
+import ast
+import io
+import os
+import zlib
+from collections import namedtuple
+
+MAX_CHUNK_TOKENS = 600
+MIN_CHUNK_TOKENS = 100
+
+MAX_CHUNK_CHARS = 2500
+MIN_CHUNK_CHARS = 256
+
+# Roughly one in BOUNDARY_MODULUS lines is a boundary
+BOUNDARY_MODULUS = 24
+
+# Rough number of characters per token of source code
+CHARS_PER_TOKEN = 4
+
+Chunk = namedtuple("Chunk", ["text", "start_line", "end_line"])
+Chunk.__doc__ = """
+A chunk of a file.
+
+Attributes:
+    text (str): The chunk text.
+    start_line (int): The 1-based number of the first line of the chunk.
+    end_line (int): The 1-based number of the last line of the chunk.
+"""
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens in a text, without running a tokenizer.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _is_boundary(previous_line, line):
+    # Hashing each line together with the one before it keeps common lines such as blank lines
+    # and closing braces from all being boundaries
+    context = f"{previous_line.strip()}\n{line.strip()}"
+    return zlib.crc32(context.encode("utf-8")) % BOUNDARY_MODULUS == 0
+
+
+def _content_defined_chunks(lines, first_line, max_chars, min_chars):
+    """
+    Split lines into chunks at content-defined boundaries.
+
+    Args:
+        lines (list): The lines, with line endings.
+        first_line (int): The 1-based number of the first line.
+        max_chars (int): Maximum number of characters in a chunk.
+        min_chars (int): Number of characters a chunk holds before it may end at a boundary line.
+
+    Returns:
+        list: The non-blank chunks, as Chunk tuples.
+    """
+    chunks = []
+    current = []
+    start_line = first_line
+    size = 0
+
+    def flush(end_line):
+        chunk = "".join(current)
+        if chunk.strip():
+            chunks.append(Chunk(chunk, start_line, end_line))
+        current.clear()
+
+    previous_line = ""
+    for line_number, line in enumerate(lines, first_line):
+        while len(line) > max_chars:
+            if current:
+                flush(line_number - 1)
+            current.append(line[:max_chars])
+            start_line = line_number
+            flush(line_number)
+            line = line[max_chars:]
+            size = 0
+        if size + len(line) > max_chars:
+            flush(line_number - 1)
+            size = 0
+        if not current:
+            start_line = line_number
+        current.append(line)
+        size += len(line)
+        if size >= min_chars and _is_boundary(previous_line, line):
+            flush(line_number)
+            size = 0
+        previous_line = line
+
+    flush(first_line + len(lines) - 1)
+    return chunks
+
+
+def split_into_chunks(text, max_chars=MAX_CHUNK_CHARS, min_chars=MIN_CHUNK_CHARS):
+    """
+    Split text into chunks at content-defined line boundaries.
+
+    A chunk ends after a line picked as a boundary by hashing it with the line before it, once it
+    holds at least min_chars characters, and always before it would exceed max_chars. Because
+    boundaries depend only on nearby lines, chunking resynchronises shortly after an edit. Lines
+    longer than max_chars are split on their own.
+
+    Args:
+        text (str): The text to split.
+        max_chars (int, optional): Maximum number of characters in a chunk. Defaults to
+            MAX_CHUNK_CHARS.
+        min_chars (int, optional): Number of characters a chunk holds before it may end at a
+            boundary line. Defaults to MIN_CHUNK_CHARS.
+
+    Returns:
+        list: The non-blank chunks, which joined together reproduce the non-blank text.
+    """
+    return [
+        chunk.text
+        for chunk in _content_defined_chunks(text.splitlines(keepends=True), 1, max_chars, min_chars)
+    ]
+
+
+def _python_segments(text, lines, max_tokens):
+    """
+    Split Python source into the line ranges of its top-level statements, descending into
+    classes over max_tokens.
+
+    Returns:
+        list: (start, end) line ranges covering every line, or None if the source does not parse.
+    """
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+
+    def node_start(node):
+        decorators = getattr(node, "decorator_list", [])
+        return min([node.lineno] + [decorator.lineno for decorator in decorators])
+
+    def segments_of(body, first, last):
+        # Lines between statements (comments, blank lines) belong to the statement that follows
+        segments = []
+        start = first
+        for node in body:
+            end = node.end_lineno
+            if (
+                isinstance(node, ast.ClassDef)
+                and node.body
+                and estimate_tokens("".join(lines[start - 1:end])) > max_tokens
+            ):
+                header_end = node_start(node.body[0]) - 1
+                segments.append((start, header_end))
+                segments.extend(segments_of(node.body, header_end + 1, end))
+            else:
+                segments.append((start, end))
+            start = end + 1
+        if start <= last:
+            if segments:
+                segments[-1] = (segments[-1][0], last)
+            else:
+                segments.append((start, last))
+        return segments
+
+    return segments_of(tree.body, 1, len(lines))
+
+
+def _block_segments(lines):
+    """
+    Split source in other languages into the line ranges of its unindented blocks.
+
+    A block starts at an unindented line outside any braces that follows a blank line or the end
+    of a previous block.
+
+    Returns:
+        list: (start, end) line ranges covering every line.
+    """
+    segments = []
+    start = 1
+    depth = 0
+    previous_closed = False
+    for line_number, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if (
+            line_number > start
+            and depth == 0
+            and stripped
+            and not line[0].isspace()
+            and not stripped.startswith(("}", ")", "]"))
+            and previous_closed
+        ):
+            segments.append((start, line_number - 1))
+            start = line_number
+        depth = max(0, depth + line.count("{") + line.count("(") + line.count("[")
+                    - line.count("}") - line.count(")") - line.count("]"))
+        previous_closed = not stripped or (depth == 0 and stripped.endswith(("}", ";", ")", "]", "end")))
+    if start <= len(lines):
+        segments.append((start, len(lines)))
+    return segments
+
+
+def chunk_code(path, text, max_tokens=MAX_CHUNK_TOKENS, min_tokens=MIN_CHUNK_TOKENS):
+    """
+    Split a file's contents into chunks along its syntax.
+
+    Python files are split at the statements the ast module finds, and other files at
+    unindented blocks. Neighbouring blocks are merged while the chunk is under min_tokens, and
+    blocks over max_tokens are split at content-defined line boundaries.
+
+    Args:
+        path (str): The file path, whose extension selects how the contents are parsed.
+        text (str): The file contents.
+        max_tokens (int, optional): Token budget of a chunk. Defaults to MAX_CHUNK_TOKENS.
+        min_tokens (int, optional): Size below which neighbouring blocks are merged. Defaults
+            to MIN_CHUNK_TOKENS.
+
+    Returns:
+        list: The non-blank chunks in file order, as Chunk tuples.
+    """
+    # Only newlines end lines, as for the ast module's line numbers; splitlines would also split
+    # at form feeds and other separators
+    lines = io.StringIO(text).readlines()
+    segments = None
+    if os.path.splitext(path)[1].lower() in (".py", ".pyi"):
+        segments = _python_segments(text, lines, max_tokens)
+    if segments is None:
+        segments = _block_segments(lines)
+
+    chunks = []
+    pending = None
+    for start, end in segments:
+        segment = "".join(lines[start - 1:end])
+        tokens = estimate_tokens(segment)
+        if pending is not None:
+            pending_tokens = estimate_tokens(pending.text)
+            if pending_tokens < min_tokens and pending_tokens + tokens <= max_tokens:
+                pending = Chunk(pending.text + segment, pending.start_line, end)
+                continue
+            chunks.append(pending)
+            pending = None
+
+        if tokens > max_tokens:
+            chunks.extend(_content_defined_chunks(
+                lines[start - 1:end],
+                start,
+                max_tokens * CHARS_PER_TOKEN,
+                MIN_CHUNK_CHARS,
+            ))
+        else:
+            pending = Chunk(segment, start, end)
+    if pending is not None:
+        chunks.append(pending)
+
+    return [chunk for chunk in chunks if chunk.text.strip()]
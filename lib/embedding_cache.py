@@ -0,0 +1,251 @@
+"""
+This module provides a packed, size-bounded store for cached embeddings.
+
+Embeddings used to be cached one file per chunk beneath the embeddings cache directory, which
+grew into hundreds of thousands of small files that were never cleaned up and were slow to read
+back. The store instead keeps every entry in one SQLite file, looks up a whole batch of keys in
+one query, and records when each entry was last used so that, once the store grows past its
+maximum size, the least recently used entries are evicted first.
+
+Classes:
+    EmbeddingCache: A byte store for embeddings packed into a single SQLite file.
+
+Functions:
+    get_embedding_cache: Gets the embedding cache of a codebase.
+
+Constants:
+    EMBEDDING_CACHE_FILENAME: Name of the cache file within the embeddings cache directory.
+    EMBEDDING_CACHE_MAX_BYTES: Default maximum size of the cached entries.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.stores import ByteStore
+
+EMBEDDING_CACHE_FILENAME = "embeddings.sqlite3"
+
+EMBEDDING_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Keys looked up or deleted per query, below SQLite's limit on bound parameters
+QUERY_BATCH_SIZE = 500
+
+# Directory of the embeddings cache directory holding the search indexes, not cache entries
+INDEX_DIRECTORY = "index"
+
+
+class EmbeddingCache(ByteStore):
+    """
+    A byte store for embeddings packed into a single SQLite file, evicting the least recently
+    used entries once their total size exceeds a maximum.
+
+    Attributes:
+        path (str): The SQLite file the entries are stored in.
+        max_bytes (int): Maximum total size of the entries' values, or None for no limit.
+    """
+    def __init__(self, path, max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            """
+        )
+        self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    @property
+    def size(self):
+        """
+        int: Total size of the entries' values in bytes.
+        """
+        return self._size
+
+    def mget(self, keys):
+        """
+        Get the values of keys, marking the entries found as used.
+
+        Args:
+            keys (list): The keys to look up.
+
+        Returns:
+            list: The value of each key, or None for keys not in the cache.
+        """
+        found = {}
+        with self._lock, self._connection:
+            for batch in _batches(list(keys)):
+                rows = self._connection.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({_placeholders(batch)})", batch
+                )
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+        return [found.get(key) for key in keys]
+
+    def mset(self, key_value_pairs):
+        """
+        Set the values of keys, then evict the least recently used entries if the cache
+        has grown past its maximum size.
+
+        Args:
+            key_value_pairs (list): (key, value) pairs, the values as bytes.
+        """
+        pairs = dict(key_value_pairs)
+        if not pairs:
+            return
+        now = time.time()
+        with self._lock, self._connection:
+            replaced = self._sizes(list(pairs))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                [(key, value, len(value), now) for key, value in pairs.items()],
+            )
+            self._size += sum(len(value) for value in pairs.values()) - sum(replaced.values())
+            self._evict()
+
+    def mdelete(self, keys):
+        """
+        Delete keys and their values. Keys not in the cache are ignored.
+
+        Args:
+            keys (list): The keys to delete.
+        """
+        with self._lock, self._connection:
+            deleted = self._sizes(list(keys))
+            for batch in _batches(list(deleted)):
+                self._connection.execute(f"DELETE FROM entries WHERE key IN ({_placeholders(batch)})", batch)
+            self._size -= sum(deleted.values())
+
+    def yield_keys(self, prefix=None):
+        """
+        Yield the keys in the cache.
+
+        Args:
+            prefix (str, optional): Only yield keys starting with this prefix.
+
+        Yields:
+            str: The keys.
+        """
+        with self._lock:
+            keys = [row[0] for row in self._connection.execute("SELECT key FROM entries")]
+        for key in keys:
+            if prefix is None or key.startswith(prefix):
+                yield key
+
+    def compact(self, legacy_dir=None):
+        """
+        Compact the cache: import any legacy one-file-per-entry cache files and delete them,
+        evict entries down to the maximum size, and reclaim the space of deleted entries.
+
+        Args:
+            legacy_dir (str, optional): The directory of a legacy file-per-entry cache, whose
+                files are keyed by their path relative to it. The index directory and this
+                cache's own files are left alone.
+
+        Returns:
+            int: Number of legacy files imported.
+        """
+        imported = 0
+        if legacy_dir is not None:
+            for batch in _batches(list(_legacy_entries(legacy_dir, self.path))):
+                values = []
+                for key, file_path in batch:
+                    with open(file_path, "rb") as legacy_file:
+                        values.append((key, legacy_file.read()))
+                with self._lock, self._connection:
+                    existing = self._sizes([key for key, _ in values])
+                # Entries already in the cache are newer than their legacy files
+                self.mset([(key, value) for key, value in values if key not in existing])
+                for _, file_path in batch:
+                    os.remove(file_path)
+                imported += len(batch)
+            _remove_empty_directories(legacy_dir)
+        with self._lock:
+            with self._connection:
+                self._evict()
+            self._connection.execute("VACUUM")
+        return imported
+
+    def close(self):
+        """
+        Close the cache file.
+        """
+        self._connection.close()
+
+    def _sizes(self, keys):
+        sizes = {}
+        for batch in _batches(keys):
+            rows = self._connection.execute(
+                f"SELECT key, size FROM entries WHERE key IN ({_placeholders(batch)})", batch
+            )
+            sizes.update(rows)
+        return sizes
+
+    def _evict(self):
+        if self.max_bytes is None or self._size <= self.max_bytes:
+            return
+        evicted = []
+        rows = self._connection.execute("SELECT key, size FROM entries ORDER BY last_used, key")
+        for key, size in rows:
+            if self._size <= self.max_bytes:
+                break
+            evicted.append(key)
+            self._size -= size
+        for batch in _batches(evicted):
+            self._connection.execute(f"DELETE FROM entries WHERE key IN ({_placeholders(batch)})", batch)
+
+
+def _batches(keys):
+    for start in range(0, len(keys), QUERY_BATCH_SIZE):
+        yield keys[start:start + QUERY_BATCH_SIZE]
+
+
+def _placeholders(batch):
+    return ",".join("?" * len(batch))
+
+
+def _legacy_entries(legacy_dir, cache_path):
+    cache_files = {os.path.basename(cache_path) + suffix for suffix in ("", "-journal", "-wal", "-shm")}
+    for root, dirs, files in os.walk(legacy_dir):
+        if root == legacy_dir:
+            dirs[:] = [directory for directory in dirs if directory != INDEX_DIRECTORY]
+        for name in files:
+            if root == legacy_dir and name in cache_files:
+                continue
+            file_path = os.path.join(root, name)
+            yield os.path.relpath(file_path, legacy_dir).replace(os.sep, "/"), file_path
+
+
+def _remove_empty_directories(legacy_dir):
+    index_dir = os.path.join(legacy_dir, INDEX_DIRECTORY)
+    for root, dirs, files in os.walk(legacy_dir, topdown=False):
+        if root != legacy_dir and not root.startswith(index_dir) and not os.listdir(root):
+            os.rmdir(root)
+
+
+def get_embedding_cache(cache_dir, max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+    """
+    Get the embedding cache of a codebase.
+
+    Args:
+        cache_dir (str): The codebase's embeddings cache directory.
+        max_bytes (int, optional): Maximum total size of the cached entries. Defaults to
+            EMBEDDING_CACHE_MAX_BYTES.
+
+    Returns:
+        EmbeddingCache: The cache.
+    """
+    return EmbeddingCache(os.path.join(cache_dir, EMBEDDING_CACHE_FILENAME), max_bytes)
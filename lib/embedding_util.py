@@ -1,33 +1,163 @@
 import os
-from langchain_community.vectorstores import DocArrayInMemorySearch
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
+
 from config import get_api_keys
 from lib.shell_util import (
     RESET_COLOR, WHITE_ON_BLACK, LIGHT_PINK
 )
-from lib.litellm_client import create_litellm_client_embeddings
+from lib.litellm_client import (
+    EMBEDDING_BATCH_TOKENS, EMBEDDING_CONCURRENCY, create_litellm_client_embeddings
+)
+from lib.code_chunker import chunk_code
+from lib.embedding_cache import EMBEDDING_CACHE_MAX_BYTES, get_embedding_cache
+from lib.file_parser import format_file_excerpt
+from lib.lexical_index import get_lexical_index
+from lib.rank_fusion import reciprocal_rank_fusion
+from lib.vector_index import ANN_PROBES, ANN_THRESHOLD, get_vector_index
 from langchain.embeddings import CacheBackedEmbeddings
-from langchain.storage import LocalFileStore
 
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module='pydantic')
 
 EMBEDDINGS_CACHE_DIR = ".arcode.embeddings"
 
-def get_top_relevant_files(startpath, upload_filter, query, model_embedding, num_files=42):
+RETRIEVAL_METHODS = ["embedding", "bm25", "hybrid"]
+
+FOCUSED_CONTEXTS = ["file", "chunk"]
+
+# Hybrid retrieval fuses this many times more candidates from each method than it returns
+HYBRID_CANDIDATE_FACTOR = 3
+
+# Lines of surrounding code sent around each matching chunk in chunk context
+CHUNK_CONTEXT_LINES = 3
+
+def get_top_relevant_files(
+    startpath,
+    files,
+    query,
+    model_embedding,
+    num_files=42,
+    batch_tokens=EMBEDDING_BATCH_TOKENS,
+    concurrency=EMBEDDING_CONCURRENCY,
+    min_score=None,
+    retrieval="embedding",
+    context="file",
+    cache_max_bytes=EMBEDDING_CACHE_MAX_BYTES,
+    ann_threshold=ANN_THRESHOLD,
+    ann_probes=ANN_PROBES,
+):
     """
-    Get the top N relevant files to a given query using embeddings.
+    Get the top N relevant files to a given query using embeddings, BM25 or both.
+
+    Chunk embeddings are kept in a persistent vector index keyed by chunk content, so only
+    chunks that changed since the last query are embedded again. BM25 retrieval ranks chunks
+    with a local lexical index and makes no network requests. Hybrid retrieval merges both
+    rankings with reciprocal rank fusion.
+
+    Matching chunks are grouped by file, so each file is returned once, ranked by its best
+    chunk. In chunk context a file's data holds only its matching chunks and a few surrounding
+    lines, with their line numbers marked, instead of the whole file.
 
     Args:
-        startpath (str): The starting directory path to scan for files.
-        upload_filter (UploadedFileFilter): Filter class to determine if a file should be considered.
+        startpath (str): The starting directory path the files were scanned from.
+        files (list): Files from the codebase scan, as FileRecord objects. Their contents are
+            reused rather than read from disk again.
         query (str): The query to compare file contents against.
         model_embedding (str): The embedding model to use for comparison.
         num_files (int): Number of most relevant file chunks to retrieve.
+        batch_tokens (int): Maximum number of tokens sent in one embedding request.
+        concurrency (int): Maximum number of embedding requests in flight at once.
+        min_score (float): Chunks less similar to the query than this are not retrieved by
+            embedding retrieval.
+        retrieval (str): The retrieval method, one of RETRIEVAL_METHODS.
+        context (str): How much of each file to return, one of FOCUSED_CONTEXTS.
+        cache_max_bytes (int): Maximum size of the embeddings cache, beyond which the least
+            recently used embeddings are evicted.
+        ann_threshold (int): Number of chunks from which embedding search is approximate, or
+            None to always search exactly.
+        ann_probes (int): Number of IVF lists an approximate search scores.
 
     Returns:
-        list: A list of dictionaries containing file paths, data and relevance scores.
+        list: A list of dictionaries containing file paths, data, relevance scores and the
+              (start, end) line ranges of the matching chunks.
+    """
+    if not files:
+        return []
+
+    if retrieval == "bm25":
+        hits = group_hits_by_file(search_lexical(startpath, files, query, num_files))
+    elif retrieval == "hybrid":
+        candidates = num_files * HYBRID_CANDIDATE_FACTOR
+        rankings = [
+            search_lexical(startpath, files, query, candidates),
+            search_embeddings(
+                startpath, files, query, model_embedding, candidates, batch_tokens, concurrency, min_score,
+                cache_max_bytes, ann_threshold, ann_probes,
+            ),
+        ]
+        candidate_hits = {path: lines for path, _, lines in group_hits_by_file(rankings[0] + rankings[1])}
+        hits = [
+            (path, score, candidate_hits[path])
+            for path, score in reciprocal_rank_fusion(rankings, limit=num_files)
+        ]
+    else:
+        hits = group_hits_by_file(search_embeddings(
+            startpath, files, query, model_embedding, num_files, batch_tokens, concurrency, min_score,
+            cache_max_bytes, ann_threshold, ann_probes,
+        ))
+
+    print(f"\n{WHITE_ON_BLACK} 🔎 {LIGHT_PINK} Sorting and filtering... {RESET_COLOR}")
+    files_by_path = {file['path']: file for file in files}
+    top_files = []
+    for file, score, lines in hits:
+        data = files_by_path[file]['data']
+        if context == "chunk":
+            data = format_file_excerpt(data, lines, CHUNK_CONTEXT_LINES)
+        top_files.append({'path': file, 'data': data, 'score': score, 'lines': lines})
+
+    return top_files
+
+def group_hits_by_file(hits):
+    """
+    Group chunk hits by the file they belong to.
+
+    Args:
+        hits (list): Tuples of file path, score and (start, end) line range, best first.
+
+    Returns:
+        list: Tuples of file path, best score and the sorted line ranges of the file's hits,
+              ordered by best score.
+    """
+    grouped = {}
+    for path, score, lines in hits:
+        if path not in grouped:
+            grouped[path] = (score, set())
+        grouped[path][1].add(tuple(lines))
+    return [(path, score, sorted(lines)) for path, (score, lines) in grouped.items()]
+
+def search_embeddings(
+    startpath, files, query, model_embedding, num_files, batch_tokens, concurrency, min_score,
+    cache_max_bytes=EMBEDDING_CACHE_MAX_BYTES, ann_threshold=ANN_THRESHOLD, ann_probes=ANN_PROBES,
+):
+    """
+    Rank file chunks against a query by the cosine similarity of their embeddings.
+
+    Args:
+        startpath (str): The starting directory path the files were scanned from.
+        files (list): Files from the codebase scan, as FileRecord objects.
+        query (str): The query to compare file contents against.
+        model_embedding (str): The embedding model to use for comparison.
+        num_files (int): Number of most relevant file chunks to retrieve.
+        batch_tokens (int): Maximum number of tokens sent in one embedding request.
+        concurrency (int): Maximum number of embedding requests in flight at once.
+        min_score (float): Chunks less similar to the query than this are not retrieved.
+        cache_max_bytes (int): Maximum size of the embeddings cache.
+        ann_threshold (int): Number of chunks from which the search is approximate, or None to
+            always search exactly.
+        ann_probes (int): Number of IVF lists an approximate search scores.
+
+    Returns:
+        list: Tuples of the file path of each chunk, its score and its (start, end) line
+              range, best match first.
     """
     api_base = None
     api_version = None
@@ -36,48 +166,68 @@ def get_top_relevant_files(startpath, upload_filter, query, model_embedding, num
     else:
         api_key = get_api_keys(model_embedding)
 
-    store = LocalFileStore(f"{startpath}/{EMBEDDINGS_CACHE_DIR}/")
-    embeddings = create_litellm_client_embeddings(model=model_embedding, api_key=api_key, api_base=api_base, api_version=api_version)
+    store = get_embedding_cache(os.path.join(startpath, EMBEDDINGS_CACHE_DIR), cache_max_bytes)
+    embeddings = create_litellm_client_embeddings(
+        model=model_embedding,
+        api_key=api_key,
+        api_base=api_base,
+        api_version=api_version,
+        batch_tokens=batch_tokens,
+        concurrency=concurrency,
+    )
     cached_embedder = CacheBackedEmbeddings.from_bytes_store(
         embeddings, store, namespace=embeddings.model
     )
 
-    file_contents = []
-    files = []
-
-    for root, _, file_list in os.walk(startpath):
-        for file in file_list:
-            file_path = os.path.join(root, file)
-            if (upload_filter.should_upload(os.path.relpath(os.path.join(root, file), startpath))):
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        file_contents.append(Document(page_content=content, metadata={'source': file_path}))
-                        files.append((file_path, content))
-                except UnicodeDecodeError:
-                    # Skip files that can't be read as UTF-8
-                    continue
-
-    if not file_contents:
-        return []
+    index = get_vector_index(os.path.join(startpath, EMBEDDINGS_CACHE_DIR), embeddings.model)
+    try:
+        index.update(files, split=chunk_code, embed=cached_embedder.embed_documents)
+    finally:
+        store.close()
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=2500, chunk_overlap=20)
-    docs = text_splitter.split_documents(file_contents)
+    # Performing similarity search
+    return index.search(
+        embeddings.embed_query(query),
+        k=num_files,
+        min_score=min_score,
+        ann_threshold=ann_threshold,
+        ann_probes=ann_probes,
+    )
 
-    db = DocArrayInMemorySearch.from_documents(docs, cached_embedder)
+def compact_embeddings_cache(startpath, cache_max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+    """
+    Compact a codebase's embeddings cache, packing the files of the older one-file-per-chunk
+    cache into it and evicting the least recently used embeddings beyond its maximum size.
 
-    # Performing similarity search
-    similarities = db.similarity_search_with_score(query, k=num_files)
-    print(f"\n{WHITE_ON_BLACK} 🔎 {LIGHT_PINK} Sorting and filtering... {RESET_COLOR}")
-    sorted_files = sorted([(doc.metadata['source'], score) for doc, score in similarities], key=lambda x: x[1], reverse=True)
-    top_files = []
-    for file, score in sorted_files[:num_files]:
-        try:
-            with open(file, 'r', encoding='utf-8') as f:
-                data = f.read()
-                top_files.append({'path': file, 'data': data, 'score': score})
-        except UnicodeDecodeError:
-            # Skip files that can't be read as UTF-8
-            continue
-
-    return top_files
\ No newline at end of file
+    Args:
+        startpath (str): The codebase directory.
+        cache_max_bytes (int): Maximum size of the embeddings cache.
+
+    Returns:
+        tuple: The number of legacy cache files packed and the cache size in bytes afterwards.
+    """
+    cache_dir = os.path.join(startpath, EMBEDDINGS_CACHE_DIR)
+    store = get_embedding_cache(cache_dir, cache_max_bytes)
+    try:
+        imported = store.compact(legacy_dir=cache_dir)
+        return imported, store.size
+    finally:
+        store.close()
+
+def search_lexical(startpath, files, query, num_files):
+    """
+    Rank file chunks against a query by BM25, without any network requests.
+
+    Args:
+        startpath (str): The starting directory path the files were scanned from.
+        files (list): Files from the codebase scan, as FileRecord objects.
+        query (str): The query to compare file contents against.
+        num_files (int): Number of most relevant file chunks to retrieve.
+
+    Returns:
+        list: Tuples of the file path of each chunk, its score and its (start, end) line
+              range, best match first.
+    """
+    index = get_lexical_index(os.path.join(startpath, EMBEDDINGS_CACHE_DIR))
+    index.update(files, split=chunk_code)
+    return index.search(query, k=num_files)
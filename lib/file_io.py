@@ -1,9 +1,12 @@
+import hashlib
 import os
-from .gitignore_parser import is_ignored
-import magic
+from .gitignore_parser import IgnoreMatcher
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
-from .constants import binary_extensions
+from .binary_classifier import binary_classifier
+from .git_index import list_git_files, walk_order_key
+from .parallel_walk import parallel_walk
 from .file_parser import (
     extract_filename_start,
     extract_filename_end,
@@ -16,31 +19,21 @@ from .shell_util import (
     LIGHT_BLUE, LIGHT_PINK, LIGHT_GREEN, RESET_COLOR
 )
 
-def is_binary_file(filename):
+def is_binary_file(filename, stat_result=None):
     """
-    Check if a given filename is a binary file based on its extension and MIME type,
-    excluding specific MIME types like application/xhtml+xml and application/xml.
+    Check if a given filename is a binary file based on its extension, a sniff of its
+    leading bytes and, when the sniff is inconclusive, its MIME type - excluding specific
+    MIME types like application/xhtml+xml and application/xml.
 
     Args:
         filename (str): The filename to check.
+        stat_result (os.stat_result, optional): The file's stat result when the caller already
+            has one. Defaults to None.
 
     Returns:
         bool: True if the file is binary, False otherwise.
     """
-    if os.path.splitext(filename)[1].lower() in binary_extensions:
-        return True
-    magic_obj = magic.Magic(mime=True)
-    mime_type = magic_obj.from_file(filename)
-
-    # Exclude specific MIME types that should not be considered binary
-    excluded_mime_types = ['application/xhtml+xml', 'application/xml', 'application/json', 'application/javascript']
-    if mime_type in excluded_mime_types:
-        return False
-
-    return ('application/' in mime_type or
-            'image/' in mime_type or
-            'audio/' in mime_type or
-            'video/' in mime_type)
+    return binary_classifier.is_binary(filename, stat_result)
 
 def print_files_as_tree(startpath, relative_paths):
     """
@@ -79,21 +72,20 @@ def print_tree(startpath, ignore_patterns, prefix=""):
         ignore_patterns (list): List of patterns to ignore during directory scan.
         prefix (str, optional): Prefix string for formatting the tree. Defaults to "".
     """
+    matcher = IgnoreMatcher(ignore_patterns)
     for root, dirs, files in os.walk(startpath):
         dirs[:] = [
             d
             for d in dirs
-            if not is_ignored(
-                os.path.relpath(os.path.join(root, d), startpath),
-                ignore_patterns,
+            if not matcher.is_ignored(
+                os.path.relpath(os.path.join(root, d), startpath)
             )
         ]
         files = [
             f
             for f in files
-            if not is_ignored(
-                os.path.relpath(os.path.join(root, f), startpath),
-                ignore_patterns,
+            if not matcher.is_ignored(
+                os.path.relpath(os.path.join(root, f), startpath)
             )
             and not is_binary_file(os.path.relpath(os.path.join(root, f), startpath))
         ]
@@ -105,45 +97,208 @@ def print_tree(startpath, ignore_patterns, prefix=""):
         for f in files:
             print(f"{prefix}{subindent}{f}")
 
-def get_files(startpath, upload_filter):
+def walk_paths(startpath, upload_filter):
     """
-    Retrieve files from the given starting path, ignoring specific patterns, binary files, and files exceeding max size.
+    Walk the directory tree from the given starting path, yielding every file that is not within an ignored directory.
+
+    Directories excluded by the upload filter are pruned from the walk, so ignored subtrees
+    (node_modules, .git, build output, ...) are never listed or stat'd. Directories and files
+    are visited in sorted order so the result is deterministic.
+
+    Args:
+        startpath (str): The starting directory path.
+        upload_filter (UploadedFileFilter): Filter object for file upload decisions.
+
+    Yields:
+        str: Path of each file, relative to the startpath.
+    """
+    for root, dirs, files in os.walk(startpath):
+        rel_root = os.path.relpath(root, startpath)
+        dirs[:] = sorted(
+            d
+            for d in dirs
+            if upload_filter.should_descend(os.path.join(rel_root, d))
+        )
+        for f in sorted(files):
+            yield os.path.relpath(os.path.join(root, f), startpath)
+
+def list_paths(startpath, upload_filter, workers=1):
+    """
+    List the candidate files beneath the given starting path.
+
+    Inside a git work tree the files come from the git index plus untracked files git does not
+    ignore, so the filesystem is not walked at all. Anywhere else the directory tree is walked,
+    by a pool of threads when more than one worker is requested, in which case files are yielded
+    as they are found rather than in walk order.
 
     Args:
         startpath (str): The starting directory path.
         upload_filter (UploadedFileFilter): Filter object for file upload decisions.
+        workers (int, optional): Number of threads walking the directory tree. Defaults to 1.
+
+    Yields:
+        tuple: Path of each file, relative to the startpath, and its os.stat_result when the
+               walk already has one, otherwise None.
+    """
+    git_paths = list_git_files(startpath)
+    if git_paths is not None:
+        for file_path in git_paths:
+            yield file_path, None
+    elif workers > 1:
+        yield from parallel_walk(startpath, upload_filter.should_descend, workers)
+    else:
+        for file_path in walk_paths(startpath, upload_filter):
+            yield file_path, None
+
+class FileRecord:
+    """
+    A file found by a codebase scan, whose contents are only read when first needed.
+
+    Records can be indexed like the dictionaries used elsewhere for files, i.e. record["path"]
+    and record["data"].
+
+    Attributes:
+        path (str): The file path, relative to the scanned directory.
+        full_path (str): The file path including the scanned directory.
+    """
+    __slots__ = ("path", "full_path", "_manifest", "_data", "_stat_result")
+
+    def __init__(self, startpath, path, manifest=None, stat_result=None):
+        self.path = path
+        self.full_path = os.path.join(startpath, path)
+        self._manifest = manifest
+        self._data = None
+        # The scan's stat result, so the manifest need not stat the file again to read it
+        self._stat_result = stat_result
+
+    @property
+    def data(self):
+        """
+        str: The file contents, read on first access.
+        """
+        if self._data is None:
+            self._data = self.read()
+        return self._data
+
+    @property
+    def content_hash(self):
+        """
+        str: SHA-1 of the file contents. For a file the manifest has seen unchanged, this is the
+        recorded hash and the contents are not read.
+        """
+        if self._manifest is not None:
+            content_hash = self._manifest.get_hash(self.path)
+            if content_hash is not None:
+                return content_hash
+        return hashlib.sha1(self["data"].encode("utf-8")).hexdigest()
+
+    @property
+    def loaded(self):
+        """
+        bool: Whether the file contents have been read.
+        """
+        return self._data is not None
+
+    def read(self):
+        """
+        Read the file contents from disk, or from the manifest's session cache when unchanged.
+
+        Returns:
+            str: The file contents.
+        """
+        if self._manifest is not None:
+            return self._manifest.read_file(self.path, self._stat_result)
+        with open(
+            self.full_path,
+            "r",
+            encoding="utf-8",
+            errors="ignore",
+        ) as file:
+            return file.read()
+
+    def __getitem__(self, key):
+        if key == "path":
+            return self.path
+        if key == "data":
+            try:
+                return self.data
+            except Exception as e:
+                print(f"Unknown error reading file: {self.path}: {e}")
+                self._data = ""
+                return self._data
+        raise KeyError(key)
+
+    def __eq__(self, other):
+        if not isinstance(other, FileRecord):
+            return NotImplemented
+        return self.path == other.path and self.data == other.data
+
+    def __repr__(self):
+        return f"FileRecord({self.path!r})"
+
+def get_files(startpath, upload_filter, workers=1, lazy=False):
+    """
+    Retrieve files from the given starting path, ignoring specific patterns, binary files, and files exceeding max size.
+
+    Args:
+        startpath (str): The starting directory path.
+        upload_filter (UploadedFileFilter): Filter object for file upload decisions. When it
+            carries a file manifest, unchanged files are not re-checked or re-read and the
+            manifest is saved once the scan completes.
+        workers (int, optional): Number of threads walking the directory tree, and number of
+            threads filtering and reading files at the same time. Files are returned in walk
+            order regardless. Defaults to 1.
+        lazy (bool, optional): Whether to defer reading file contents until they are first
+            used. Defaults to False.
 
     Returns:
-        list: List of dictionaries containing file paths and data.
+        list: List of FileRecord objects holding file paths and data.
     """
     print(f"{LIGHT_BLUE} 🕰️  Scanning your codebase...{RESET_COLOR}")
-    all_files = []
-    for root, _, files in os.walk(startpath):
-        files = [
-            f
-            for f in files
-            if upload_filter.should_upload(os.path.relpath(os.path.join(root, f), startpath))
-        ]
-        for f in files:
-            file_path = os.path.relpath(os.path.join(root, f), startpath)
-            full_path = os.path.join(root, f)
+    # Binary detection stats describe the latest scan, not the whole session
+    binary_classifier.reset_stats()
+    manifest = upload_filter.manifest
+    if manifest is not None:
+        manifest.begin_scan()
+
+    def load_file(file_path, stat_result=None):
+        # A git listing has no stat results; stat each file once for the filter and the read
+        if stat_result is None:
             try:
-                with open(
-                    full_path,
-                    "r",
-                    encoding="utf-8",
-                    errors="ignore",
-                ) as file:
-                    all_files.append(
-                        {
-                            "path": file_path,
-                            "data": file.read(),
-                        }
-                    )
-            except UnicodeDecodeError as e:
-                print(f"Error reading file {file_path}: {e}")
-            except Exception as e:
-                print(f"Unknown error reading file: {file_path}: {e}")
+                stat_result = os.stat(os.path.join(startpath, file_path))
+            except FileNotFoundError:
+                return None
+        if not upload_filter.should_upload(file_path, stat_result):
+            return None
+        record = FileRecord(startpath, file_path, manifest, stat_result)
+        if lazy:
+            return record
+        try:
+            record.data
+            return record
+        except UnicodeDecodeError as e:
+            print(f"Error reading file {file_path}: {e}")
+        except Exception as e:
+            print(f"Unknown error reading file: {file_path}: {e}")
+        return None
+
+    paths = list_paths(startpath, upload_filter, workers)
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Files are filtered and read while the walk is still streaming paths in
+            futures = [
+                executor.submit(load_file, file_path, stat_result)
+                for file_path, stat_result in paths
+            ]
+            loaded = [future.result() for future in futures]
+    else:
+        loaded = [load_file(file_path, stat_result) for file_path, stat_result in paths]
+    all_files = [file for file in loaded if file is not None]
+    # A parallel walk finds files in no particular order; keep the prompt identical to a serial scan
+    all_files.sort(key=lambda file: walk_order_key(file.path))
+
+    if manifest is not None:
+        manifest.save()
     return all_files
 
 def calculate_line_difference(filepath, new_content):
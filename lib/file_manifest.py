@@ -0,0 +1,234 @@
+"""
+This module keeps a persistent manifest of the files found while scanning a codebase, so that
+later scans - in a new run or after "Reload files" - only re-check and re-read files that changed.
+
+The manifest is stored as JSON at the root of the scanned directory, next to the embeddings cache.
+For each file it records the size and modification time it was last seen with, a hash of its
+contents, its binary verdict and its token count per model. File contents are kept in memory for
+the rest of the session but are never written to disk.
+
+Classes:
+    FileManifest: Loads, queries, updates and saves the manifest for one directory.
+
+Functions:
+    get_manifest: Returns the session's manifest for a directory, loading it on first use.
+
+Constants:
+    MANIFEST_FILENAME: Name of the manifest file within the scanned directory.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from lib.binary_classifier import binary_classifier
+from lib.file_io import is_binary_file
+
+MANIFEST_FILENAME = ".arcode.manifest.json"
+MANIFEST_VERSION = 1
+
+# Files modified this recently may change again within the same mtime tick,
+# so their contents are not trusted across scans
+RACY_WINDOW_NS = 2_000_000_000
+
+
+class FileManifest:
+    """
+    A persistent record of the files in a directory.
+
+    Attributes:
+        startpath (str): The directory the manifest describes.
+        path (str): The path of the manifest file.
+        entries (dict): Manifest entries keyed by path relative to the startpath.
+    """
+    def __init__(self, startpath):
+        self.startpath = startpath
+        self.path = os.path.join(startpath, MANIFEST_FILENAME)
+        self.entries = {}
+        self._contents = {}
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Load the manifest from disk, starting empty if it is missing or unreadable.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return
+        if manifest.get("version") == MANIFEST_VERSION:
+            self.entries = manifest.get("files", {})
+
+    def save(self):
+        """
+        Write the manifest to disk, dropping entries for files not seen since the last scan began.
+        """
+        with self._lock:
+            self.entries = {
+                path: entry for path, entry in self.entries.items() if path in self._seen
+            }
+            manifest = {"version": MANIFEST_VERSION, "files": self.entries}
+            temp_path = f"{self.path}.tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as manifest_file:
+                    json.dump(manifest, manifest_file, separators=(",", ":"))
+                os.replace(temp_path, self.path)
+            except OSError:
+                # A read-only checkout just loses the speedup on the next run
+                pass
+
+    def begin_scan(self):
+        """
+        Start tracking which files are seen, so entries for deleted files are dropped on save.
+        """
+        with self._lock:
+            self._seen = set()
+
+    def is_binary(self, path, stat_result=None):
+        """
+        Check if a file is binary, reusing the recorded verdict when the file is unchanged.
+
+        Args:
+            path (str): A file path, relative to the start directory.
+            stat_result (os.stat_result, optional): The file's stat result when the caller
+                already has one. Defaults to None.
+
+        Returns:
+            bool: True if the file is binary, False otherwise.
+        """
+        full_path = os.path.join(self.startpath, path)
+        if stat_result is None:
+            stat_result = os.stat(full_path)
+        entry = self._fresh_entry(path, stat_result)
+        if entry is not None and "binary" in entry:
+            binary_classifier.count_decision("manifest")
+            return entry["binary"]
+
+        binary = is_binary_file(full_path, stat_result)
+        entry = self._entry_for(path, stat_result)
+        if entry is not None:
+            entry["binary"] = binary
+        return binary
+
+    def read_file(self, path, stat_result=None):
+        """
+        Read a text file, reusing the contents read earlier in the session when it is unchanged.
+
+        Args:
+            path (str): A file path, relative to the start directory.
+            stat_result (os.stat_result, optional): The file's stat result when the caller
+                already has one. Defaults to None.
+
+        Returns:
+            str: The file contents.
+        """
+        full_path = os.path.join(self.startpath, path)
+        if stat_result is None:
+            stat_result = os.stat(full_path)
+        entry = self._fresh_entry(path, stat_result)
+        if entry is not None and path in self._contents:
+            return self._contents[path]
+
+        with open(full_path, "r", encoding="utf-8", errors="ignore") as file:
+            data = file.read()
+
+        content_hash = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        entry = self._entry_for(path, stat_result)
+        if entry is not None:
+            if entry.get("hash") != content_hash:
+                entry["tokens"] = {}
+            entry["hash"] = content_hash
+            with self._lock:
+                self._contents[path] = data
+        return data
+
+    def get_hash(self, path):
+        """
+        Get the recorded content hash of a file.
+
+        Args:
+            path (str): A file path, relative to the start directory.
+
+        Returns:
+            str: The content hash, or None if the file has not been read.
+        """
+        return self.entries.get(path, {}).get("hash")
+
+    def get_tokens(self, path, model):
+        """
+        Get the recorded token count of a file for a model.
+
+        Args:
+            path (str): A file path, relative to the start directory.
+            model (str): The model the tokens were counted for.
+
+        Returns:
+            int: The token count, or None if it has not been recorded.
+        """
+        return self.entries.get(path, {}).get("tokens", {}).get(model)
+
+    def set_tokens(self, path, model, tokens):
+        """
+        Record the token count of a file for a model.
+
+        Args:
+            path (str): A file path, relative to the start directory.
+            model (str): The model the tokens were counted for.
+            tokens (int): The token count.
+        """
+        entry = self.entries.get(path)
+        if entry is not None and "hash" in entry:
+            entry.setdefault("tokens", {})[model] = tokens
+
+    def _fresh_entry(self, path, stat_result):
+        with self._lock:
+            self._seen.add(path)
+            entry = self.entries.get(path)
+        if (
+            entry is not None
+            and entry["size"] == stat_result.st_size
+            and entry["mtime_ns"] == stat_result.st_mtime_ns
+        ):
+            return entry
+        return None
+
+    def _entry_for(self, path, stat_result):
+        """
+        Get the entry for a file's current size and modification time, replacing any stale one.
+        """
+        entry = self._fresh_entry(path, stat_result)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            self._contents.pop(path, None)
+            if time.time_ns() - stat_result.st_mtime_ns < RACY_WINDOW_NS:
+                self.entries.pop(path, None)
+                return None
+            entry = {"size": stat_result.st_size, "mtime_ns": stat_result.st_mtime_ns}
+            self.entries[path] = entry
+        return entry
+
+
+_manifests = {}
+
+
+def get_manifest(startpath):
+    """
+    Get the manifest for a directory, loading it from disk the first time it is requested.
+
+    Args:
+        startpath (str): The directory the manifest describes.
+
+    Returns:
+        FileManifest: The session's manifest for the directory.
+    """
+    key = os.path.abspath(startpath)
+    if key not in _manifests:
+        manifest = FileManifest(startpath)
+        manifest.load()
+        _manifests[key] = manifest
+    return _manifests[key]
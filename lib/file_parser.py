@@ -1,3 +1,4 @@
+import io
 import re
 
 # Regex patterns
@@ -72,6 +73,39 @@ def format_file_contents(files):
         contents += f"\n**************** EOF: {file_path} ****************\n"
     return contents
 
+def format_file_excerpt(data, line_ranges, context_lines=0):
+    """
+    Format the given line ranges of a file, each widened by some surrounding lines, as an
+    excerpt with the line numbers of each part marked.
+
+    Args:
+        data (str): The file contents.
+        line_ranges (list): (start, end) 1-based line ranges to include.
+        context_lines (int): Number of lines to include before and after each range.
+
+    Returns:
+        str: The excerpt. Overlapping or adjacent ranges are merged.
+    """
+    # Split at newlines only, matching the line numbers of code chunks
+    lines = io.StringIO(data).readlines()
+    total = len(lines)
+    merged = []
+    for start, end in sorted(line_ranges):
+        start = max(1, start - context_lines)
+        end = min(total, end + context_lines)
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        elif start <= end:
+            merged.append([start, end])
+
+    excerpt = ""
+    for start, end in merged:
+        excerpt += f"**************** EXCERPT: LINES {start}-{end} OF {total} ****************\n"
+        excerpt += "".join(lines[start - 1:end])
+        if not excerpt.endswith("\n"):
+            excerpt += "\n"
+    return excerpt
+
 def parse_files(string, debug=False):
     """
     Parse files from a given string containing file delimiters and content.
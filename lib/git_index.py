@@ -0,0 +1,275 @@
+"""
+This module lists the files of a git work tree from the repository's index, so scanning a git
+checkout does not need to walk the filesystem.
+
+Tracked files are read directly from `.git/index` (index versions 2, 3 and 4). Untracked files
+that are not ignored are listed by `git ls-files --others --exclude-standard`, which applies the
+repository's full ignore rules - nested .gitignore files, .git/info/exclude and the user's global
+excludes file.
+
+Git lists symlinks as files, so symlinks to directories are skipped, as a directory walk that
+does not follow them would. Submodules and nested repositories, which git lists as single
+entries, are listed from their own index in turn, so their files are included as a directory
+walk would include them.
+
+Functions:
+    find_work_tree: Locates the work tree and git directory containing a path.
+    read_index: Parses the entries of a git index file.
+    list_untracked_files: Lists untracked, unignored files beneath a directory.
+    list_git_files: Lists all tracked and untracked, unignored files beneath a directory.
+    walk_order_key: Sort key matching the order of a sorted directory walk.
+"""
+import os
+import stat
+import struct
+import subprocess
+from collections import namedtuple
+
+IndexEntry = namedtuple("IndexEntry", ["path", "mtime_ns", "size", "mode"])
+
+INDEX_SIGNATURE = b"DIRC"
+SUPPORTED_INDEX_VERSIONS = (2, 3, 4)
+
+# Fixed-size part of an index entry: ten 32-bit stat fields, a 20-byte
+# object name and 16 bits of flags
+ENTRY_HEADER_SIZE = 62
+ENTRY_STAT_FORMAT = ">10I"
+
+# Mode of the index entries of submodules, which record a commit rather than a file
+GITLINK_MODE = 0o160000
+
+FLAG_EXTENDED = 0x4000
+FLAG_STAGE_MASK = 0x3000
+EXTENDED_FLAG_SKIP_WORKTREE = 0x4000
+
+CHECKSUM_SIZE = 20
+
+
+def find_work_tree(startpath):
+    """
+    Find the git work tree containing the given path.
+
+    Args:
+        startpath (str): A directory path.
+
+    Returns:
+        tuple: The work tree root and the git directory, or None if the path is not inside a git work tree.
+    """
+    current = os.path.realpath(startpath)
+    while True:
+        dot_git = os.path.join(current, ".git")
+        if os.path.isdir(dot_git):
+            return current, dot_git
+        if os.path.isfile(dot_git):
+            # Linked work trees and submodules point at their git directory
+            with open(dot_git, "r", encoding="utf-8") as git_file:
+                line = git_file.readline().strip()
+            if line.startswith("gitdir:"):
+                git_dir = line[len("gitdir:"):].strip()
+                return current, os.path.normpath(os.path.join(current, git_dir))
+            return None
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def _read_offset_varint(data, offset):
+    """
+    Read a variable-length integer in the offset encoding used by index version 4.
+    """
+    byte = data[offset]
+    offset += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        value += 1
+        byte = data[offset]
+        offset += 1
+        value = (value << 7) + (byte & 0x7F)
+    return value, offset
+
+
+def read_index(git_dir):
+    """
+    Parse the entries of a git index file.
+
+    Conflicted paths are listed once, entries outside a sparse checkout are skipped, and
+    sparse directory entries are omitted. Submodules are listed with GITLINK_MODE.
+
+    Args:
+        git_dir (str): The git directory containing the index.
+
+    Returns:
+        list: IndexEntry tuples with '/'-separated paths relative to the work tree, or None
+              if the index cannot be read or is in a format that cannot be read. A repository
+              with nothing staged yet has no index, and so no entries.
+    """
+    try:
+        with open(os.path.join(git_dir, "index"), "rb") as index_file:
+            data = index_file.read()
+    except FileNotFoundError:
+        return []
+    except OSError:
+        return None
+
+    if len(data) < 12:
+        return None
+    signature, version, count = struct.unpack_from(">4sII", data, 0)
+    if signature != INDEX_SIGNATURE or version not in SUPPORTED_INDEX_VERSIONS:
+        return None
+
+    entries = []
+    seen = set()
+    offset = 12
+    previous_path = b""
+    for _ in range(count):
+        entry_offset = offset
+        fields = struct.unpack_from(ENTRY_STAT_FORMAT, data, offset)
+        mtime_ns = fields[2] * 1_000_000_000 + fields[3]
+        mode = fields[6]
+        size = fields[9]
+        flags = struct.unpack_from(">H", data, offset + 60)[0]
+        offset += ENTRY_HEADER_SIZE
+
+        extended_flags = 0
+        if flags & FLAG_EXTENDED:
+            extended_flags = struct.unpack_from(">H", data, offset)[0]
+            offset += 2
+
+        if version == 4:
+            # Paths are prefix-compressed against the previous entry's path
+            strip, offset = _read_offset_varint(data, offset)
+            end = data.index(b"\0", offset)
+            path = previous_path[:len(previous_path) - strip] + data[offset:end]
+            offset = end + 1
+        else:
+            end = data.index(b"\0", offset)
+            path = data[offset:end]
+            # Entries are NUL-padded to a multiple of eight bytes
+            offset = entry_offset + ((end - entry_offset) + 8) // 8 * 8
+        previous_path = path
+
+        if extended_flags & EXTENDED_FLAG_SKIP_WORKTREE:
+            continue
+        if not (stat.S_ISREG(mode) or stat.S_ISLNK(mode) or mode == GITLINK_MODE):
+            continue
+        if flags & FLAG_STAGE_MASK and path in seen:
+            continue
+        seen.add(path)
+        entries.append(
+            IndexEntry(path.decode("utf-8", "surrogateescape"), mtime_ns, size, mode)
+        )
+
+    # A split index keeps most entries in a shared index file
+    while offset + 8 <= len(data) - CHECKSUM_SIZE:
+        extension, extension_size = struct.unpack_from(">4sI", data, offset)
+        if extension == b"link":
+            return None
+        offset += 8 + extension_size
+
+    return entries
+
+
+def list_untracked_files(startpath):
+    """
+    List the untracked files beneath a directory that are not ignored by git.
+
+    Args:
+        startpath (str): A directory within a git work tree.
+
+    Returns:
+        list: '/'-separated paths relative to the startpath, or None if git could not list them.
+              Nested repositories are listed as their directory, with a trailing '/'.
+    """
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "-z", "--others", "--exclude-standard"],
+            cwd=startpath,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    paths = result.stdout.decode("utf-8", "surrogateescape").split("\0")
+    return [path for path in paths if path]
+
+
+def list_git_files(startpath):
+    """
+    List the files beneath a directory of a git work tree - tracked files from the index plus
+    untracked files that are not ignored.
+
+    Args:
+        startpath (str): A directory path.
+
+    Returns:
+        list: Paths relative to the startpath, in the same order as a sorted directory walk,
+              or None if the startpath is not inside a git work tree that can be read.
+    """
+    repository = find_work_tree(startpath)
+    if repository is None:
+        return None
+    work_tree, git_dir = repository
+
+    entries = read_index(git_dir)
+    if entries is None:
+        return None
+    untracked = list_untracked_files(startpath)
+    if untracked is None:
+        return None
+
+    prefix = os.path.relpath(os.path.realpath(startpath), work_tree).replace(os.sep, "/")
+    if prefix == ".":
+        prefix = ""
+    else:
+        prefix += "/"
+    tracked = []
+    links = []
+    repositories = []
+    for path in untracked:
+        if path.endswith("/"):
+            repositories.append(path[:-1])
+        else:
+            links.append(path)
+    for entry in entries:
+        if entry.path.startswith(prefix):
+            path = entry.path[len(prefix):]
+            if entry.mode == GITLINK_MODE:
+                repositories.append(path)
+            elif stat.S_ISLNK(entry.mode):
+                links.append(path)
+            else:
+                tracked.append(path)
+
+    # Git lists symlinks as files whatever they point at; like a directory walk, which does not
+    # follow symlinks to directories, only those to files (or nothing) are kept
+    files = tracked + [path for path in links if not os.path.isdir(os.path.join(startpath, path))]
+
+    for repository in repositories:
+        repository_path = os.path.join(startpath, repository)
+        if not os.path.exists(os.path.join(repository_path, ".git")):
+            # A submodule that is not checked out is an empty directory
+            continue
+        nested = list_git_files(repository_path)
+        if nested is None:
+            return None
+        files.extend(f"{repository}/{path}" for path in nested)
+
+    paths = {path.replace("/", os.sep) for path in files}
+    return sorted(paths, key=walk_order_key)
+
+
+def walk_order_key(path):
+    """
+    Sort key placing paths in the order of a sorted top-down directory walk, where the files
+    of a directory come before the contents of its subdirectories.
+
+    Args:
+        path (str): A relative file path.
+
+    Returns:
+        tuple: The path's directory components and its filename.
+    """
+    parts = path.split(os.sep)
+    return parts[:-1], parts[-1]
@@ -1,4 +1,6 @@
 import os
+import re
+from functools import lru_cache
 
 DEFAULT_IGNORE_PATTERNS = [
     "__pycache__",
@@ -8,6 +10,7 @@ DEFAULT_IGNORE_PATTERNS = [
     ".arcode.cache.pkl",
     ".arcode.checksum.txt",
     ".arcode.embeddings",
+    ".arcode.manifest.json",
     ".env",
     "node_modules",
     ".next",
@@ -44,6 +47,82 @@ def parse_gitignore(gitignore_path, additional_patterns=None):
     return ignore_patterns
 
 
+class IgnoreMatcher:
+    """
+    Matches paths against a set of ignore patterns using a single regular expression compiled
+    from a trie of the patterns, so a check costs time in the length of the path rather than
+    the number of patterns. A path is ignored if it starts with a pattern (optionally after
+    "./"), ends with "/" followed by a pattern, or contains a pattern between two slashes.
+
+    Attributes:
+        patterns (frozenset): The ignore patterns.
+    """
+    def __init__(self, ignore_patterns):
+        self.patterns = frozenset(ignore_patterns)
+        if self.patterns:
+            alternation = _trie_regex(self.patterns)
+            self._regex = re.compile(
+                rf"^(?:\./)?(?:{alternation})|/(?:{alternation})(?:/|\Z)"
+            )
+        else:
+            self._regex = None
+
+    def is_ignored(self, path):
+        """
+        Check if the given path matches any of the ignore patterns.
+
+        Args:
+            path (str): The path to check.
+
+        Returns:
+            bool: True if the path matches any ignore patterns, False otherwise.
+        """
+        return self._regex is not None and self._regex.search(path) is not None
+
+
+def _trie_regex(patterns):
+    """
+    Build a regular expression alternation matching exactly the given literal patterns, with
+    common prefixes factored out.
+    """
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for char in pattern:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return _trie_node_regex(trie)
+
+
+def _trie_node_regex(node):
+    terminal = "" in node
+    branches = [
+        re.escape(char) + _trie_node_regex(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not branches:
+        return ""
+    if len(branches) == 1 and not terminal:
+        return branches[0]
+    alternation = f"(?:{'|'.join(branches)})"
+    return f"{alternation}?" if terminal else alternation
+
+
+@lru_cache(maxsize=32)
+def get_ignore_matcher(ignore_patterns):
+    """
+    Get a compiled matcher for a set of ignore patterns, reusing one built earlier for the same set.
+
+    Args:
+        ignore_patterns (frozenset): The ignore patterns.
+
+    Returns:
+        IgnoreMatcher: The compiled matcher.
+    """
+    return IgnoreMatcher(ignore_patterns)
+
+
 def is_ignored(path, ignore_patterns):
     """
     Check if the given path matches any of the ignore patterns.
@@ -55,12 +134,4 @@ def is_ignored(path, ignore_patterns):
     Returns:
         bool: True if the path matches any ignore patterns, False otherwise.
     """
-    for pattern in ignore_patterns:
-        if (
-            path.endswith(f"/{pattern}")
-            or path.startswith(pattern)
-            or path.startswith(f"./{pattern}")
-            or f"/{pattern}/" in path
-        ):
-            return True
-    return False
+    return get_ignore_matcher(frozenset(ignore_patterns)).is_ignored(path)
@@ -1,44 +1,374 @@
 import base64
+import binascii
+import io
+import math
 import os
 import imghdr
-import tiktoken
+import struct
+from lib.shell_util import LIGHT_ORANGE, RESET_COLOR
 
-def process_image(image_path):
+# Longest side each provider scales images down to before billing them; images sent larger only
+# cost upload time
+OPENAI_MAX_IMAGE_SIDE = 2048
+ANTHROPIC_MAX_IMAGE_SIDE = 1568
+
+# Quality of JPEG and WebP images re-encoded after downscaling
+DOWNSCALE_QUALITY = 90
+
+# Size assumed for images whose dimensions cannot be read, such as remote image URLs
+DEFAULT_IMAGE_SIZE = (1024, 1024)
+
+# Base64 characters of a data URL decoded to look for the image size, enough for the header of
+# any PNG, GIF or WebP file and of most JPEG files
+DATA_URL_HEADER_CHARS = 64 * 1024
+
+# OpenAI: images are fitted within 2048x2048, then scaled so their short side is at most 768,
+# and billed per 512x512 tile on top of a base cost
+OPENAI_MAX_SIDE = 2048
+OPENAI_SHORT_SIDE = 768
+OPENAI_TILE_SIZE = 512
+OPENAI_BASE_TOKENS = 85
+OPENAI_TILE_TOKENS = 170
+# gpt-4o-mini bills images as many more tokens, to match the price of gpt-4o's
+OPENAI_MINI_BASE_TOKENS = 2833
+OPENAI_MINI_TILE_TOKENS = 5667
+
+# Anthropic: images are scaled so their long side is at most 1568 and they cost at most about
+# 1600 tokens, and cost one token per 750 pixels
+ANTHROPIC_MAX_SIDE = 1568
+ANTHROPIC_MAX_TOKENS = 1600
+ANTHROPIC_PIXELS_PER_TOKEN = 750
+
+# Gemini: images with both sides at most 384 cost one tile, larger ones one per 768x768 tile
+GEMINI_SMALL_SIDE = 384
+GEMINI_TILE_SIZE = 768
+GEMINI_TILE_TOKENS = 258
+
+# JPEG start of frame markers, which hold the image size; 0xC4, 0xC8 and 0xCC are other segments
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# JPEG markers with no length or payload
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+class ImageAsset:
+    """
+    An image file's format, dimensions and data URLs, read from the file once per session.
+
+    The format and dimensions are read from the file header when the asset is created, and each
+    data URL is only encoded the first time it is asked for.
+
+    Attributes:
+        path (str): The absolute path of the image file.
+        image_type (str): The image format as named by imghdr, or None if not recognized.
+        size (tuple): The width and height in pixels, or None if they cannot be read.
     """
-    Process an image file and return its base64 encoded data URL.
+    def __init__(self, path, image_type, size):
+        self.path = path
+        self.image_type = image_type
+        self.size = size
+        self._data_urls = {}
+
+    def data_url(self, max_side=None):
+        """
+        Get the image as a base64 encoded data URL.
+
+        Args:
+            max_side (int, optional): Downscale the image so neither side exceeds this, if it is
+                larger and Pillow is installed. Defaults to None, sending the file as is.
+
+        Returns:
+            str: The data URL.
+        """
+        if self.size is None or max_side is None or max(self.size) <= max_side:
+            max_side = None
+        if max_side not in self._data_urls:
+            data = None
+            if max_side is not None:
+                data = _downscale(self.path, max_side)
+            if data is None:
+                with open(self.path, "rb") as image_file:
+                    data = image_file.read()
+            encoded_string = base64.b64encode(data).decode('utf-8')
+            data_url = f"data:image/{self.image_type};base64,{encoded_string}"
+            self._data_urls[max_side] = data_url
+            # Lets the token counter find the size of the image in a message without decoding it
+            _data_url_sizes[data_url] = self.size
+        return self._data_urls[max_side]
+
+# Image assets with the modification time and file size they were read at, keyed by absolute
+# path, so an image edited during the session is read again and its old data URLs dropped
+_image_assets = {}
+
+# Image sizes keyed by the data URLs encoded for them
+_data_url_sizes = {}
+
+def get_image_asset(image_path):
+    """
+    Get the cached asset of an image file, reading its header the first time the file is seen
+    or after it changed.
 
     Args:
         image_path (str): Path to the image file.
 
     Returns:
-        str: Base64 encoded data URL of the image.
+        ImageAsset: The image asset.
 
     Raises:
         FileNotFoundError: If the image file does not exist.
-        ValueError: If the file is not a recognized image format.
     """
-    if not os.path.exists(image_path):
+    path = os.path.abspath(image_path)
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
         raise FileNotFoundError(f"Image file not found: {image_path}")
 
-    image_type = imghdr.what(image_path)
-    if not image_type:
+    stamp = (stat_result.st_mtime_ns, stat_result.st_size)
+    cached = _image_assets.get(path)
+    if cached is not None:
+        cached_stamp, asset = cached
+        if cached_stamp == stamp:
+            return asset
+        for data_url in asset._data_urls.values():
+            _data_url_sizes.pop(data_url, None)
+
+    with open(path, "rb") as image_file:
+        image_type = imghdr.what(None, image_file.read(32))
+        image_file.seek(0)
+        size = _read_image_size(image_file)
+    asset = ImageAsset(path, image_type, size)
+    _image_assets[path] = (stamp, asset)
+    return asset
+
+def get_max_image_side(model):
+    """
+    Get the longest side a model's provider scales images down to, beyond which sending a larger
+    image only costs upload time.
+
+    Args:
+        model (str): The LLM provider/model, e.g. anthropic/claude-3-5-sonnet-20241022.
+
+    Returns:
+        int: The longest useful image side in pixels, or None if the provider's is not known.
+    """
+    model = model.lower()
+    if "claude" in model or model.startswith("anthropic/"):
+        return ANTHROPIC_MAX_IMAGE_SIDE
+    if "gemini" in model:
+        return None
+    return OPENAI_MAX_IMAGE_SIDE
+
+def process_image(image_path, max_side=None):
+    """
+    Process an image file and return its base64 encoded data URL. The data URL is encoded once
+    per session and reused until the file changes.
+
+    Args:
+        image_path (str): Path to the image file.
+        max_side (int, optional): Downscale the image so neither side exceeds this, if Pillow is
+            installed. Defaults to None.
+
+    Returns:
+        str: Base64 encoded data URL of the image.
+
+    Raises:
+        FileNotFoundError: If the image file does not exist.
+        ValueError: If the file is not a recognized image format.
+    """
+    asset = get_image_asset(image_path)
+    if not asset.image_type:
         raise ValueError(f"Unrecognized image format: {image_path}")
 
+    return asset.data_url(max_side)
+
+def get_image_size(image_path):
+    """
+    Get the width and height of a PNG, JPEG, GIF or WebP image from its file header, without
+    reading its pixel data.
+
+    Args:
+        image_path (str): Path to the image file.
+
+    Returns:
+        tuple: The width and height in pixels, or None if the format is not supported or the
+               header is malformed.
+
+    Raises:
+        FileNotFoundError: If the image file does not exist.
+    """
     with open(image_path, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-    
-    return f"data:image/{image_type};base64,{encoded_string}"
+        return _read_image_size(image_file)
+
+def get_data_url_image_size(url):
+    """
+    Get the width and height of the image in a base64 data URL, decoding only as much of it as
+    the image header needs.
+
+    Args:
+        url (str): The data URL.
+
+    Returns:
+        tuple: The width and height in pixels, or None if the URL is not a base64 image data URL
+               or its size cannot be read.
+    """
+    if not url.startswith("data:") or ";base64," not in url[:100]:
+        return None
+    encoded = url[url.index(";base64,") + len(";base64,"):]
+    try:
+        header = base64.b64decode(encoded[:DATA_URL_HEADER_CHARS - DATA_URL_HEADER_CHARS % 4])
+        size = _read_image_size(io.BytesIO(header))
+        if size is None and len(encoded) > DATA_URL_HEADER_CHARS:
+            # A JPEG with large metadata segments before its frame header
+            size = _read_image_size(io.BytesIO(base64.b64decode(encoded)))
+    except (binascii.Error, ValueError):
+        return None
+    return size
+
+def estimate_image_tokens(width, height, model):
+    """
+    Estimate the tokens an image of a given size costs with a model, using the formula of the
+    model's provider: tiles for OpenAI and Gemini models, pixel area for Anthropic models.
+    Models of other providers are estimated with OpenAI's formula.
+
+    Args:
+        width (int): The image width in pixels.
+        height (int): The image height in pixels.
+        model (str): The LLM provider/model, e.g. openai/gpt-4o.
 
-def calculate_image_token_cost(image_path, encoding):
+    Returns:
+        int: The estimated number of tokens.
+    """
+    model = model.lower()
+    width, height = max(width, 1), max(height, 1)
+    if "claude" in model or model.startswith("anthropic/"):
+        scale = min(1, ANTHROPIC_MAX_SIDE / max(width, height))
+        width, height = width * scale, height * scale
+        scale = min(1, math.sqrt(ANTHROPIC_MAX_TOKENS * ANTHROPIC_PIXELS_PER_TOKEN / (width * height)))
+        return max(1, math.ceil(width * scale * height * scale / ANTHROPIC_PIXELS_PER_TOKEN))
+
+    if "gemini" in model:
+        if width <= GEMINI_SMALL_SIDE and height <= GEMINI_SMALL_SIDE:
+            return GEMINI_TILE_TOKENS
+        return math.ceil(width / GEMINI_TILE_SIZE) * math.ceil(height / GEMINI_TILE_SIZE) * GEMINI_TILE_TOKENS
+
+    scale = min(1, OPENAI_MAX_SIDE / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1, OPENAI_SHORT_SIDE / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / OPENAI_TILE_SIZE) * math.ceil(height / OPENAI_TILE_SIZE)
+    if "gpt-4o-mini" in model:
+        return OPENAI_MINI_BASE_TOKENS + OPENAI_MINI_TILE_TOKENS * tiles
+    return OPENAI_BASE_TOKENS + OPENAI_TILE_TOKENS * tiles
+
+def calculate_image_token_cost(image_path, model):
     """
-    Calculate the token cost of an image for a given encoding.
+    Calculate the token cost of an image for a given model from its dimensions, read from the
+    file header of its cached asset. Images whose size cannot be read are estimated at
+    DEFAULT_IMAGE_SIZE.
 
     Args:
         image_path (str): Path to the image file.
-        encoding (tiktoken.Encoding): The encoding to use for token calculation.
+        model (str): The LLM provider/model the image is sent to.
 
     Returns:
         int: The number of tokens used by the image.
+
+    Raises:
+        FileNotFoundError: If the image file does not exist.
     """
-    image_data = process_image(image_path)
-    return len(encoding.encode(image_data))
\ No newline at end of file
+    size = get_image_asset(image_path).size or DEFAULT_IMAGE_SIZE
+    return estimate_image_tokens(*size, model)
+
+def calculate_image_url_token_cost(url, model):
+    """
+    Calculate the token cost of an image URL in a message for a given model. The size of a data
+    URL's image is taken from the asset it was encoded from, or else read from its header; other
+    URLs are estimated at DEFAULT_IMAGE_SIZE.
+
+    Args:
+        url (str): The image URL.
+        model (str): The LLM provider/model the image is sent to.
+
+    Returns:
+        int: The number of tokens used by the image.
+    """
+    size = _data_url_sizes.get(url) or get_data_url_image_size(url) or DEFAULT_IMAGE_SIZE
+    return estimate_image_tokens(*size, model)
+
+def _downscale(path, max_side):
+    try:
+        from PIL import Image
+    except ImportError:
+        print(f"{LIGHT_ORANGE} 💁‍♀️ Install Pillow to downscale images, sending {path} as is.{RESET_COLOR}")
+        return None
+
+    try:
+        with Image.open(path) as image:
+            if getattr(image, "n_frames", 1) > 1:
+                # Downscaling would drop the frames of an animation
+                return None
+            image_format = image.format
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            output = io.BytesIO()
+            if image_format in ("JPEG", "WEBP"):
+                image.save(output, format=image_format, quality=DOWNSCALE_QUALITY)
+            else:
+                image.save(output, format=image_format)
+    except (OSError, ValueError) as e:
+        # Formats Pillow cannot read or write, and truncated files, are sent as they are
+        print(f"{LIGHT_ORANGE} 💁‍♀️ Could not downscale {path} ({e}), sending it as is.{RESET_COLOR}")
+        return None
+    return output.getvalue()
+
+def _read_image_size(stream):
+    header = stream.read(30)
+    if header.startswith(b"\x89PNG\r\n\x1a\n") and header[12:16] == b"IHDR":
+        return struct.unpack(">II", header[16:24])
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", header[6:10])
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return _webp_size(header)
+    if header[:2] == b"\xff\xd8":
+        stream.seek(2)
+        return _jpeg_size(stream)
+    return None
+
+def _webp_size(header):
+    chunk = header[12:16]
+    if chunk == b"VP8 " and header[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", header[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and header[20:21] == b"\x2f":
+        bits = int.from_bytes(header[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(header[24:27], "little") + 1, int.from_bytes(header[27:30], "little") + 1
+    return None
+
+def _jpeg_size(stream):
+    # Walk the segments up to the start of frame, seeking past each one's payload
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = stream.read(1)
+        while marker == b"\xff":
+            marker = stream.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker in JPEG_STANDALONE_MARKERS or marker == 0x00:
+            continue
+        if marker == 0xD9 or marker == 0xDA:
+            return None
+        length_bytes = stream.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker in JPEG_SOF_MARKERS:
+            frame = stream.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        stream.seek(length - 2, os.SEEK_CUR)
@@ -0,0 +1,226 @@
+"""
+This module provides an offline lexical retrieval engine for focused mode, ranking the chunks of
+a codebase's files against a query with BM25 instead of a remote embedding model.
+
+Text is tokenized with code in mind: identifiers are kept whole and also split into their
+camelCase and snake_case parts, so a query for "token count" finds countTokens and
+token_count alike. The inverted index is kept under the embeddings cache directory and, like the
+vector index, only files whose content hash changed are tokenized again.
+
+Classes:
+    LexicalIndex: A persistent BM25 inverted index over the chunks of a codebase's files.
+
+Functions:
+    tokenize: Splits text into lowercase search terms.
+    get_lexical_index: Gets the lexical index of a codebase.
+
+Constants:
+    INDEX_VERSION: Format version of the index file; indexes of any other version are rebuilt.
+    BM25_K1: BM25 term frequency saturation.
+    BM25_B: BM25 document length normalisation.
+"""
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+INDEX_VERSION = 3
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+LEXICAL_INDEX_FILENAME = "lexical.json"
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+# Splits identifier parts at case changes, keeping acronyms together: parseHTTPResponse2 ->
+# parse, HTTP, Response, 2
+WORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+def tokenize(text):
+    """
+    Split text into lowercase search terms.
+
+    Each identifier yields itself and, when it is made of several words, each of its camelCase
+    and snake_case parts. Terms shorter than two characters are dropped.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        list: The terms, in order of appearance.
+    """
+    terms = []
+    for identifier in IDENTIFIER_PATTERN.findall(text):
+        identifier_lower = identifier.strip("_").lower()
+        if len(identifier_lower) > 1:
+            terms.append(identifier_lower)
+        parts = WORD_PATTERN.findall(identifier)
+        if len(parts) > 1:
+            terms.extend(part.lower() for part in parts if len(part) > 1)
+    return terms
+
+
+class LexicalIndex:
+    """
+    A persistent BM25 inverted index over the chunks of a codebase's files.
+
+    Attributes:
+        path (str): The file the index is stored in.
+        files (dict): Entries keyed by file path, each holding the file's content "hash" and the
+            ids of its chunk "docs".
+        docs (list): The file path, length in terms, and first and last line of each chunk,
+            indexed by doc id.
+        postings (dict): For each term, a flat list of doc id and term frequency pairs, i.e.
+            [doc id, tf, doc id, tf, ...].
+    """
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.docs = []
+        self.postings = {}
+
+    def load(self):
+        """
+        Load the index from disk. A missing, corrupt or outdated index loads as empty and is
+        rebuilt by the next update.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return
+        if index.get("version") != INDEX_VERSION:
+            return
+        self.files = index["files"]
+        self.docs = index["docs"]
+        self.postings = index["postings"]
+
+    def save(self):
+        """
+        Write the index to disk, replacing the previous one atomically.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        index = {
+            "version": INDEX_VERSION,
+            "files": self.files,
+            "docs": self.docs,
+            "postings": self.postings,
+        }
+        # json.dumps runs the C encoder, unlike json.dump streaming to a file
+        data = json.dumps(index, separators=(",", ":"))
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as index_file:
+            index_file.write(data)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def update(self, files, split):
+        """
+        Bring the index up to date with the given files and save it if anything changed.
+
+        Args:
+            files (list): Files from the codebase scan, as FileRecord objects. Only the files
+                whose content hash differs from the indexed one have their contents read.
+            split (callable): Splits a file, given its path and contents, into a list of Chunk
+                tuples.
+
+        Returns:
+            bool: True if the index changed, False otherwise.
+        """
+        hashes = {file.path: file.content_hash for file in files}
+        kept = {
+            path for path, entry in self.files.items()
+            if hashes.get(path) == entry["hash"]
+        }
+        changed = [file for file in files if file.path not in kept]
+        if not changed and len(kept) == len(self.files):
+            return False
+
+        # Renumber the docs of unchanged files, dropping the rest
+        remap = {}
+        docs = []
+        for doc_id, doc in enumerate(self.docs):
+            if doc[0] in kept:
+                remap[doc_id] = len(docs)
+                docs.append(doc)
+        postings = {}
+        for term, term_postings in self.postings.items():
+            kept_postings = []
+            for i in range(0, len(term_postings), 2):
+                doc_id = remap.get(term_postings[i])
+                if doc_id is not None:
+                    kept_postings += (doc_id, term_postings[i + 1])
+            if kept_postings:
+                postings[term] = kept_postings
+        files_index = {
+            path: {"hash": self.files[path]["hash"], "docs": [remap[doc_id] for doc_id in self.files[path]["docs"]]}
+            for path in kept
+        }
+
+        for file in changed:
+            doc_ids = []
+            for chunk in split(file.path, file["data"]):
+                counts = Counter(tokenize(chunk.text))
+                doc_id = len(docs)
+                docs.append([file.path, sum(counts.values()), chunk.start_line, chunk.end_line])
+                for term, tf in counts.items():
+                    postings.setdefault(term, []).extend((doc_id, tf))
+                doc_ids.append(doc_id)
+            files_index[file.path] = {"hash": hashes[file.path], "docs": doc_ids}
+
+        self.files = files_index
+        self.docs = docs
+        self.postings = postings
+        self.save()
+        return True
+
+    def search(self, query, k):
+        """
+        Find the chunks that best match a query by BM25 score.
+
+        Args:
+            query (str): The query text.
+            k (int): Maximum number of chunks to return.
+
+        Returns:
+            list: Tuples of the file path each chunk belongs to, its BM25 score and its (start,
+                  end) line range, best match first. Chunks sharing no terms with the query are
+                  not returned.
+        """
+        if not self.docs or k <= 0:
+            return []
+
+        doc_count = len(self.docs)
+        average_length = sum(doc[1] for doc in self.docs) / doc_count or 1
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            doc_frequency = len(term_postings) // 2
+            idf = math.log(1 + (doc_count - doc_frequency + 0.5) / (doc_frequency + 0.5))
+            for doc_id, tf in zip(term_postings[::2], term_postings[1::2]):
+                length_norm = 1 - BM25_B + BM25_B * self.docs[doc_id][1] / average_length
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+
+        best = heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            (self.docs[doc_id][0], score, (self.docs[doc_id][2], self.docs[doc_id][3]))
+            for doc_id, score in best
+        ]
+
+
+def get_lexical_index(cache_dir):
+    """
+    Get the lexical index of a codebase, loaded from disk.
+
+    Args:
+        cache_dir (str): The codebase's embeddings cache directory.
+
+    Returns:
+        LexicalIndex: The loaded index.
+    """
+    index = LexicalIndex(os.path.join(cache_dir, "index", LEXICAL_INDEX_FILENAME))
+    index.load()
+    return index
@@ -1,13 +1,42 @@
-import tiktoken
+import litellm
 from litellm import completion, embedding
 from config import get_api_keys
 import requests
 import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from lib.shell_util import LIGHT_ORANGE, LIGHT_RED, RESET_COLOR
+from lib.image_util import calculate_image_url_token_cost
+from lib.tokenization import count_tokens, get_model_encoding
+
+
+EMBEDDING_BATCH_TOKENS = 100000
+EMBEDDING_BATCH_SIZE = 2048
+EMBEDDING_CONCURRENCY = 4
+EMBEDDING_MAX_RETRIES = 5
+EMBEDDING_MAX_BACKOFF = 30
+
+RETRYABLE_EMBEDDING_ERRORS = (
+    litellm.RateLimitError,
+    litellm.APIConnectionError,
+    litellm.Timeout,
+    litellm.ServiceUnavailableError,
+    litellm.InternalServerError,
+)
 
 
 class LitellmEmbeddings:
-    def __init__(self, model, api_key, api_base=None, api_version=None):
+    def __init__(
+        self,
+        model,
+        api_key,
+        api_base=None,
+        api_version=None,
+        batch_tokens=EMBEDDING_BATCH_TOKENS,
+        concurrency=EMBEDDING_CONCURRENCY,
+        max_retries=EMBEDDING_MAX_RETRIES,
+    ):
         """
         Initialize LitellmEmbeddings.
 
@@ -16,34 +45,42 @@ class LitellmEmbeddings:
             api_key (str): API key for authentication.
             api_base (str, optional): Base URL for the API. Defaults to None.
             api_version (str, optional): Version of the API to use. Defaults to None.
+            batch_tokens (int, optional): Maximum number of tokens sent in one embedding
+                request. Defaults to EMBEDDING_BATCH_TOKENS.
+            concurrency (int, optional): Maximum number of embedding requests in flight at
+                once. Defaults to EMBEDDING_CONCURRENCY.
+            max_retries (int, optional): Number of times a request failing with a rate limit,
+                timeout or server error is retried. Defaults to EMBEDDING_MAX_RETRIES.
         """
         self.model = model
         self.api_key = api_key
         self.api_base = api_base
         self.api_version = api_version
+        self.batch_tokens = batch_tokens
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._encoding = None
 
     def embed_documents(self, texts):
         """
         Embed a list of documents.
 
+        The texts are sent in batches of at most batch_tokens tokens, with up to concurrency
+        batches in flight at once.
+
         Args:
             texts (list): List of document texts to embed.
 
         Returns:
-            list: List of embeddings for the provided texts.
+            list: List of embeddings for the provided texts, in the same order.
         """
-        if self.model.startswith("azure/"):
-            f"{self.api_base}/{self.api_version}/embeddings"
-
-        response = embedding(
-            model=self.model,
-            input=texts,
-            api_key=self.api_key,
-            api_base=self.api_base,
-            api_version=self.api_version,
-        )
-        embeddings = [item["embedding"] for item in response["data"]]
-        return embeddings
+        batches = self._batch(texts)
+        if self.concurrency > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as executor:
+                results = list(executor.map(self._embed_batch, batches))
+        else:
+            results = [self._embed_batch(batch) for batch in batches]
+        return [embedding_result for batch in results for embedding_result in batch]
 
     def embed_query(self, query):
         """
@@ -55,18 +92,67 @@ class LitellmEmbeddings:
         Returns:
             list: Embedding for the query.
         """
-        if self.model.startswith("azure/"):
-            f"{self.api_base}/{self.api_version}/embeddings"
+        return self._embed_batch([query])[0]
+
+    def _batch(self, texts):
+        """
+        Group texts into batches that fit within the per-request token and input limits.
+
+        A text exceeding the token limit on its own is sent in a batch by itself.
+
+        Args:
+            texts (list): List of texts.
+
+        Returns:
+            list: Lists of texts, in order.
+        """
+        if self._encoding is None:
+            self._encoding = get_model_encoding(self.model)
+
+        batches = []
+        batch = []
+        batch_tokens = 0
+        for text in texts:
+            tokens = len(self._encoding.encode(text, disallowed_special=()))
+            if batch and (
+                batch_tokens + tokens > self.batch_tokens
+                or len(batch) >= EMBEDDING_BATCH_SIZE
+            ):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _embed_batch(self, texts):
+        """
+        Embed one batch of texts, retrying with exponential backoff on transient errors.
 
-        response = embedding(
-            model=self.model,
-            input=[query],
-            api_key=self.api_key,
-            api_base=self.api_base,
-            api_version=self.api_version,
-        )
-        embedding_result = response["data"][0]["embedding"]
-        return embedding_result
+        Args:
+            texts (list): List of texts.
+
+        Returns:
+            list: List of embeddings for the texts.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = embedding(
+                    model=self.model,
+                    input=texts,
+                    api_key=self.api_key,
+                    api_base=self.api_base,
+                    api_version=self.api_version,
+                )
+                return [item["embedding"] for item in response["data"]]
+            except RETRYABLE_EMBEDDING_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(EMBEDDING_MAX_BACKOFF, 2 ** attempt) * random.uniform(0.5, 1)
+                print(f"{LIGHT_ORANGE}Embedding request failed ({type(e).__name__}), retrying in {delay:.1f}s...{RESET_COLOR}")
+                time.sleep(delay)
 
 
 def create_litellm_client(model):
@@ -86,7 +172,12 @@ def create_litellm_client(model):
 
 
 def create_litellm_client_embeddings(
-    model, api_key, api_base=None, api_version=None
+    model,
+    api_key,
+    api_base=None,
+    api_version=None,
+    batch_tokens=EMBEDDING_BATCH_TOKENS,
+    concurrency=EMBEDDING_CONCURRENCY,
 ):
     """
     Create a LiteLLM client for embeddings.
@@ -96,11 +187,22 @@ def create_litellm_client_embeddings(
         api_key (str): API key for authentication.
         api_base (str, optional): Base URL for the API. Defaults to None.
         api_version (str, optional): Version of the API to use. Defaults to None.
+        batch_tokens (int, optional): Maximum number of tokens sent in one embedding request.
+            Defaults to EMBEDDING_BATCH_TOKENS.
+        concurrency (int, optional): Maximum number of embedding requests in flight at once.
+            Defaults to EMBEDDING_CONCURRENCY.
 
     Returns:
         LitellmEmbeddings: The LitellmEmbeddings instance.
     """
-    return LitellmEmbeddings(model, api_key, api_base, api_version)
+    return LitellmEmbeddings(
+        model,
+        api_key,
+        api_base,
+        api_version,
+        batch_tokens=batch_tokens,
+        concurrency=concurrency,
+    )
 
 
 def calculate_token_count(model, messages, encoding):
@@ -128,32 +230,32 @@ def calculate_token_count(model, messages, encoding):
             if isinstance(message["content"], list):
                 for content_item in message["content"]:
                     if content_item["type"] == "text":
-                        tokens = len(encoding.encode(content_item["text"], disallowed_special=()))
+                        tokens = count_tokens(encoding, content_item["text"])
                         token_counts["content_tokens"] += tokens
                         token_counts["input_tokens"] += tokens
                     elif content_item["type"] == "image_url":
                         image_url = content_item["image_url"]["url"]
-                        tokens = len(encoding.encode(image_url, disallowed_special=()))
+                        tokens = calculate_image_url_token_cost(image_url, model)
                         token_counts["image_tokens"] += tokens
                         token_counts["input_tokens"] += tokens
             else:
-                tokens = len(encoding.encode(message["content"], disallowed_special=()))
+                tokens = count_tokens(encoding, message["content"])
                 token_counts["content_tokens"] += tokens
                 token_counts["input_tokens"] += tokens
         else:
             if isinstance(message["content"], list):
                 for content_item in message["content"]:
                     if content_item["type"] == "text":
-                        tokens = len(encoding.encode(content_item["text"], disallowed_special=()))
+                        tokens = count_tokens(encoding, content_item["text"])
                         token_counts["content_tokens"] += tokens
                         token_counts["output_tokens"] += tokens
                     elif content_item["type"] == "image_url":
                         image_url = content_item["image_url"]["url"]
-                        tokens = len(encoding.encode(image_url, disallowed_special=()))
+                        tokens = calculate_image_url_token_cost(image_url, model)
                         token_counts["image_tokens"] += tokens
                         token_counts["output_tokens"] += tokens
             else:
-                tokens = len(encoding.encode(message["content"], disallowed_special=()))
+                tokens = count_tokens(encoding, message["content"])
                 token_counts["content_tokens"] += tokens
                 token_counts["output_tokens"] += tokens
 
@@ -162,11 +264,7 @@ def calculate_token_count(model, messages, encoding):
 
 
 def raw_token_count(text, model):
-    try:
-        encoding = tiktoken.encoding_for_model(model.split("/")[-1])
-    except Exception as e:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text, disallowed_special=()))
+    return count_tokens(get_model_encoding(model), text)
 
 
 def get_available_models(filter_text=None):
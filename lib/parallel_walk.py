@@ -0,0 +1,133 @@
+"""
+This module walks a directory tree with a pool of threads, for filesystems where listing a
+directory is dominated by latency rather than CPU (NFS, overlay filesystems, network mounts).
+
+Each worker keeps its own deque of directories to list. A worker takes the most recently
+discovered directory from its own deque and, when that runs dry, steals the oldest directory from
+another worker's deque, so wide and deep trees keep every worker busy. Files are streamed to the
+consumer as they are found, together with the stat result taken from their directory entry, so
+filtering and reading can begin before the walk finishes.
+
+Functions:
+    parallel_walk: Walks a directory tree with a pool of threads, yielding files as they are found.
+"""
+import os
+import queue
+import threading
+from collections import deque
+
+_DONE = object()
+
+
+def parallel_walk(startpath, should_descend, workers=8):
+    """
+    Walk a directory tree with a pool of threads, yielding files as they are found.
+
+    Like os.walk, symbolic links to directories are not followed. Files are yielded in no
+    particular order.
+
+    Args:
+        startpath (str): The starting directory path.
+        should_descend (callable): Called with each directory's path relative to the startpath,
+            returning False to prune that directory from the walk.
+        workers (int, optional): Number of threads listing directories. Defaults to 8.
+
+    Yields:
+        tuple: Each file's path relative to the startpath, and its os.stat_result or None if
+               it could not be stat'd.
+    """
+    results = queue.Queue()
+    deques = [deque() for _ in range(workers)]
+    deques[0].append("")
+    state = {"pending": 1, "error": None}
+    lock = threading.Lock()
+    work_available = threading.Condition(lock)
+    stop = threading.Event()
+
+    def take(index):
+        try:
+            return deques[index].pop()
+        except IndexError:
+            pass
+        for offset in range(1, workers):
+            try:
+                return deques[(index + offset) % workers].popleft()
+            except IndexError:
+                continue
+        return None
+
+    def list_directory(index, rel_dir):
+        full_dir = os.path.join(startpath, rel_dir) if rel_dir else startpath
+        try:
+            with os.scandir(full_dir) as iterator:
+                entries = list(iterator)
+        except OSError:
+            return
+
+        subdirs = []
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if not entry.is_symlink() and should_descend(rel_path):
+                    subdirs.append(rel_path)
+                continue
+            try:
+                stat_result = entry.stat()
+            except OSError:
+                stat_result = None
+            results.put((rel_path, stat_result))
+
+        if subdirs:
+            with work_available:
+                state["pending"] += len(subdirs)
+                deques[index].extend(subdirs)
+                work_available.notify_all()
+
+    def worker(index):
+        while not stop.is_set():
+            rel_dir = take(index)
+            if rel_dir is None:
+                with work_available:
+                    if state["pending"] == 0:
+                        return
+                    work_available.wait(timeout=0.05)
+                continue
+            try:
+                list_directory(index, rel_dir)
+            except Exception as error:
+                with lock:
+                    state["error"] = state["error"] or error
+                stop.set()
+            finally:
+                with work_available:
+                    state["pending"] -= 1
+                    if state["pending"] == 0 or stop.is_set():
+                        results.put(_DONE)
+                        work_available.notify_all()
+
+    threads = [
+        threading.Thread(target=worker, args=(index,), daemon=True)
+        for index in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stop.set()
+        with work_available:
+            work_available.notify_all()
+        for thread in threads:
+            thread.join()
+
+    if state["error"] is not None:
+        raise state["error"]
@@ -21,7 +21,9 @@ from lib.shell_util import (
 from lib.embedding_util import get_top_relevant_files
 from lib.litellm_client import raw_token_count
 from lib.uploaded_file_filter import UploadedFileFilter
-from lib.image_util import process_image
+from lib.image_util import get_max_image_side, process_image
+from lib.binary_classifier import binary_classifier
+from lib.file_manifest import get_manifest
 
 
 def build_prompt(args, requirements, files):
@@ -67,7 +69,8 @@ def build_prompt(args, requirements, files):
             content.append({"type": "text", "text": "\nImages:"})
             for image_path in args.images:
                 try:
-                    image_data = process_image(image_path)
+                    max_side = get_max_image_side(args.model) if args.downscale_images else None
+                    image_data = process_image(image_path, max_side)
                     content.append({"type": "text", "text": f"\nImage: {image_path}"})
                     content.append({"type": "image_url", "image_url": {"url": image_data}})
                 except Exception as e:
@@ -116,24 +119,57 @@ def build_fileset(args, requirements):
     upload_filter = UploadedFileFilter(
         startpath,
         args.ignore,
-        args.max_file_size
+        args.max_file_size,
+        manifest=get_manifest(startpath),
     )
 
-    all_files = get_files(startpath, upload_filter)
+    # Focused mode only needs the contents of the files it selects
+    all_files = get_files(
+        startpath, upload_filter, args.scan_workers, lazy=bool(args.focused)
+    )
+
+    if args.debug:
+        print_binary_detection_stats()
 
     if args.focused:
+        # Implementation responses replace whole files, so they need the whole files as context
+        context = args.focused_context if args.mode == "question" else "file"
+        if context != args.focused_context:
+            print(f"{LIGHT_ORANGE} ℹ️  Chunk context only applies in question mode, sending whole files{RESET_COLOR}")
         files_to_upload = get_top_relevant_files(
             startpath=startpath,
-            upload_filter=upload_filter,
+            files=all_files,
             query=requirements,
             num_files=args.focused,
             model_embedding=args.model_embedding,
+            batch_tokens=args.embedding_batch_tokens,
+            concurrency=args.embedding_concurrency,
+            min_score=args.focused_min_score,
+            retrieval=args.retrieval,
+            context=context,
+            cache_max_bytes=args.embedding_cache_size * 1024 * 1024,
+            ann_threshold=args.ann_threshold or None,
+            ann_probes=args.ann_probes,
         )
     else:
         files_to_upload = all_files
 
+    # Record hashes of files read after the scan finished
+    upload_filter.manifest.save()
+
     return (all_files, files_to_upload, startpath)
 
+def print_binary_detection_stats():
+    """
+    Print how many binary checks of the latest scan were settled by each decision path.
+    """
+    stats = binary_classifier.get_stats()
+    print(f"\n{LIGHT_ORANGE} 🔍 BINARY DETECTION: {RESET_COLOR}")
+    for decision in ["manifest", "extension", "cache", "sniff", "magic"]:
+        print(
+            f"    {LIGHT_PINK}* {LIGHT_BLUE}{decision} {LIGHT_GREEN}({stats.get(decision, 0):,}){RESET_COLOR}"
+        )
+
 def print_focused_file_output(files):
     """
     Print the focused file output.
@@ -142,7 +178,7 @@ def print_focused_file_output(files):
         files (list): The focused file list.
     """
     print(
-        f"\n{LIGHT_ORANGE} 🔬  FOCUSING ON {len(files)} MOST RELEVANT FILE CHUNKS: {RESET_COLOR}"
+        f"\n{LIGHT_ORANGE} 🔬  FOCUSING ON {len(files)} MOST RELEVANT FILES: {RESET_COLOR}"
     )
     for file in files:
         print_focused_file_output_line(file)
@@ -155,9 +191,14 @@ def print_focused_file_output_line(file):
         file (dict): The focused file dictionary.
     """
     path = file["path"]
-    score = round(file["score"], 2)
+    # Significant digits rather than decimal places, so hybrid search's fused scores of around
+    # 0.016 to 0.033 stay distinguishable
+    score = f"{file['score']:.3g}"
+    lines = ", ".join(f"{start}-{end}" for start, end in file.get("lines", []))
+    if lines:
+        lines = f" {LIGHT_PINK}lines {lines}"
     print(
-        f"    {LIGHT_PINK}* {LIGHT_BLUE}{path} {LIGHT_GREEN}({score}){RESET_COLOR}"
+        f"    {LIGHT_PINK}* {LIGHT_BLUE}{path} {LIGHT_GREEN}({score}){lines}{RESET_COLOR}"
     )
 
 def print_inclusive_file_output(args, files):
@@ -174,6 +215,10 @@ def print_inclusive_file_output(args, files):
     for file in files:
         print_inclusive_file_output_line(args, file)
 
+    if args.debug:
+        # Persist the token counts recorded while printing
+        get_manifest(args.dir).save()
+
 def print_inclusive_file_output_line(args, file):
     """
     Print the inclusive file output.
@@ -183,7 +228,11 @@ def print_inclusive_file_output_line(args, file):
     """
     path = file["path"]
     if args.debug:
-        tokens = raw_token_count(file["data"], args.model)
+        manifest = get_manifest(args.dir)
+        tokens = manifest.get_tokens(path, args.model)
+        if tokens is None:
+            tokens = raw_token_count(file["data"], args.model)
+            manifest.set_tokens(path, args.model, tokens)
         print(
             f"    {LIGHT_PINK}* {LIGHT_BLUE}{path} {LIGHT_RED}({tokens:,}){RESET_COLOR}"
         )
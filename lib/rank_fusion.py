@@ -0,0 +1,43 @@
+"""
+This module merges rankings produced by different retrieval methods with reciprocal rank fusion.
+
+Reciprocal rank fusion scores each item by the sum of 1 / (k + rank) over the rankings it
+appears in. It only uses ranks, so rankings whose scores are on unrelated scales - BM25 scores
+and cosine similarities - can be merged without calibrating them.
+
+Functions:
+    reciprocal_rank_fusion: Merges rankings of files into one ranking.
+
+Constants:
+    RRF_K: Rank offset damping the influence of the very top ranks.
+"""
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(rankings, limit, k=RRF_K):
+    """
+    Merge rankings of files into one ranking.
+
+    A file ranked several times in one ranking, e.g. for several of its chunks, counts at its
+    best rank.
+
+    Args:
+        rankings (list): Rankings to merge, each a list of tuples starting with a file path,
+            ordered best first.
+        limit (int): Maximum number of files to return.
+        k (int, optional): Rank offset. Defaults to RRF_K.
+
+    Returns:
+        list: Tuples of file path and fused score, best first. Each file appears once.
+    """
+    fused = {}
+    for ranking in rankings:
+        seen = set()
+        for path, *_ in ranking:
+            if path in seen:
+                continue
+            seen.add(path)
+            fused[path] = fused.get(path, 0.0) + 1.0 / (k + len(seen))
+
+    ranked = sorted(fused.items(), key=lambda item: (-item[1], item[0]))
+    return ranked[:limit]
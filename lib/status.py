@@ -24,6 +24,7 @@ def print_configuration(args, requirements):
         LIGHT_PINK + "         Max tokens: " + LIGHT_BLUE + str(args.max_tokens) + RESET_COLOR + "\n" +
         LIGHT_PINK + "        Temperature: " + LIGHT_BLUE + str(args.temperature) + RESET_COLOR + "\n" +
         LIGHT_PINK + "    Embedding Model: " + LIGHT_BLUE + str(args.model_embedding) + RESET_COLOR + "\n" +
+        LIGHT_PINK + "          Retrieval: " + LIGHT_BLUE + str(args.retrieval) + RESET_COLOR + "\n" +
         LIGHT_PINK + "         Auto-write: " + LIGHT_BLUE + str(args.auto_write) + RESET_COLOR + "\n" +
         LIGHT_PINK + "            Focused: " + LIGHT_BLUE + str(args.focused) + RESET_COLOR + "\n" +
         LIGHT_PINK + "             Ignore: " + LIGHT_BLUE + str(args.ignore) + RESET_COLOR + "\n" +
@@ -1,25 +1,49 @@
-import tiktoken
-from lib.image_util import calculate_image_token_cost
+import hashlib
+
+from lib.image_util import calculate_image_token_cost, calculate_image_url_token_cost
 from lib.status import print_tokens as _print_tokens
-from lib.shell_util import (
-    LIGHT_BLUE,
-    RESET_COLOR,
-)
+from lib.tokenization import count_tokens, get_model_encoding
+
+MESSAGE_COUNT_KEYS = ("content_tokens", "image_tokens", "input_tokens", "output_tokens")
+
+
+def _message_parts(message):
+    content = message["content"]
+    if not isinstance(content, list):
+        return (("text", content),)
+    parts = []
+    for content_item in content:
+        if content_item["type"] == "text":
+            parts.append(("text", content_item["text"]))
+        elif content_item["type"] == "image_url":
+            parts.append(("image_url", content_item["image_url"]["url"]))
+    return tuple(parts)
+
+
+def _same_parts(counted_parts, parts):
+    return len(counted_parts) == len(parts) and all(
+        counted_type == part_type and counted_text is text
+        for (counted_type, counted_text), (part_type, text) in zip(counted_parts, parts)
+    )
+
 
 class TokenCounter:
+    """
+    Counts the tokens of a conversation incrementally. The counts of the messages counted last
+    time are kept with running totals, so only messages added since are counted, and the token
+    count of each text is cached by content hash, so text seen before, such as files reloaded
+    unchanged into a later message, is never encoded again.
+    """
     def __init__(self, model):
         self.model = model
         self.encoding = self._get_encoding(model)
+        self._text_tokens = {}
+        self._counted_messages = []
+        self._conversation_counts = dict.fromkeys(MESSAGE_COUNT_KEYS, 0)
         self.reset_counts()
 
     def _get_encoding(self, model):
-        try:
-            return tiktoken.encoding_for_model(model.split("/")[-1])
-        except Exception:
-            print(
-                f"{LIGHT_BLUE} 💁‍♀️ Defaulting to 'cl100k_base' - no model-specific encoding for {model}.{RESET_COLOR}"
-            )
-            return tiktoken.get_encoding("cl100k_base")
+        return get_model_encoding(model)
 
     def reset_counts(self):
         self.token_counts = {
@@ -32,39 +56,60 @@ class TokenCounter:
         }
 
     def count_tokens(self, messages):
+        # Messages already counted are recognised by their parts being the very same objects,
+        # without hashing or comparing their text
+        unchanged = 0
+        for (role, parts, _), message in zip(self._counted_messages, messages):
+            if role != message["role"] or not _same_parts(parts, _message_parts(message)):
+                break
+            unchanged += 1
+
+        for _, _, counts in self._counted_messages[unchanged:]:
+            for key, value in counts.items():
+                self._conversation_counts[key] -= value
+        del self._counted_messages[unchanged:]
+
+        for message in messages[unchanged:]:
+            parts = _message_parts(message)
+            counts = self._count_message(message["role"], parts)
+            for key, value in counts.items():
+                self._conversation_counts[key] += value
+            self._counted_messages.append((message["role"], parts, counts))
+
         self.reset_counts()
+        self.token_counts.update(self._conversation_counts)
+        self.update_total_tokens()
+        return self.token_counts
 
-        for message in messages:
-            if isinstance(message["content"], list):
-                for content_item in message["content"]:
-                    if content_item["type"] == "text":
-                        tokens = len(self.encoding.encode(content_item["text"], disallowed_special=()))
-                        self.token_counts["content_tokens"] += tokens
-                        if message["role"] == "user":
-                            self.token_counts["input_tokens"] += tokens
-                        else:
-                            self.token_counts["output_tokens"] += tokens
-                    elif content_item["type"] == "image_url":
-                        tokens = len(self.encoding.encode(content_item["image_url"]["url"], disallowed_special=()))
-                        self.token_counts["image_tokens"] += tokens
-                        self.token_counts["input_tokens"] += tokens
-                        # Image tokens are counted separately and not added to input/output here
-                        pass
-            else:
-                tokens = len(self.encoding.encode(message["content"], disallowed_special=()))
-                self.token_counts["content_tokens"] += tokens
-                if message["role"] == "user":
-                    self.token_counts["input_tokens"] += tokens
+    def _count_message(self, role, parts):
+        counts = dict.fromkeys(MESSAGE_COUNT_KEYS, 0)
+        for part_type, text in parts:
+            if part_type == "image_url":
+                # Images are costed from their dimensions rather than by tokenizing the data URL
+                tokens = calculate_image_url_token_cost(text, self.model)
+                counts["image_tokens"] += tokens
+                counts["input_tokens"] += tokens
+            elif part_type == "text":
+                tokens = self._count_text(text)
+                counts["content_tokens"] += tokens
+                if role == "user":
+                    counts["input_tokens"] += tokens
                 else:
-                    self.token_counts["output_tokens"] += tokens
+                    counts["output_tokens"] += tokens
+        return counts
 
-        self.update_total_tokens()
-        return self.token_counts
+    def _count_text(self, text):
+        key = hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest()
+        tokens = self._text_tokens.get(key)
+        if tokens is None:
+            tokens = count_tokens(self.encoding, text)
+            self._text_tokens[key] = tokens
+        return tokens
 
     def add_initial_image_tokens(self, image_paths):
         total_image_tokens = 0
         for image_path in image_paths:
-            image_tokens = calculate_image_token_cost(image_path, self.encoding)
+            image_tokens = calculate_image_token_cost(image_path, self.model)
             total_image_tokens += image_tokens
         self.token_counts["image_tokens"] += total_image_tokens
         self.token_counts["input_tokens"] += total_image_tokens
@@ -75,7 +120,7 @@ class TokenCounter:
     def add_image_tokens(self, image_paths):
         total_image_tokens = 0
         for image_path in image_paths:
-            image_tokens = calculate_image_token_cost(image_path, self.encoding)
+            image_tokens = calculate_image_token_cost(image_path, self.model)
             total_image_tokens += image_tokens
         self.token_counts["image_tokens"] += total_image_tokens
         self.update_total_tokens()
@@ -0,0 +1,145 @@
+"""
+This module resolves tiktoken encodings and counts the tokens of large texts across threads.
+
+Encodings are resolved through one registry shared by the whole process: each model is mapped
+to its encoding's name once, and each encoding is loaded once, however many callers and models
+use it.
+
+A prompt's file contents are one huge string, and encoding it with tiktoken runs on a single
+core. Large texts are instead split into pieces at safe boundaries and the pieces are encoded by
+tiktoken's batch encoder, which releases the GIL and so runs them in parallel threads.
+
+A boundary is safe when no token can span it: tiktoken first splits text with a regular
+expression and only merges bytes within the resulting words. In the patterns of every tiktoken
+encoding, a newline between a non-whitespace character and a character other than whitespace or
+a slash ends a word, and still does when it ends the text. Splitting after such newlines yields
+exactly the tokens of encoding the whole text, so the counts match the serial ones.
+
+Functions:
+    get_model_encoding: Gets the shared encoding of a model.
+    count_tokens: Counts the tokens of a text, encoding large texts across threads.
+    split_at_safe_boundaries: Splits a text into pieces at boundaries no token spans.
+
+Constants:
+    FALLBACK_ENCODING: Encoding of models tiktoken has no encoding for.
+    PARALLEL_MIN_CHARS: Texts shorter than this are encoded serially.
+    TOKENIZE_PIECE_CHARS: Target size of the pieces a large text is split into.
+"""
+import os
+import re
+import threading
+
+import tiktoken
+from tiktoken.model import encoding_name_for_model
+
+from lib.shell_util import LIGHT_BLUE, RESET_COLOR
+
+FALLBACK_ENCODING = "cl100k_base"
+
+PARALLEL_MIN_CHARS = 256 * 1024
+
+TOKENIZE_PIECE_CHARS = 128 * 1024
+
+# A newline after non-whitespace, since whitespace at the end of a text is one word, and followed
+# by neither whitespace, which newline words absorb, nor a slash, which o200k_base's punctuation
+# words absorb after newlines
+SAFE_BOUNDARY_PATTERN = re.compile(r"(?<=\S)\n(?=[^\s/])")
+
+
+# Encodings by name and encoding names by model, filled as models are first used
+_encodings = {}
+_model_encoding_names = {}
+_registry_lock = threading.Lock()
+
+
+def _load_encoding(name):
+    encoding = _encodings.get(name)
+    if encoding is None:
+        with _registry_lock:
+            encoding = _encodings.get(name)
+            if encoding is None:
+                encoding = tiktoken.get_encoding(name)
+                _encodings[name] = encoding
+    return encoding
+
+
+def get_model_encoding(model):
+    """
+    Get the encoding of a model from the process-wide registry, loading it the first time any
+    model using it asks. Models without a tiktoken encoding of their own, or whose encoding
+    cannot be loaded, use FALLBACK_ENCODING.
+
+    Args:
+        model (str): The LLM provider/model, e.g. openai/gpt-4o.
+
+    Returns:
+        tiktoken.Encoding: The encoding.
+    """
+    name = _model_encoding_names.get(model)
+    if name is not None:
+        return _load_encoding(name)
+
+    try:
+        name = encoding_name_for_model(model.split("/")[-1])
+        encoding = _load_encoding(name)
+    except Exception:
+        print(
+            f"{LIGHT_BLUE} 💁‍♀️ Defaulting to '{FALLBACK_ENCODING}' - no model-specific encoding for {model}.{RESET_COLOR}"
+        )
+        name = FALLBACK_ENCODING
+        encoding = _load_encoding(name)
+    _model_encoding_names[model] = name
+    return encoding
+
+
+def split_at_safe_boundaries(text, piece_chars=TOKENIZE_PIECE_CHARS):
+    """
+    Split a text into pieces at boundaries no token spans.
+
+    Each piece ends at the first safe boundary after piece_chars characters, so pieces are at
+    least that long, except the last one. Text with no safe boundary is not split.
+
+    Args:
+        text (str): The text to split.
+        piece_chars (int, optional): Target size of a piece. Defaults to TOKENIZE_PIECE_CHARS.
+
+    Returns:
+        list: The pieces, which joined together reproduce the text.
+    """
+    pieces = []
+    start = 0
+    while len(text) - start > piece_chars:
+        boundary = SAFE_BOUNDARY_PATTERN.search(text, start + piece_chars)
+        if boundary is None:
+            break
+        pieces.append(text[start:boundary.end()])
+        start = boundary.end()
+    pieces.append(text[start:])
+    return pieces
+
+
+def count_tokens(encoding, text, workers=None):
+    """
+    Count the tokens of a text, encoding large texts across threads. Special tokens are counted
+    as plain text, as when encoding with disallowed_special=().
+
+    Args:
+        encoding (tiktoken.Encoding): The encoding to count tokens with.
+        text (str): The text.
+        workers (int, optional): Number of threads. Defaults to the number of CPUs.
+
+    Returns:
+        int: The number of tokens, the same as encoding the whole text at once.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(text) < PARALLEL_MIN_CHARS:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    piece_chars = max(TOKENIZE_PIECE_CHARS, len(text) // (workers * 4))
+    pieces = split_at_safe_boundaries(text, piece_chars)
+    if len(pieces) == 1:
+        return len(encoding.encode(text, disallowed_special=()))
+    return sum(
+        len(tokens)
+        for tokens in encoding.encode_batch(pieces, num_threads=workers, disallowed_special=())
+    )
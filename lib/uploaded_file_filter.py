@@ -1,7 +1,7 @@
 """
 This module provides functionality to filter uploaded files based on predefined and custom ignore
 patterns.
-It leverages patterns from a project's .gitignore file, a set of default ignore patterns, and any
+It leverages patterns from a project's .gitignore files, a set of default ignore patterns, and any
 additional patterns provided by the user to determine which files should be excluded from
 processing.
 
@@ -27,6 +27,7 @@ DEFAULT_IGNORE_PATTERNS = [
     "**/.arcode.cache.pkl",
     "**/.arcode.checksum.txt",
     "**/.arcode.embeddings",
+    "**/.arcode.manifest.json",
     "**/.DS_Store",
     "**/.env",
     "**/package-lock.json"
@@ -41,22 +42,34 @@ class UploadedFileFilter:
     excluded from processing. It is initialized with a starting path and can optionally include
     additional ignore patterns.
 
+    Like git, .gitignore files in subdirectories are honoured too. Each is compiled the first time
+    a path beneath its directory is checked, and its patterns take precedence over those of its
+    parent directories. The default and additional patterns are checked after all .gitignore
+    files, so no .gitignore file can re-include a path they exclude.
+
     Attributes:
         startpath (str): The starting path from which to filter files.
         gitignore_path (str): The path to the .gitignore file within the startpath.
         patterns (List[str]): A list of ignore patterns compiled from the .gitignore file, default
             ignore patterns, and any additional patterns provided by the user.
         max_file_size (int): The maximum allowed file size in bytes.
+        manifest (FileManifest): Optional file manifest used to reuse binary verdicts for
+            unchanged files.
 
     Methods:
-        __init__(self, startpath, additional_patterns=None, max_file_size=1000000): Initializes the UploadedFileFilter
-            with a starting path, optional additional ignore patterns, and maximum file size.
+        __init__(self, startpath, additional_patterns=None, max_file_size=1000000, manifest=None): Initializes
+            the UploadedFileFilter with a starting path, optional additional ignore patterns, maximum file
+            size and file manifest.
     """
-    def __init__(self, startpath, additional_patterns=None, max_file_size=1000000):
+    def __init__(self, startpath, additional_patterns=None, max_file_size=1000000, manifest=None):
         self.startpath = startpath
         self.gitignore_path = os.path.join(startpath, ".gitignore")
         self.patterns = DEFAULT_IGNORE_PATTERNS.copy()
+        gitignore_patterns = []
         self.max_file_size = max_file_size
+        self.manifest = manifest
+        # Compiled nested .gitignore specs keyed by directory, None where there is no .gitignore
+        self._directory_specs = {}
 
         # Add patterns from .gitignore if it exists
         if os.path.exists(self.gitignore_path):
@@ -64,12 +77,16 @@ class UploadedFileFilter:
                 for line in ignore_file:
                     line = line.strip()
                     if line and not line.startswith("#"):
-                        self.patterns.append(line)
+                        gitignore_patterns.append(line)
+        self.patterns.extend(gitignore_patterns)
 
         if additional_patterns:
             self.patterns.extend(additional_patterns)
 
-        self.spec = pathspec.GitIgnoreSpec.from_lines(self.patterns)
+        self.gitignore_spec = pathspec.GitIgnoreSpec.from_lines(gitignore_patterns)
+        self.exclude_spec = pathspec.GitIgnoreSpec.from_lines(
+            DEFAULT_IGNORE_PATTERNS + list(additional_patterns or [])
+        )
 
     def select_files(self, files):
         """
@@ -83,12 +100,33 @@ class UploadedFileFilter:
         """
         return [f for f in files if self.should_upload(f)]
 
-    def should_upload(self, file):
+    def should_descend(self, directory):
+        """
+        Check if a directory walk should descend into the given directory.
+
+        Follows git's rule that a file cannot be re-included once one of its
+        parent directories is excluded, so an ignored directory can be pruned
+        from the walk without visiting anything beneath it.
+
+        Args:
+            directory (str): A directory path, relative to the start directory.
+
+        Returns:
+            bool: True if the directory is not excluded by the ignore patterns,
+                  False otherwise.
+        """
+        path = os.path.normpath(directory)
+        return not self._is_ignored(path, is_dir=True)
+
+    def should_upload(self, file, stat_result=None):
         """
         Check if the file should be uploaded.
 
         Args:
             file (str): A file path, relative to the start directory.
+            stat_result (os.stat_result, optional): The file's stat result when the caller
+                already has one, e.g. from a directory listing, saving another stat call.
+                Defaults to None.
 
         Returns:
             bool: True if the file is not excluded by the .gitignore file, any
@@ -98,14 +136,81 @@ class UploadedFileFilter:
         path = os.path.normpath(file)
         full_path = os.path.join(self.startpath, path)
 
-        if self.spec.match_file(path):
+        if self._is_ignored(path):
             return False
 
-        if is_binary_file(full_path):
+        try:
+            # One stat serves the binary check, its cached verdict and the size limit
+            if stat_result is None:
+                stat_result = os.stat(full_path)
+            if self.manifest is not None:
+                binary = self.manifest.is_binary(path, stat_result)
+            else:
+                binary = is_binary_file(full_path, stat_result)
+            if binary:
+                return False
+        except FileNotFoundError:
+            # Listed by git but deleted from the work tree
             return False
 
-        if os.path.getsize(full_path) > self.max_file_size:
+        if stat_result.st_size > self.max_file_size:
             print(f" ❗️ {LIGHT_BLUE}Skipping {LIGHT_RED}{full_path}{LIGHT_BLUE}: File size exceeds maximum limit.{RESET_COLOR}")
             return False
 
-        return True
\ No newline at end of file
+        return True
+
+    def _is_ignored(self, path, is_dir=False):
+        """
+        Check a path against the .gitignore file of every directory above it, then against the
+        default and additional patterns, which the .gitignore files cannot override.
+
+        Args:
+            path (str): A normalised path, relative to the start directory.
+            is_dir (bool, optional): Whether the path is a directory. Defaults to False.
+
+        Returns:
+            bool: True if the default or additional patterns exclude the path, or the deepest
+                .gitignore pattern matching it does. False otherwise.
+        """
+        suffix = "/" if is_dir else ""
+        ignored = self.gitignore_spec.check_file(f"{path}{suffix}").include
+        parts = path.split(os.sep)
+        for depth in range(1, len(parts)):
+            spec = self._directory_spec(os.path.join(*parts[:depth]))
+            if spec is None:
+                continue
+            include = spec.check_file("/".join(parts[depth:]) + suffix).include
+            if include is not None:
+                ignored = include
+        return bool(ignored) or self.exclude_spec.match_file(f"{path}{suffix}")
+
+    def _directory_spec(self, directory):
+        """
+        Get the compiled patterns of a subdirectory's .gitignore file.
+
+        Args:
+            directory (str): A directory path, relative to the start directory.
+
+        Returns:
+            pathspec.GitIgnoreSpec: The compiled patterns, or None if the directory has no
+                .gitignore file.
+        """
+        try:
+            return self._directory_specs[directory]
+        except KeyError:
+            pass
+
+        spec = None
+        try:
+            with open(os.path.join(self.startpath, directory, ".gitignore"), 'r', encoding='utf-8') as ignore_file:
+                patterns = [
+                    line.strip() for line in ignore_file
+                    if line.strip() and not line.strip().startswith("#")
+                ]
+            if patterns:
+                spec = pathspec.GitIgnoreSpec.from_lines(patterns)
+        except (OSError, UnicodeDecodeError):
+            pass
+
+        self._directory_specs[directory] = spec
+        return spec
@@ -0,0 +1,251 @@
+"""
+This module keeps a persistent index of embedding vectors for the chunks of a codebase's files,
+so focused mode does not re-split and re-embed the whole codebase on every query.
+
+An index lives in its own directory beneath the embeddings cache, one per embedding model. Each
+row of the index holds one unique chunk, keyed by the hash of its text, so a chunk repeated
+across files (vendored copies, license headers) is embedded and stored once. The vectors are
+stored L2-normalised as a float32 matrix in vectors.npy, memory-mapped when loaded, and
+chunks.json records the chunk key of each row and, for each file, the content hash it was split
+from and its chunk keys and line ranges.
+
+Updating the index only splits files whose content hash changed, only embeds chunks the index
+does not hold yet, and drops the rows of chunks no file contains any more.
+
+Searches score every row exactly until the index holds ANN_THRESHOLD chunks. From then on they
+go through an approximate IVF index, trained on the first such search and kept in ivf.npz, which
+scores only the rows near the query.
+
+Classes:
+    VectorIndex: A persistent matrix of chunk embeddings for the files of a codebase.
+
+Functions:
+    chunk_key: Gets the key of a chunk's text.
+    get_vector_index: Gets the vector index of a codebase for an embedding model.
+
+Constants:
+    INDEX_VERSION: Format version of chunks.json; indexes of any other version are rebuilt.
+    ANN_THRESHOLD: Number of chunks from which searches are approximate.
+"""
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+from lib.ann_index import ANN_PROBES, IVFIndex
+from lib.vector_search import normalize_rows, top_k
+
+INDEX_VERSION = 5
+
+ANN_THRESHOLD = 200000
+
+VECTORS_FILENAME = "vectors.npy"
+CHUNKS_FILENAME = "chunks.json"
+ANN_FILENAME = "ivf.npz"
+
+
+def chunk_key(text):
+    """
+    Get the key of a chunk's text.
+
+    Args:
+        text (str): The chunk text.
+
+    Returns:
+        str: The SHA-1 of the text.
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class VectorIndex:
+    """
+    A persistent matrix of chunk embeddings for the files of a codebase.
+
+    Attributes:
+        directory (str): The directory holding vectors.npy and chunks.json.
+        files (dict): Entries keyed by file path, each holding the file's content "hash", the keys
+            of its "chunks" in order and the [start, end] "lines" of each chunk.
+        keys (list): The chunk key of each row of the matrix.
+        vectors (numpy.ndarray): The float32 matrix of L2-normalised chunk embeddings, one row per
+            unique chunk.
+        ann (IVFIndex): The approximate index of the vectors, or None until a search needs one.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = {}
+        self.keys = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.ann = None
+        self._sources = []
+
+    def load(self):
+        """
+        Load the index from disk, memory-mapping the vectors. A missing, corrupt or outdated
+        index loads as empty and is rebuilt by the next update.
+        """
+        try:
+            with open(os.path.join(self.directory, CHUNKS_FILENAME), "r", encoding="utf-8") as chunks_file:
+                chunks = json.load(chunks_file)
+            vectors = np.load(os.path.join(self.directory, VECTORS_FILENAME), mmap_mode="r")
+        except (OSError, ValueError):
+            return
+
+        if chunks.get("version") != INDEX_VERSION:
+            return
+        keys = chunks.get("keys", [])
+        if vectors.ndim != 2 or len(keys) != vectors.shape[0]:
+            return
+
+        self.files = chunks.get("files", {})
+        self.keys = keys
+        self.vectors = vectors
+        self._index_sources()
+
+        ann = IVFIndex.load(os.path.join(self.directory, ANN_FILENAME))
+        if ann is not None and len(ann.assignments) == len(keys):
+            self.ann = ann
+
+    def save(self):
+        """
+        Write the index to disk. The vectors are written before the chunk metadata that refers
+        to them, and each file is replaced atomically.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        vectors_path = os.path.join(self.directory, VECTORS_FILENAME)
+        with open(f"{vectors_path}.tmp", "wb") as vectors_file:
+            np.save(vectors_file, self.vectors)
+        os.replace(f"{vectors_path}.tmp", vectors_path)
+
+        ann_path = os.path.join(self.directory, ANN_FILENAME)
+        if self.ann is not None:
+            self.ann.save(ann_path)
+        elif os.path.exists(ann_path):
+            os.remove(ann_path)
+
+        chunks_path = os.path.join(self.directory, CHUNKS_FILENAME)
+        with open(f"{chunks_path}.tmp", "w", encoding="utf-8") as chunks_file:
+            json.dump(
+                {"version": INDEX_VERSION, "keys": self.keys, "files": self.files},
+                chunks_file,
+                separators=(",", ":"),
+            )
+        os.replace(f"{chunks_path}.tmp", chunks_path)
+
+    def update(self, files, split, embed):
+        """
+        Bring the index up to date with the given files and save it if anything changed.
+
+        Args:
+            files (list): Files from the codebase scan, as FileRecord objects. Only the files
+                whose content hash differs from the indexed one have their contents read.
+            split (callable): Splits a file, given its path and contents, into a list of Chunk
+                tuples.
+            embed (callable): Embeds a list of chunk texts, returning one vector per text.
+
+        Returns:
+            bool: True if the index changed, False otherwise.
+        """
+        known_keys = set(self.keys)
+        new_chunks = {}
+        files_index = {}
+        for file in files:
+            content_hash = file.content_hash
+            entry = self.files.get(file.path)
+            if entry is not None and entry["hash"] == content_hash:
+                files_index[file.path] = entry
+                continue
+
+            keys = []
+            lines = []
+            for chunk in split(file.path, file["data"]):
+                key = chunk_key(chunk.text)
+                keys.append(key)
+                lines.append([chunk.start_line, chunk.end_line])
+                if key not in known_keys:
+                    new_chunks.setdefault(key, chunk.text)
+            files_index[file.path] = {"hash": content_hash, "chunks": keys, "lines": lines}
+
+        if files_index == self.files:
+            return False
+
+        live_keys = {key for entry in files_index.values() for key in entry["chunks"]}
+        kept_rows = [row for row, key in enumerate(self.keys) if key in live_keys]
+        parts = [self.vectors[kept_rows]] if kept_rows else []
+        new_vectors = []
+        if new_chunks:
+            new_vectors = normalize_rows(embed(list(new_chunks.values())))
+            parts.append(new_vectors)
+
+        if parts:
+            self.vectors = np.concatenate(parts).astype(np.float32, copy=False)
+        else:
+            self.vectors = np.zeros((0, 0), dtype=np.float32)
+        if self.ann is not None:
+            self.ann = self.ann.update(kept_rows, new_vectors) if parts else None
+        self.keys = [self.keys[row] for row in kept_rows] + list(new_chunks)
+        self.files = files_index
+        self._index_sources()
+        self.save()
+        return True
+
+    def search(self, query_vector, k, min_score=None, ann_threshold=ANN_THRESHOLD, ann_probes=ANN_PROBES):
+        """
+        Find the chunks most similar to a query by cosine similarity.
+
+        A chunk contained in several files, or several times in one file, is returned once for
+        each occurrence. From ann_threshold chunks, only the chunks in the IVF lists nearest the
+        query are scored, training the IVF index first if it is missing or out of date.
+
+        Args:
+            query_vector (list): The query's embedding.
+            k (int): Maximum number of results to return.
+            min_score (float, optional): Chunks scoring below this similarity are skipped.
+                Defaults to None.
+            ann_threshold (int, optional): Number of chunks from which the search is
+                approximate, or None to always score every chunk. Defaults to ANN_THRESHOLD.
+            ann_probes (int, optional): Number of IVF lists scored by an approximate search;
+                more lists find more of the true matches, and slower. Defaults to ANN_PROBES.
+
+        Returns:
+            list: Tuples of the file path each chunk belongs to, its similarity score and its
+                  (start, end) line range, most similar first.
+        """
+        if ann_threshold is not None and len(self.keys) >= ann_threshold:
+            if self.ann is None or self.ann.needs_training(len(self.keys)):
+                self.ann = IVFIndex.train(self.vectors)
+                os.makedirs(self.directory, exist_ok=True)
+                self.ann.save(os.path.join(self.directory, ANN_FILENAME))
+            rows, scores = self.ann.search(self.vectors, query_vector, k, ann_probes, min_score)
+        else:
+            rows, scores = top_k(self.vectors, query_vector, k, min_score)
+        results = []
+        for row, score in zip(rows, scores):
+            for path, line_range in self._sources[row]:
+                results.append((path, float(score), line_range))
+        return results[:k]
+
+    def _index_sources(self):
+        rows = {key: row for row, key in enumerate(self.keys)}
+        self._sources = [[] for _ in self.keys]
+        for path, entry in self.files.items():
+            for key, line_range in zip(entry["chunks"], entry["lines"]):
+                self._sources[rows[key]].append((path, tuple(line_range)))
+
+
+def get_vector_index(cache_dir, namespace):
+    """
+    Get the vector index of a codebase for an embedding model, loaded from disk.
+
+    Args:
+        cache_dir (str): The codebase's embeddings cache directory.
+        namespace (str): The embedding model the vectors come from.
+
+    Returns:
+        VectorIndex: The loaded index.
+    """
+    directory = os.path.join(cache_dir, "index", re.sub(r"[^A-Za-z0-9_.-]", "_", namespace))
+    index = VectorIndex(directory)
+    index.load()
+    return index
@@ -0,0 +1,59 @@
+"""
+This module provides exact nearest-neighbour search over a matrix of embedding vectors with NumPy.
+
+Vectors are L2-normalised once when they are stored, so cosine similarity against a query is a
+single matrix-vector product, and the k best rows are selected with argpartition rather than by
+sorting every score.
+
+Functions:
+    normalize_rows: L2-normalises the rows of a matrix.
+    top_k: Finds the rows of a normalised matrix most similar to a query.
+"""
+import numpy as np
+
+
+def normalize_rows(matrix):
+    """
+    L2-normalise the rows of a matrix. All-zero rows are left as zeros.
+
+    Args:
+        matrix (numpy.ndarray): A two-dimensional array.
+
+    Returns:
+        numpy.ndarray: A float32 array of the normalised rows.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def top_k(vectors, query_vector, k, min_score=None):
+    """
+    Find the rows of a normalised matrix most similar to a query by cosine similarity.
+
+    Args:
+        vectors (numpy.ndarray): A matrix of L2-normalised row vectors.
+        query_vector (list): The query's embedding, which need not be normalised.
+        k (int): Maximum number of rows to return.
+        min_score (float, optional): Rows scoring below this similarity are skipped. Defaults
+            to None.
+
+    Returns:
+        tuple: Arrays of the selected row numbers and their scores, most similar first.
+    """
+    if vectors.shape[0] == 0 or k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    query = normalize_rows(np.asarray(query_vector, dtype=np.float32)[np.newaxis, :])[0]
+    scores = vectors @ query
+
+    if k < len(scores):
+        rows = np.argpartition(-scores, k - 1)[:k]
+    else:
+        rows = np.arange(len(scores))
+    # Ties are broken by row number, so results are stable across runs
+    rows = rows[np.lexsort((rows, -scores[rows]))]
+
+    if min_score is not None:
+        rows = rows[scores[rows] >= min_score]
+    return rows, scores[rows]
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Benchmark approximate IVF search against exact search on recall@k and query latency.
+
+The vectors are synthetic: noisy points around random topic directions, which cluster the way
+embeddings of code do, unlike uniformly random vectors.
+
+Usage:
+    python scripts/benchmarks/bench_ann_index.py [--vectors 200000] [--dim 256] [-k 42]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from lib.ann_index import IVFIndex
+from lib.vector_search import normalize_rows, top_k
+
+
+def make_vectors(rng, count, centers, noise):
+    labels = rng.integers(0, len(centers), size=count)
+    dim = centers.shape[1]
+    return normalize_rows(centers[labels] + rng.normal(size=(count, dim)).astype(np.float32) * (noise / np.sqrt(dim)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=0.8, help="Norm of the noise around a topic direction")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    centers = normalize_rows(rng.normal(size=(args.topics, args.dim)))
+    vectors = make_vectors(rng, args.vectors, centers, args.noise)
+    queries = make_vectors(rng, args.queries, centers, args.noise)
+
+    start = time.perf_counter()
+    exact = [set(top_k(vectors, query, args.k)[0]) for query in queries]
+    exact_seconds = (time.perf_counter() - start) / args.queries
+
+    start = time.perf_counter()
+    ann = IVFIndex.train(vectors)
+    train_seconds = time.perf_counter() - start
+
+    print(f"{args.vectors:,} vectors of {args.dim} dimensions, {len(ann.centroids):,} lists, k={args.k}")
+    print(f"  train:              {train_seconds * 1000:10.1f} ms")
+    print(f"  exact       recall 100.0%  {exact_seconds * 1000:8.2f} ms/query")
+    for probes in [4, 8, 16, 32, 64, 128]:
+        start = time.perf_counter()
+        results = [set(ann.search(vectors, query, args.k, probes)[0]) for query in queries]
+        seconds = (time.perf_counter() - start) / args.queries
+        recall = sum(len(found & truth) for found, truth in zip(results, exact)) / (args.k * args.queries)
+        print(f"  probes={probes:<4}  recall {recall:6.1%}  {seconds * 1000:8.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
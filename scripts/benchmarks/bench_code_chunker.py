@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Benchmark chunkers on retrieval quality against the tokens sent, using BM25 over a codebase.
+
+Every documented function in the codebase becomes a query made of its docstring's first line. A
+query is a hit when one of the top k chunks retrieved contains the function's definition, and
+the tokens sent are those of all k chunks.
+
+Usage:
+    python scripts/benchmarks/bench_code_chunker.py [--dir .] [-k 5]
+"""
+import argparse
+import ast
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from lib.code_chunker import Chunk, chunk_code, estimate_tokens, split_into_chunks
+from lib.lexical_index import get_lexical_index
+
+
+class ChunkRecord:
+    """
+    A single chunk standing in for a file, so the lexical index ranks chunks directly.
+    """
+    def __init__(self, path, text):
+        self.path = path
+        self.data = text
+        self.content_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+def recursive_splitter():
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        return None
+    splitter = RecursiveCharacterTextSplitter(chunk_size=2500, chunk_overlap=20)
+    return lambda path, text: splitter.split_text(text)
+
+
+def load_sources(startpath):
+    sources = {}
+    for root, dirs, files in os.walk(startpath):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in ("node_modules", "venv", "__pycache__"))
+        for name in sorted(files):
+            if name.endswith(".py"):
+                path = os.path.relpath(os.path.join(root, name), startpath)
+                with open(os.path.join(root, name), "r", encoding="utf-8", errors="ignore") as f:
+                    sources[path] = f.read()
+    return sources
+
+
+def make_queries(sources):
+    queries = []
+    for path, text in sources.items():
+        try:
+            tree = ast.parse(text)
+        except SyntaxError:
+            continue
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                docstring = ast.get_docstring(node)
+                if docstring:
+                    queries.append((docstring.strip().splitlines()[0], path, f"def {node.name}("))
+    return queries
+
+
+def evaluate(name, chunker, sources, queries, k):
+    start = time.perf_counter()
+    chunk_texts = {}
+    records = []
+    for path, text in sources.items():
+        for i, chunk in enumerate(chunker(path, text)):
+            chunk_path = f"{path}#{i}"
+            chunk_texts[chunk_path] = chunk
+            records.append(ChunkRecord(chunk_path, chunk))
+    chunk_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        index = get_lexical_index(cache_dir)
+        index.update(records, split=lambda path, text: [Chunk(text, 1, 1)])
+        hits = 0
+        tokens = 0
+        for query, path, definition in queries:
+            results = index.search(query, k=k)
+            retrieved = [chunk_texts[chunk_path] for chunk_path, *_ in results]
+            tokens += sum(estimate_tokens(text) for text in retrieved)
+            if any(
+                chunk_path.startswith(f"{path}#") and definition in chunk_texts[chunk_path]
+                for chunk_path, *_ in results
+            ):
+                hits += 1
+
+    print(
+        f"  {name:16} {len(records):6,} chunks  {chunk_seconds * 1000:7.1f} ms  "
+        f"hit@{k} {hits / len(queries):6.1%}  tokens/query {tokens / len(queries):8,.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dir", default=os.path.join(os.path.dirname(__file__), "..", ".."))
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    sources = load_sources(os.path.abspath(args.dir))
+    queries = make_queries(sources)
+    print(f"{len(sources):,} Python files, {len(queries):,} queries")
+
+    chunkers = [
+        ("recursive-2500", recursive_splitter()),
+        ("content-defined", lambda path, text: split_into_chunks(text)),
+        ("syntax-aware", lambda path, text: [chunk.text for chunk in chunk_code(path, text)]),
+    ]
+    for name, chunker in chunkers:
+        if chunker is None:
+            print(f"  {name:16} skipped, langchain-text-splitters is not installed")
+            continue
+        evaluate(name, chunker, sources, queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
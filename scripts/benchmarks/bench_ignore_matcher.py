@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Benchmark the compiled IgnoreMatcher against the original pattern-by-pattern loop it replaced.
+
+Usage:
+    python scripts/benchmarks/bench_ignore_matcher.py [--patterns 2000] [--paths 5000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from lib.gitignore_parser import IgnoreMatcher
+
+
+def loop_is_ignored(path, ignore_patterns):
+    for pattern in ignore_patterns:
+        if (
+            path.endswith(f"/{pattern}")
+            or path.startswith(pattern)
+            or path.startswith(f"./{pattern}")
+            or f"/{pattern}/" in path
+        ):
+            return True
+    return False
+
+
+def random_name(rng):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patterns", type=int, default=2000)
+    parser.add_argument("--paths", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    names = [random_name(rng) for _ in range(args.patterns * 2)]
+    patterns = set(rng.sample(names, args.patterns))
+    paths = [
+        "/".join(rng.choice(names) for _ in range(rng.randint(1, 6)))
+        for _ in range(args.paths)
+    ]
+
+    start = time.perf_counter()
+    expected = [loop_is_ignored(path, patterns) for path in paths]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher = IgnoreMatcher(patterns)
+    compile_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [matcher.is_ignored(path) for path in paths]
+    match_seconds = time.perf_counter() - start
+
+    assert actual == expected, "IgnoreMatcher disagrees with the reference loop"
+
+    print(f"{args.patterns:,} patterns x {args.paths:,} paths ({sum(expected):,} ignored)")
+    print(f"  loop:     {loop_seconds * 1000:10.1f} ms")
+    print(f"  compile:  {compile_seconds * 1000:10.1f} ms")
+    print(f"  matcher:  {match_seconds * 1000:10.1f} ms")
+    print(f"  speedup:  {loop_seconds / (compile_seconds + match_seconds):10.1f}x (including compile)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Benchmark building, updating and querying the BM25 lexical index over a synthetic codebase.
+
+Usage:
+    python scripts/benchmarks/bench_lexical_index.py [--files 2000] [--functions 20] [--queries 200]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from lib.code_chunker import chunk_code
+from lib.file_io import FileRecord
+from lib.lexical_index import get_lexical_index
+
+
+def random_word(rng):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+
+
+def make_file(rng, vocabulary, functions):
+    lines = []
+    for _ in range(functions):
+        name = "_".join(rng.sample(vocabulary, 2))
+        arg = rng.choice(vocabulary)
+        lines.append(f"def {name}({arg}):")
+        for _ in range(rng.randint(2, 8)):
+            target, source = rng.sample(vocabulary, 2)
+            lines.append(f"    {target}{source.capitalize()} = {arg}.{rng.choice(vocabulary)}({source})")
+        lines.append(f"    return {arg}\n")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--functions", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = [random_word(rng) for _ in range(5000)]
+
+    with tempfile.TemporaryDirectory() as startpath:
+        records = []
+        total_bytes = 0
+        for i in range(args.files):
+            path = os.path.join(f"pkg{i % 50}", f"module{i}.py")
+            os.makedirs(os.path.join(startpath, os.path.dirname(path)), exist_ok=True)
+            data = make_file(rng, vocabulary, args.functions)
+            total_bytes += len(data)
+            with open(os.path.join(startpath, path), "w") as f:
+                f.write(data)
+            records.append(FileRecord(startpath, path))
+
+        cache_dir = os.path.join(startpath, ".arcode.embeddings")
+
+        start = time.perf_counter()
+        index = get_lexical_index(cache_dir)
+        index.update(records, split=chunk_code)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = get_lexical_index(cache_dir)
+        index.update([FileRecord(startpath, record.path) for record in records], split=chunk_code)
+        reload_seconds = time.perf_counter() - start
+
+        queries = [" ".join(rng.sample(vocabulary, 4)) for _ in range(args.queries)]
+        start = time.perf_counter()
+        for query in queries:
+            index.search(query, k=42)
+        query_seconds = time.perf_counter() - start
+
+    print(f"{args.files:,} files, {total_bytes / 1e6:.1f} MB, {len(index.docs):,} chunks, {len(index.postings):,} terms")
+    print(f"  build:             {build_seconds * 1000:10.1f} ms")
+    print(f"  load + no-op update: {reload_seconds * 1000:8.1f} ms")
+    print(f"  query (mean):      {query_seconds / args.queries * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
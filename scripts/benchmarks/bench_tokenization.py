@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Benchmark counting the tokens of a multi-MB prompt serially against across threads.
+
+The prompt is this repository's source files repeated to the requested size. The encoding is
+downloaded by tiktoken when first used; without network access a stand-in with the same
+pretokenizer pattern and a byte-level vocabulary is used instead, which does less merging work
+per byte but splits and threads the same way.
+
+Usage:
+    python scripts/benchmarks/bench_tokenization.py [--mb 8] [--encoding o200k_base]
+"""
+import argparse
+import os
+import sys
+import time
+
+import tiktoken
+import tiktoken_ext.openai_public
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from lib.tokenization import count_tokens
+
+
+def get_encoding(name):
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception:
+        print(f"Could not load {name}, using a byte-level stand-in with its pattern")
+        ranks = {bytes([i]): i for i in range(256)}
+        original = tiktoken_ext.openai_public.load_tiktoken_bpe
+        tiktoken_ext.openai_public.load_tiktoken_bpe = lambda *args, **kwargs: ranks
+        try:
+            constructor = getattr(tiktoken_ext.openai_public, name)()
+        finally:
+            tiktoken_ext.openai_public.load_tiktoken_bpe = original
+        constructor.pop("explicit_n_vocab", None)
+        return tiktoken.Encoding(**constructor)
+
+
+def make_prompt(startpath, size):
+    sources = []
+    for root, dirs, files in os.walk(startpath):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != "__pycache__")
+        for name in sorted(files):
+            if name.endswith((".py", ".md")):
+                with open(os.path.join(root, name), "r", encoding="utf-8", errors="ignore") as f:
+                    sources.append(f"\n**************** FILE: {name} ****************\n{f.read()}")
+    corpus = "".join(sources)
+    return (corpus * (size // len(corpus) + 1))[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mb", type=float, default=8)
+    parser.add_argument("--encoding", default="o200k_base")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    encoding = get_encoding(args.encoding)
+    prompt = make_prompt(os.path.join(os.path.dirname(__file__), "..", ".."), int(args.mb * 1024 * 1024))
+
+    def best_of(count):
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            tokens = count()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return tokens, best
+
+    serial_tokens, serial_seconds = best_of(lambda: len(encoding.encode(prompt, disallowed_special=())))
+    print(f"{len(prompt) / 1e6:.1f} MB prompt, {serial_tokens:,} tokens, {os.cpu_count()} CPUs")
+    print(f"  serial encode:  {serial_seconds * 1000:9.1f} ms")
+    for workers in [1, 2, 4, 8, 16]:
+        tokens, seconds = best_of(lambda: count_tokens(encoding, prompt, workers=workers))
+        match = "matches" if tokens == serial_tokens else f"MISMATCH ({tokens:,})"
+        print(f"  {workers:2} workers:     {seconds * 1000:9.1f} ms  {serial_seconds / seconds:5.2f}x  {match}")
+
+
+if __name__ == "__main__":
+    main()
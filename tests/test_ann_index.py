@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from lib.ann_index import IVFIndex
+from lib.vector_search import normalize_rows, top_k
+import numpy as np
+
+
+class TestIVFIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        centers = normalize_rows(rng.normal(size=(20, 16)))
+        labels = rng.integers(0, 20, size=2000)
+        self.vectors = normalize_rows(centers[labels] + 0.2 * rng.normal(size=(2000, 16)))
+        self.queries = normalize_rows(centers[:10] + 0.2 * rng.normal(size=(10, 16)))
+
+    def test_train_assigns_every_vector(self):
+        ann = IVFIndex.train(self.vectors)
+        self.assertEqual(ann.centroids.shape, (44, 16))
+        self.assertEqual(len(ann.assignments), 2000)
+        np.testing.assert_allclose(np.linalg.norm(ann.centroids, axis=1), 1, atol=1e-5)
+
+    def test_search_probing_every_list_is_exact(self):
+        ann = IVFIndex.train(self.vectors, lists=8)
+        for query in self.queries:
+            rows, scores = ann.search(self.vectors, query, 10, probes=8)
+            expected_rows, expected_scores = top_k(self.vectors, query, 10)
+            np.testing.assert_array_equal(rows, expected_rows)
+            np.testing.assert_allclose(scores, expected_scores)
+
+    def test_search_recall_with_few_probes(self):
+        ann = IVFIndex.train(self.vectors)
+        found = 0
+        for query in self.queries:
+            rows, _ = ann.search(self.vectors, query, 10, probes=4)
+            found += len(set(rows) & set(top_k(self.vectors, query, 10)[0]))
+        self.assertGreaterEqual(found / 100, 0.9)
+
+    def test_search_probes_more_lists_for_k_candidates(self):
+        ann = IVFIndex.train(self.vectors, lists=40)
+        rows, _ = ann.search(self.vectors, self.queries[0], 500, probes=1)
+        self.assertEqual(len(rows), 500)
+
+    def test_search_skips_scores_below_threshold(self):
+        ann = IVFIndex.train(self.vectors)
+        _, scores = ann.search(self.vectors, self.queries[0], 100, min_score=0.9)
+        self.assertTrue(all(score >= 0.9 for score in scores))
+
+    def test_update_keeps_centroids(self):
+        ann = IVFIndex.train(self.vectors[:1000])
+        updated = ann.update([999, 0], self.vectors[1000:1500])
+        self.assertIs(updated.centroids, ann.centroids)
+        self.assertEqual(len(updated.assignments), 502)
+        self.assertEqual(updated.assignments[0], ann.assignments[999])
+        self.assertFalse(updated.needs_training(1500))
+        self.assertTrue(updated.needs_training(2001))
+        self.assertTrue(updated.needs_training(499))
+
+    def test_save_and_load(self):
+        ann = IVFIndex.train(self.vectors)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ivf.npz")
+            ann.save(path)
+            loaded = IVFIndex.load(path)
+            self.assertIsNone(IVFIndex.load(os.path.join(directory, "missing.npz")))
+        np.testing.assert_array_equal(loaded.centroids, ann.centroids)
+        np.testing.assert_array_equal(loaded.assignments, ann.assignments)
+        self.assertEqual(loaded.trained_rows, 2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from lib.binary_classifier import BinaryClassifier, SNIFF_BYTES
+import os
+import tempfile
+
+
+class TestBinaryClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = BinaryClassifier()
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tempdir.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    @patch('magic.Magic')
+    def test_sniff_settles_text_and_binary(self, mock_magic):
+        text_path = self.write("notes", "héllo wörld\n".encode("utf-8"))
+        binary_path = self.write("blob", b"\x7fELF\x00\x01\x02")
+
+        self.assertFalse(self.classifier.is_binary(text_path))
+        self.assertTrue(self.classifier.is_binary(binary_path))
+        mock_magic.assert_not_called()
+        self.assertEqual(self.classifier.get_stats(), {"sniff": 2})
+
+    @patch('magic.Magic')
+    def test_sniff_ignores_multibyte_character_cut_at_boundary(self, mock_magic):
+        data = b"a" * (SNIFF_BYTES - 1) + "é".encode("utf-8")
+        path = self.write("long.txt", data)
+
+        self.assertFalse(self.classifier.is_binary(path))
+        mock_magic.assert_not_called()
+
+    @patch('magic.Magic')
+    def test_inconclusive_sniff_uses_shared_magic_handle(self, mock_magic):
+        mock_magic_instance = MagicMock()
+        mock_magic.return_value = mock_magic_instance
+        mock_magic_instance.from_file.return_value = "text/plain"
+        first = self.write("latin1.txt", "café".encode("latin-1"))
+        second = self.write("utf16.txt", "hello".encode("utf-16"))
+
+        self.assertFalse(self.classifier.is_binary(first))
+        self.assertFalse(self.classifier.is_binary(second))
+        mock_magic.assert_called_once_with(mime=True)
+        self.assertEqual(mock_magic_instance.from_file.call_count, 2)
+        self.assertEqual(self.classifier.get_stats(), {"magic": 2})
+
+    @patch('magic.Magic')
+    def test_verdict_cached_until_file_changes(self, mock_magic):
+        path = self.write("data", b"plain text\n")
+
+        self.assertFalse(self.classifier.is_binary(path))
+        self.assertFalse(self.classifier.is_binary(path))
+        self.assertEqual(self.classifier.get_stats(), {"sniff": 1, "cache": 1})
+
+        self.write("data", b"now \x00 binary\n")
+        self.assertTrue(self.classifier.is_binary(path))
+        self.assertEqual(self.classifier.get_stats(), {"sniff": 2, "cache": 1})
+
+    def test_extension_skips_file_access(self):
+        self.assertTrue(self.classifier.is_binary("/does/not/exist.png"))
+        self.assertEqual(self.classifier.get_stats(), {"extension": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+from lib.code_chunker import chunk_code, split_into_chunks
+
+
+def make_source(functions):
+    return "".join(
+        f"def function_{i}(value):\n    total = value * {i}\n    return total + {i}\n\n"
+        for i in functions
+    )
+
+
+class TestCodeChunker(unittest.TestCase):
+
+    def test_chunks_reproduce_text(self):
+        text = make_source(range(200))
+        chunks = split_into_chunks(text)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), text)
+        self.assertTrue(all(len(chunk) <= 2500 for chunk in chunks))
+
+    def test_edit_only_changes_nearby_chunks(self):
+        before = split_into_chunks(make_source(range(200)))
+        edited = make_source(range(100)) + "def inserted():\n    pass\n\n" + make_source(range(100, 200))
+        after = split_into_chunks(edited)
+
+        unchanged = set(before) & set(after)
+        self.assertGreaterEqual(len(unchanged), len(before) - 2)
+
+    def test_splits_long_lines(self):
+        chunks = split_into_chunks("x" * 6000 + "\nshort\n", max_chars=2500)
+        self.assertEqual([len(chunk) for chunk in chunks], [2500, 2500, 1007])
+        self.assertEqual("".join(chunks), "x" * 6000 + "\nshort\n")
+
+    def test_skips_blank_text(self):
+        self.assertEqual(split_into_chunks(""), [])
+        self.assertEqual(split_into_chunks("\n\n  \n"), [])
+
+
+    def assert_chunks_cover_text(self, chunks, text):
+        lines = text.split("\n")
+        lines = [line + "\n" for line in lines[:-1]] + [lines[-1]]
+        self.assertEqual("".join(chunk.text for chunk in chunks).strip(), text.strip())
+        for chunk in chunks:
+            self.assertEqual(chunk.text, "".join(lines[chunk.start_line - 1:chunk.end_line]))
+
+    def test_python_chunks_follow_definitions(self):
+        text = "import os\n\n" + "".join(
+            f"def function_{i}(value):\n" + "".join(f"    step_{j} = value * {j}\n" for j in range(40)) + "\n"
+            for i in range(3)
+        )
+        chunks = chunk_code("module.py", text)
+
+        self.assert_chunks_cover_text(chunks, text)
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(chunks[0].text.startswith("import os"))
+        for i, chunk in enumerate(chunks):
+            self.assertIn(f"def function_{i}(", chunk.text)
+            self.assertEqual(chunk.text.count("def "), 1)
+
+    def test_large_python_classes_are_split_into_methods(self):
+        methods = "".join(
+            f"    @property\n    def method_{i}(self):\n" + "".join(f"        value_{j} = self.x * {j}\n" for j in range(40)) + "\n"
+            for i in range(4)
+        )
+        text = f"class Large:\n    \"\"\"Docs.\"\"\"\n\n{methods}"
+        chunks = chunk_code("large.py", text, max_tokens=400)
+
+        self.assert_chunks_cover_text(chunks, text)
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(chunks[0].text.startswith("class Large:"))
+        self.assertTrue(all("@property" in chunk.text for chunk in chunks))
+
+    def test_small_token_budgets_split_classes_into_methods(self):
+        methods = "".join(f"    def method_{i}(self):\n        return self.x + {i}\n\n" for i in range(30))
+        text = f"class Small:\n{methods}"
+        chunks = chunk_code("small.py", text, max_tokens=50, min_tokens=20)
+
+        self.assert_chunks_cover_text(chunks, text)
+        self.assertGreater(len(chunks), 5)
+        method_starts = [number for number, line in enumerate(text.split("\n"), 1) if "def method_" in line]
+        # Blank lines between methods belong to the method that follows
+        for chunk in chunks[1:]:
+            self.assertIn(chunk.start_line + 1, method_starts)
+        for chunk in chunks:
+            self.assertTrue(chunk.text.rstrip().split("\n")[-1].strip().startswith("return"))
+
+    def test_python_line_numbers_ignore_other_line_separators(self):
+        text = "def first():\n    return 1  # \x0c page\x1c break\u2028\n\n\n" + "".join(
+            f"def function_{i}(value):\n" + "".join(f"    step_{j} = value * {j}\n" for j in range(40)) + "\n"
+            for i in range(2)
+        )
+        chunks = chunk_code("module.py", text, min_tokens=1)
+
+        self.assert_chunks_cover_text(chunks, text)
+        self.assertEqual([chunk.start_line for chunk in chunks], [1, 3, 46])
+
+    def test_brace_languages_split_at_top_level_blocks(self):
+        text = "".join(
+            f"function handler{i}(event) {{\n" + "".join(f"  const value{j} = event.data[{j}];\n" for j in range(30)) + "}\n\n"
+            for i in range(3)
+        )
+        chunks = chunk_code("handlers.js", text)
+
+        self.assert_chunks_cover_text(chunks, text)
+        self.assertEqual([chunk.start_line for chunk in chunks], [1, 34, 67])
+
+    def test_unparseable_python_falls_back_to_blocks(self):
+        text = "def broken()\n    pass\n\ndef other():\n    pass\n"
+        chunks = chunk_code("broken.py", text, min_tokens=1)
+        self.assertEqual([(chunk.start_line, chunk.end_line) for chunk in chunks], [(1, 3), (4, 5)])
+
+    def test_oversized_blocks_are_split(self):
+        text = "def huge():\n" + "".join(f"    value_{j} = compute({j}, 'padding padding padding')\n" for j in range(500))
+        chunks = chunk_code("huge.py", text, max_tokens=200)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk.text) <= 800 for chunk in chunks))
+        self.assert_chunks_cover_text(chunks, text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from lib.embedding_cache import EmbeddingCache, get_embedding_cache
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_get_set_and_delete(self):
+        cache = get_embedding_cache(self.cache_dir)
+        cache.mset([("a", b"1"), ("b", b"22")])
+        self.assertEqual(cache.mget(["b", "missing", "a"]), [b"22", None, b"1"])
+        self.assertEqual(cache.size, 3)
+
+        cache.mdelete(["a", "missing"])
+        self.assertEqual(cache.mget(["a", "b"]), [None, b"22"])
+        self.assertEqual(sorted(cache.yield_keys()), ["b"])
+        self.assertEqual(cache.size, 2)
+        cache.close()
+
+    def test_entries_persist_in_one_file(self):
+        cache = get_embedding_cache(self.cache_dir)
+        cache.mset([(f"model/{i}", b"x" * 10) for i in range(1000)])
+        cache.close()
+
+        self.assertEqual(os.listdir(self.cache_dir), ["embeddings.sqlite3"])
+        cache = get_embedding_cache(self.cache_dir)
+        self.assertEqual(cache.size, 10000)
+        self.assertEqual(cache.mget(["model/999"]), [b"x" * 10])
+        self.assertEqual(len(list(cache.yield_keys(prefix="model/"))), 1000)
+        cache.close()
+
+    def test_replacing_an_entry_updates_the_size(self):
+        cache = get_embedding_cache(self.cache_dir)
+        cache.mset([("a", b"1234")])
+        cache.mset([("a", b"12")])
+        self.assertEqual(cache.size, 2)
+        cache.close()
+
+    @patch("lib.embedding_cache.time.time")
+    def test_evicts_least_recently_used_entries(self, mock_time):
+        cache = get_embedding_cache(self.cache_dir, max_bytes=30)
+        mock_time.return_value = 1
+        cache.mset([("a", b"x" * 10)])
+        mock_time.return_value = 2
+        cache.mset([("b", b"x" * 10)])
+        mock_time.return_value = 3
+        cache.mset([("c", b"x" * 10)])
+        mock_time.return_value = 4
+        cache.mget(["a"])
+        mock_time.return_value = 5
+        cache.mset([("d", b"x" * 10)])
+
+        self.assertEqual(sorted(cache.yield_keys()), ["a", "c", "d"])
+        self.assertEqual(cache.size, 30)
+        cache.close()
+
+    def test_compact_packs_legacy_files(self):
+        os.makedirs(os.path.join(self.cache_dir, "openai"))
+        with open(os.path.join(self.cache_dir, "openai", "text-embedding-3-smallabc"), "wb") as f:
+            f.write(b"[0.5]")
+        os.makedirs(os.path.join(self.cache_dir, "index"))
+        with open(os.path.join(self.cache_dir, "index", "lexical.json"), "w") as f:
+            f.write("{}")
+
+        cache = EmbeddingCache(os.path.join(self.cache_dir, "embeddings.sqlite3"))
+        imported = cache.compact(legacy_dir=self.cache_dir)
+
+        self.assertEqual(imported, 1)
+        self.assertEqual(cache.mget(["openai/text-embedding-3-smallabc"]), [b"[0.5]"])
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ["embeddings.sqlite3", "index"])
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, "index", "lexical.json")))
+        cache.close()
+
+    def test_compact_evicts_down_to_max_size(self):
+        cache = get_embedding_cache(self.cache_dir)
+        cache.mset([(str(i), b"x" * 10) for i in range(10)])
+        cache.max_bytes = 25
+        cache.compact()
+        self.assertEqual(cache.size, 20)
+        self.assertEqual(len(list(cache.yield_keys())), 2)
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import patch
+from lib.file_manifest import FileManifest, MANIFEST_FILENAME
+import os
+import tempfile
+import time
+
+
+class TestFileManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.startpath = self.tempdir.name
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write(self, path, data, age=60):
+        full_path = os.path.join(self.startpath, path)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        # Age the file past the racy window so the manifest trusts it
+        mtime = time.time() - age
+        os.utime(full_path, (mtime, mtime))
+
+    @patch("lib.file_manifest.is_binary_file", return_value=False)
+    def test_unchanged_files_reuse_verdict_across_runs(self, mock_is_binary):
+        self.write("main.py", "print('hi')\n")
+
+        manifest = FileManifest(self.startpath)
+        manifest.begin_scan()
+        self.assertFalse(manifest.is_binary("main.py"))
+        self.assertEqual(manifest.read_file("main.py"), "print('hi')\n")
+        manifest.save()
+        self.assertTrue(os.path.exists(os.path.join(self.startpath, MANIFEST_FILENAME)))
+
+        reloaded = FileManifest(self.startpath)
+        reloaded.load()
+        reloaded.begin_scan()
+        self.assertFalse(reloaded.is_binary("main.py"))
+        self.assertEqual(mock_is_binary.call_count, 1)
+        self.assertEqual(reloaded.get_hash("main.py"), manifest.get_hash("main.py"))
+
+    @patch("lib.file_manifest.is_binary_file", return_value=False)
+    def test_contents_reused_within_session_until_changed(self, mock_is_binary):
+        self.write("main.py", "one\n")
+        manifest = FileManifest(self.startpath)
+        manifest.begin_scan()
+        manifest.is_binary("main.py")
+        self.assertEqual(manifest.read_file("main.py"), "one\n")
+        first_hash = manifest.get_hash("main.py")
+
+        with patch("builtins.open") as mock_open:
+            self.assertEqual(manifest.read_file("main.py"), "one\n")
+            mock_open.assert_not_called()
+
+        self.write("main.py", "two!\n")
+        self.assertEqual(manifest.read_file("main.py"), "two!\n")
+        self.assertNotEqual(manifest.get_hash("main.py"), first_hash)
+
+    @patch("lib.file_manifest.is_binary_file", return_value=False)
+    def test_token_counts_reset_when_contents_change(self, mock_is_binary):
+        self.write("main.py", "one\n")
+        manifest = FileManifest(self.startpath)
+        manifest.begin_scan()
+        manifest.read_file("main.py")
+        manifest.set_tokens("main.py", "openai/gpt-4o", 2)
+        self.assertEqual(manifest.get_tokens("main.py", "openai/gpt-4o"), 2)
+
+        self.write("main.py", "changed\n")
+        manifest.read_file("main.py")
+        self.assertIsNone(manifest.get_tokens("main.py", "openai/gpt-4o"))
+
+    @patch("lib.file_manifest.is_binary_file", return_value=False)
+    def test_recently_modified_files_are_not_recorded(self, mock_is_binary):
+        self.write("main.py", "one\n", age=0)
+        manifest = FileManifest(self.startpath)
+        manifest.begin_scan()
+        manifest.read_file("main.py")
+        self.assertIsNone(manifest.get_hash("main.py"))
+
+    @patch("lib.file_manifest.is_binary_file", return_value=False)
+    def test_save_drops_files_not_seen(self, mock_is_binary):
+        self.write("kept.py", "kept\n")
+        self.write("deleted.py", "deleted\n")
+        manifest = FileManifest(self.startpath)
+        manifest.begin_scan()
+        manifest.read_file("kept.py")
+        manifest.read_file("deleted.py")
+        manifest.save()
+
+        manifest.begin_scan()
+        manifest.read_file("kept.py")
+        manifest.save()
+        self.assertEqual(set(manifest.entries), {"kept.py"})
+
+
+if __name__ == '__main__':
+    unittest.main()
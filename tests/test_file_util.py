@@ -5,13 +5,20 @@ from lib.file_parser import (
     extract_filename_end,
     parse_files,
     is_in_middle_of_file,
+    format_file_excerpt,
 )
 from lib.file_io import (
     is_binary_file,
-    extract_estimated_characters
+    extract_estimated_characters,
+    walk_paths,
+    get_files,
 )
+from lib.binary_classifier import binary_classifier
+from lib.file_manifest import FileManifest
+from lib.uploaded_file_filter import UploadedFileFilter
 import os
 import tempfile
+import time
 
 class TestFileUtil(unittest.TestCase):
 
@@ -33,6 +40,7 @@ class TestFileUtil(unittest.TestCase):
 
     @patch('magic.Magic')
     def test_is_binary_file_mime_type(self, mock_magic):
+        binary_classifier.reset()
         mock_magic_instance = MagicMock()
         mock_magic.return_value = mock_magic_instance
 
@@ -64,6 +72,99 @@ class TestFileUtil(unittest.TestCase):
         mock_magic_instance.from_file.return_value = 'application/json'
         self.assertFalse(is_binary_file('config.json'))
 
+    def test_walk_paths_prunes_ignored_directories(self):
+        upload_filter = MagicMock()
+        upload_filter.should_descend.side_effect = lambda d: os.path.normpath(d) != "node_modules"
+
+        with tempfile.TemporaryDirectory() as startpath:
+            for path in ["b.py", "a.py", "src/main.py", "node_modules/pkg/index.js"]:
+                full_path = os.path.join(startpath, path)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                with open(full_path, "w") as f:
+                    f.write("print('hi')\n")
+
+            files = list(walk_paths(startpath, upload_filter))
+
+        self.assertEqual(files, ["a.py", "b.py", os.path.join("src", "main.py")])
+        descended = [os.path.normpath(call.args[0]) for call in upload_filter.should_descend.call_args_list]
+        self.assertFalse(any(path.startswith(os.path.join("node_modules", "")) for path in descended))
+
+    def test_get_files_parallel_matches_serial_order(self):
+        upload_filter = MagicMock()
+        upload_filter.manifest = None
+        upload_filter.should_descend.return_value = True
+        upload_filter.should_upload.side_effect = lambda path, stat_result=None: not path.endswith(".skip")
+
+        with tempfile.TemporaryDirectory() as startpath:
+            for i in range(40):
+                full_path = os.path.join(startpath, f"pkg{i % 4}", f"file{i}.py")
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                with open(full_path, "w") as f:
+                    f.write(f"value = {i}\n")
+            with open(os.path.join(startpath, "ignored.skip"), "w") as f:
+                f.write("skip")
+
+            with patch("sys.stdout"):
+                serial = get_files(startpath, upload_filter, workers=1)
+                parallel = get_files(startpath, upload_filter, workers=8)
+
+        self.assertEqual(len(serial), 40)
+        self.assertEqual(serial, parallel)
+
+    def test_get_files_lazy_reads_contents_on_first_use(self):
+        upload_filter = MagicMock()
+        upload_filter.manifest = None
+        upload_filter.should_descend.return_value = True
+        upload_filter.should_upload.return_value = True
+
+        with tempfile.TemporaryDirectory() as startpath:
+            with open(os.path.join(startpath, "main.py"), "w") as f:
+                f.write("print('hi')\n")
+
+            with patch("sys.stdout"):
+                files = get_files(startpath, upload_filter, lazy=True)
+
+            self.assertEqual([file["path"] for file in files], ["main.py"])
+            self.assertFalse(files[0].loaded)
+            self.assertEqual(files[0]["data"], "print('hi')\n")
+            self.assertTrue(files[0].loaded)
+
+    def test_get_files_stats_git_listed_files_once(self):
+        binary_classifier.reset()
+        with tempfile.TemporaryDirectory() as startpath:
+            for path in ["main.py", os.path.join("src", "util.py")]:
+                full_path = os.path.join(startpath, path)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                with open(full_path, "w") as f:
+                    f.write("print('hi')\n")
+            upload_filter = UploadedFileFilter(startpath, manifest=FileManifest(startpath))
+
+            with patch("lib.file_io.list_git_files", return_value=["main.py", os.path.join("src", "util.py")]), \
+                    patch("os.stat", wraps=os.stat) as mock_stat, patch("sys.stdout"):
+                files = get_files(startpath, upload_filter)
+
+            self.assertEqual([file["data"] for file in files], ["print('hi')\n"] * 2)
+            stated = [call.args[0] for call in mock_stat.call_args_list]
+            for file in files:
+                self.assertEqual(stated.count(file.full_path), 1)
+
+    def test_binary_detection_stats_cover_latest_scan(self):
+        binary_classifier.reset()
+        with tempfile.TemporaryDirectory() as startpath:
+            for name in ["main.py", "notes.txt"]:
+                full_path = os.path.join(startpath, name)
+                with open(full_path, "w") as f:
+                    f.write("print('hi')\n")
+                # Age the file past the manifest's racy window so its verdict is recorded
+                os.utime(full_path, (time.time() - 60, time.time() - 60))
+            upload_filter = UploadedFileFilter(startpath, manifest=FileManifest(startpath))
+
+            with patch("lib.file_io.list_git_files", return_value=["main.py", "notes.txt"]), patch("sys.stdout"):
+                get_files(startpath, upload_filter)
+                self.assertEqual(binary_classifier.get_stats(), {"sniff": 2})
+                get_files(startpath, upload_filter)
+                self.assertEqual(binary_classifier.get_stats(), {"manifest": 2})
+
     def test_parse_files(self):
         text = """===.= ==== FILENAME: file1.py = ===== =========
 ```python
@@ -75,6 +176,25 @@ print("Hello world")
         self.assertEqual(files[0]["filename"], "file1.py")
         self.assertIn("print(\"Hello world\")", files[0]["contents"])
 
+    def test_format_file_excerpt(self):
+        data = "".join(f"line {i}\n" for i in range(1, 21))
+        excerpt = format_file_excerpt(data, [(15, 15), (3, 4), (7, 7)], context_lines=1)
+        self.assertEqual(
+            excerpt,
+            "**************** EXCERPT: LINES 2-8 OF 20 ****************\n"
+            + "".join(f"line {i}\n" for i in range(2, 9))
+            + "**************** EXCERPT: LINES 14-16 OF 20 ****************\n"
+            + "line 14\nline 15\nline 16\n"
+        )
+
+    def test_format_file_excerpt_clamps_to_file(self):
+        excerpt = format_file_excerpt("a\nb", [(1, 2)], context_lines=3)
+        self.assertEqual(excerpt, "**************** EXCERPT: LINES 1-2 OF 2 ****************\na\nb\n")
+
+    def test_format_file_excerpt_splits_at_newlines_only(self):
+        excerpt = format_file_excerpt("a\x0cb\nc\u2028d\ne\n", [(2, 2)])
+        self.assertEqual(excerpt, "**************** EXCERPT: LINES 2-2 OF 3 ****************\nc\u2028d\n")
+
     def test_is_in_middle_of_file(self):
         string = "===.= ==== FILENAME: file1.py = ===== =========\n```python\nprint(\"Hello world\")"
         self.assertTrue(is_in_middle_of_file(string))
@@ -0,0 +1,124 @@
+import unittest
+from lib.git_index import list_git_files, read_index, walk_order_key
+import os
+import shutil
+import subprocess
+import tempfile
+
+
+@unittest.skipUnless(shutil.which("git"), "git is not installed")
+class TestGitIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.repo = self.tempdir.name
+        self.git("init", "-q")
+        for path in ["README.md", "src/app.py", "src/lib/util.py", "docs/guide.md"]:
+            self.write(path)
+        self.write(".gitignore", "*.log\n")
+        self.write("src/.gitignore", "generated/\n")
+        self.git("add", ".")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def git(self, *args):
+        subprocess.run(["git", *args], cwd=self.repo, check=True, stdout=subprocess.DEVNULL)
+
+    def write(self, path, data="contents\n"):
+        full_path = os.path.join(self.repo, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(data)
+
+    def expected_walk_order(self, startpath):
+        paths = []
+        for root, dirs, files in os.walk(startpath):
+            dirs[:] = sorted(d for d in dirs if d != ".git")
+            for f in sorted(files):
+                paths.append(os.path.relpath(os.path.join(root, f), startpath))
+        return paths
+
+    def test_lists_tracked_and_untracked_files_in_walk_order(self):
+        self.write("notes.txt")
+        self.write("debug.log")
+        self.write("src/generated/out.py")
+
+        files = list_git_files(self.repo)
+
+        expected = [
+            path for path in self.expected_walk_order(self.repo)
+            if not path.endswith(".log") and "generated" not in path
+        ]
+        self.assertEqual(files, expected)
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "symlinks are not supported")
+    def test_skips_symlinks_to_directories(self):
+        os.symlink("src", os.path.join(self.repo, "tracked_link"))
+        os.symlink(os.path.join("src", "app.py"), os.path.join(self.repo, "file_link.py"))
+        self.git("add", "tracked_link", "file_link.py")
+        os.symlink("docs", os.path.join(self.repo, "untracked_link"))
+
+        files = list_git_files(self.repo)
+
+        self.assertIn("file_link.py", files)
+        self.assertNotIn("tracked_link", files)
+        self.assertNotIn("untracked_link", files)
+        # The same files as a directory walk, which does not follow symlinks to directories
+        self.assertEqual(files, self.expected_walk_order(self.repo))
+
+    def test_lists_files_of_submodules_and_nested_repositories(self):
+        with tempfile.TemporaryDirectory() as library:
+            def git_library(*args):
+                subprocess.run(["git", *args], cwd=library, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            git_library("init", "-q")
+            with open(os.path.join(library, "inner.py"), "w") as f:
+                f.write("contents\n")
+            git_library("add", "inner.py")
+            git_library("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-q", "-m", "inner")
+            subprocess.run(
+                ["git", "-c", "protocol.file.allow=always", "submodule", "add", "-q", library, "vendor"],
+                cwd=self.repo, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+        os.makedirs(os.path.join(self.repo, "nested"))
+        subprocess.run(["git", "init", "-q"], cwd=os.path.join(self.repo, "nested"), check=True)
+        self.write("nested/code.py")
+        self.write("vendor/untracked.py")
+
+        files = list_git_files(self.repo)
+
+        self.assertIn(os.path.join("vendor", "inner.py"), files)
+        self.assertIn(os.path.join("vendor", "untracked.py"), files)
+        self.assertIn(os.path.join("nested", "code.py"), files)
+        self.assertEqual(
+            [path for path in files if path.startswith(("vendor", "nested"))],
+            [os.path.join("nested", "code.py"), os.path.join("vendor", "inner.py"), os.path.join("vendor", "untracked.py")],
+        )
+
+    def test_lists_files_beneath_subdirectory(self):
+        files = list_git_files(os.path.join(self.repo, "src"))
+        self.assertEqual(files, [".gitignore", "app.py", os.path.join("lib", "util.py")])
+
+    def test_reads_index_version_4(self):
+        self.git("update-index", "--index-version", "4")
+        entries = read_index(os.path.join(self.repo, ".git"))
+        self.assertEqual(
+            sorted(entry.path for entry in entries),
+            [".gitignore", "README.md", "docs/guide.md", "src/.gitignore", "src/app.py", "src/lib/util.py"],
+        )
+        self.assertTrue(all(entry.size == len("contents\n") for entry in entries if entry.path.endswith((".md", ".py"))))
+
+    def test_returns_none_outside_work_tree(self):
+        with tempfile.TemporaryDirectory() as plain_dir:
+            self.assertIsNone(list_git_files(plain_dir))
+
+    def test_walk_order_key(self):
+        paths = [os.path.join("a", "b", "y.py"), "z.py", os.path.join("a", "x.py"), os.path.join("c", "z.py")]
+        self.assertEqual(
+            sorted(paths, key=walk_order_key),
+            ["z.py", os.path.join("a", "x.py"), os.path.join("a", "b", "y.py"), os.path.join("c", "z.py")],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,22 @@
 import unittest
-from lib.gitignore_parser import parse_gitignore, is_ignored
+from lib.gitignore_parser import parse_gitignore, is_ignored, IgnoreMatcher
 import os
+import random
 import tempfile
 
 
+def reference_is_ignored(path, ignore_patterns):
+    for pattern in ignore_patterns:
+        if (
+            path.endswith(f"/{pattern}")
+            or path.startswith(pattern)
+            or path.startswith(f"./{pattern}")
+            or f"/{pattern}/" in path
+        ):
+            return True
+    return False
+
+
 class TestGitignoreParser(unittest.TestCase):
     def test_parse_gitignore(self):
         with tempfile.NamedTemporaryFile(
@@ -29,6 +42,35 @@ class TestGitignoreParser(unittest.TestCase):
         )
         self.assertFalse(is_ignored("test/file.py", ignore_patterns))
 
+    def test_matcher_matches_reference_semantics(self):
+        rng = random.Random(1234)
+        alphabet = ["a", "b", ".", "/", "*", "venv", "node_modules", "(", "+"]
+        for _ in range(200):
+            patterns = {
+                "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 4)))
+                for _ in range(rng.randint(0, 8))
+            }
+            matcher = IgnoreMatcher(patterns)
+            for _ in range(50):
+                path = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 8)))
+                self.assertEqual(
+                    matcher.is_ignored(path),
+                    reference_is_ignored(path, patterns),
+                    f"{path!r} against {patterns!r}",
+                )
+
+    def test_matcher_edge_cases(self):
+        matcher = IgnoreMatcher({"venv", "ven", ".git"})
+        self.assertTrue(matcher.is_ignored("venv"))
+        self.assertTrue(matcher.is_ignored("./venv/bin"))
+        self.assertTrue(matcher.is_ignored("src/ven"))
+        self.assertTrue(matcher.is_ignored("src/.git/config"))
+        self.assertTrue(matcher.is_ignored("vent.py"))
+        self.assertFalse(matcher.is_ignored("src/venv\n"))
+        self.assertFalse(matcher.is_ignored("src/vent.py"))
+        self.assertFalse(IgnoreMatcher(set()).is_ignored("anything"))
+        self.assertTrue(IgnoreMatcher({""}).is_ignored("anything"))
+
 
 if __name__ == "__main__":
     unittest.main()
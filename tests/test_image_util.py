@@ -0,0 +1,176 @@
+import base64
+import os
+import struct
+import sys
+import tempfile
+import types
+import unittest
+from unittest.mock import patch
+from lib import image_util
+from lib.image_util import (
+    calculate_image_token_cost,
+    calculate_image_url_token_cost,
+    estimate_image_tokens,
+    get_data_url_image_size,
+    get_image_asset,
+    get_image_size,
+    get_max_image_side,
+    process_image,
+)
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def png_header(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+
+
+def jpeg_header(width, height, metadata_bytes=100):
+    app1 = b"\xff\xe1" + struct.pack(">H", metadata_bytes + 2) + b"\xff" * metadata_bytes
+    sof = b"\xff\xc0" + struct.pack(">HBHHB", 17, 8, height, width, 3) + b"\x00" * 9
+    return b"\xff\xd8" + app1 + b"\xff\xc4\x00\x04\x00\x00" + sof + b"\xff\xda\x00\x02"
+
+
+class TestImageUtil(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        patcher = patch.multiple(image_util, _image_assets={}, _data_url_sizes={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tempdir.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_get_image_size_from_headers(self):
+        images = {
+            "image.png": png_header(640, 480),
+            "image.gif": b"GIF89a" + struct.pack("<HH", 320, 200) + b"\x00" * 20,
+            "image.jpg": jpeg_header(1920, 1080),
+            "lossy.webp": b"RIFF\x00\x00\x00\x00WEBPVP8 \x00\x00\x00\x00\x00\x00\x00\x9d\x01\x2a"
+                          + struct.pack("<HH", 800, 600),
+            "lossless.webp": b"RIFF\x00\x00\x00\x00WEBPVP8L\x00\x00\x00\x00\x2f"
+                             + ((1023) | (767 << 14)).to_bytes(4, "little") + b"\x00" * 5,
+            "extended.webp": b"RIFF\x00\x00\x00\x00WEBPVP8X\x0a\x00\x00\x00\x00\x00\x00\x00"
+                             + (4095).to_bytes(3, "little") + (2159).to_bytes(3, "little"),
+        }
+        expected = {
+            "image.png": (640, 480),
+            "image.gif": (320, 200),
+            "image.jpg": (1920, 1080),
+            "lossy.webp": (800, 600),
+            "lossless.webp": (1024, 768),
+            "extended.webp": (4096, 2160),
+        }
+        for name, data in images.items():
+            self.assertEqual(get_image_size(self.write(name, data)), expected[name], name)
+
+    def test_get_image_size_of_unsupported_file(self):
+        self.assertIsNone(get_image_size(self.write("image.bmp", b"BM" + b"\x00" * 40)))
+        self.assertIsNone(get_image_size(self.write("truncated.jpg", b"\xff\xd8\xff\xe1\x10\x00")))
+
+    def test_get_data_url_image_size(self):
+        encoded = base64.b64encode(png_header(100, 50) + b"\x00" * 1000).decode()
+        self.assertEqual(get_data_url_image_size(f"data:image/png;base64,{encoded}"), (100, 50))
+        self.assertIsNone(get_data_url_image_size("https://example.com/image.png"))
+        self.assertIsNone(get_data_url_image_size("data:image/png;base64,not base64!"))
+
+    def test_get_data_url_image_size_past_large_jpeg_metadata(self):
+        encoded = base64.b64encode(jpeg_header(300, 200, metadata_bytes=60000) * 2).decode()
+        self.assertEqual(get_data_url_image_size(f"data:image/jpeg;base64,{encoded}"), (300, 200))
+
+    def test_estimate_image_tokens_openai(self):
+        self.assertEqual(estimate_image_tokens(1024, 1024, "openai/gpt-4o"), 765)
+        self.assertEqual(estimate_image_tokens(2048, 4096, "openai/gpt-4o"), 1105)
+        self.assertEqual(estimate_image_tokens(100, 100, "openai/gpt-4o"), 255)
+        self.assertEqual(estimate_image_tokens(1024, 1024, "openai/gpt-4o-mini"), 25501)
+
+    def test_estimate_image_tokens_anthropic(self):
+        self.assertEqual(estimate_image_tokens(1000, 1000, "anthropic/claude-3-5-sonnet-20241022"), 1334)
+        self.assertEqual(estimate_image_tokens(200, 200, "claude-3-haiku"), 54)
+        self.assertEqual(estimate_image_tokens(4000, 3000, "anthropic/claude-3-opus"), 1600)
+
+    def test_estimate_image_tokens_gemini(self):
+        self.assertEqual(estimate_image_tokens(300, 200, "gemini/gemini-1.5-pro"), 258)
+        self.assertEqual(estimate_image_tokens(1024, 1024, "gemini/gemini-1.5-pro"), 1032)
+
+    def test_calculate_image_token_cost(self):
+        path = self.write("image.png", png_header(1024, 1024))
+        self.assertEqual(calculate_image_token_cost(path, "openai/gpt-4o"), 765)
+        # Images whose size cannot be read are estimated at 1024x1024
+        self.assertEqual(calculate_image_token_cost(self.write("image.bmp", b"BM"), "openai/gpt-4o"), 765)
+        self.assertEqual(calculate_image_url_token_cost("https://example.com/a.png", "openai/gpt-4o"), 765)
+        with self.assertRaises(FileNotFoundError):
+            calculate_image_token_cost(os.path.join(self.tempdir.name, "missing.png"), "openai/gpt-4o")
+
+    def test_process_image_encodes_each_file_once(self):
+        path = self.write("image.png", png_header(640, 480) + b"pixels")
+        with patch("lib.image_util.base64.b64encode", wraps=base64.b64encode) as b64encode:
+            data_url = process_image(path)
+            self.assertIs(process_image(path), data_url)
+            self.assertEqual(calculate_image_token_cost(path, "openai/gpt-4o"), 425)
+            # The size of an encoded image is looked up rather than decoded from the data URL
+            with patch("lib.image_util.get_data_url_image_size") as get_data_url_image_size:
+                self.assertEqual(calculate_image_url_token_cost(data_url, "openai/gpt-4o"), 425)
+            get_data_url_image_size.assert_not_called()
+        self.assertEqual(b64encode.call_count, 1)
+        self.assertTrue(data_url.startswith("data:image/png;base64,"))
+
+    def test_changed_image_is_read_again(self):
+        path = self.write("image.png", png_header(640, 480))
+        self.assertEqual(get_image_asset(path).size, (640, 480))
+        old_data_url = process_image(path)
+        self.write("image.png", png_header(1280, 960) + b"more")
+        self.assertEqual(get_image_asset(path).size, (1280, 960))
+        # The previous version's asset and data URLs are dropped
+        self.assertEqual(len(image_util._image_assets), 1)
+        self.assertNotIn(old_data_url, image_util._data_url_sizes)
+
+    def test_process_image_rejects_unrecognized_files(self):
+        with self.assertRaises(ValueError):
+            process_image(self.write("notes.txt", b"not an image"))
+        with self.assertRaises(FileNotFoundError):
+            process_image(os.path.join(self.tempdir.name, "missing.png"))
+
+    def test_get_max_image_side(self):
+        self.assertEqual(get_max_image_side("openai/gpt-4o"), 2048)
+        self.assertEqual(get_max_image_side("anthropic/claude-3-5-sonnet-20241022"), 1568)
+        self.assertIsNone(get_max_image_side("gemini/gemini-1.5-pro"))
+
+    def test_images_within_max_side_are_sent_as_is(self):
+        path = self.write("image.png", png_header(640, 480))
+        with patch("lib.image_util._downscale") as downscale:
+            self.assertEqual(process_image(path, max_side=1568), process_image(path))
+        downscale.assert_not_called()
+
+    def test_images_pillow_cannot_read_are_sent_as_is(self):
+        path = self.write("large.png", png_header(4000, 3000) + b"truncated")
+        def open_image(path):
+            raise OSError("image file is truncated")
+
+        unreadable = types.SimpleNamespace(open=open_image)
+        with patch.dict(sys.modules, {"PIL": types.SimpleNamespace(Image=unreadable)}), patch("sys.stdout"):
+            data_url = process_image(path, max_side=1568)
+        self.assertEqual(base64.b64decode(data_url.split(",", 1)[1]), png_header(4000, 3000) + b"truncated")
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_large_images_are_downscaled(self):
+        path = os.path.join(self.tempdir.name, "large.png")
+        Image.new("RGB", (3000, 1000)).save(path)
+        data_url = process_image(path, max_side=1568)
+        encoded = data_url.split(",", 1)[1]
+        self.assertEqual(get_data_url_image_size(data_url)[0], 1568)
+        self.assertLess(len(encoded), len(process_image(path).split(",", 1)[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
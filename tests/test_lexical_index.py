@@ -0,0 +1,78 @@
+import unittest
+from lib.code_chunker import Chunk
+from lib.file_io import FileRecord
+from lib.lexical_index import get_lexical_index, tokenize
+import os
+import tempfile
+
+
+def split_chunks(path, text):
+    return [Chunk(part, line, line) for line, part in enumerate(text.split("|"), 1)]
+
+
+class TestLexicalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.startpath = self.tempdir.name
+        self.cache_dir = os.path.join(self.startpath, ".arcode.embeddings")
+        self.split_calls = []
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def split(self, path, text):
+        self.split_calls.append(text)
+        return split_chunks(path, text)
+
+    def update(self, contents):
+        records = []
+        for path, data in contents.items():
+            with open(os.path.join(self.startpath, path), "w") as f:
+                f.write(data)
+            records.append(FileRecord(self.startpath, path))
+        index = get_lexical_index(self.cache_dir)
+        changed = index.update(records, split=self.split)
+        return index, changed
+
+    def test_tokenize_splits_identifiers(self):
+        self.assertEqual(
+            tokenize("def countTokens(token_count): parseHTTPResponse2 x"),
+            ["def", "counttokens", "count", "tokens", "token_count", "token", "count",
+             "parsehttpresponse2", "parse", "http", "response"],
+        )
+
+    def test_search_ranks_matching_chunks(self):
+        index, changed = self.update({
+            "counter.py": "def count_tokens(text): return len(encode(text))|def unrelated(): pass",
+            "menu.py": "def display_menu(): tokens = countTokens(history)",
+            "readme.md": "nothing relevant here",
+        })
+
+        self.assertTrue(changed)
+        results = index.search("token count", k=5)
+        self.assertEqual(sorted((path, lines) for path, _, lines in results), [("counter.py", (1, 1)), ("menu.py", (1, 1))])
+        self.assertTrue(all(score > 0 for _, score, _ in results))
+        self.assertEqual(index.search("display menu", k=1)[0][0], "menu.py")
+
+    def test_only_changed_files_are_tokenized(self):
+        self.update({"a.py": "alpha beta", "b.py": "gamma delta", "c.py": "epsilon"})
+        self.split_calls = []
+
+        index, changed = self.update({"a.py": "alpha beta", "b.py": "gamma zeta"})
+
+        self.assertTrue(changed)
+        self.assertEqual(self.split_calls, ["gamma zeta"])
+        self.assertEqual(index.search("delta", k=5), [])
+        self.assertEqual(index.search("epsilon", k=5), [])
+        self.assertEqual(index.search("zeta", k=5)[0][0], "b.py")
+        self.assertEqual(index.search("alpha", k=5)[0][0], "a.py")
+
+        self.split_calls = []
+        _, changed = self.update({"a.py": "alpha beta", "b.py": "gamma zeta"})
+        self.assertFalse(changed)
+        self.assertEqual(self.split_calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
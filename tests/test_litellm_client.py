@@ -1,6 +1,16 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from lib.litellm_client import create_litellm_client, calculate_token_count
+from lib.litellm_client import create_litellm_client, calculate_token_count, LitellmEmbeddings
+
+
+def fake_encoding():
+    encoding = MagicMock()
+    encoding.encode.side_effect = lambda text, disallowed_special=(): text.split()
+    return encoding
+
+
+def fake_embedding(model, input, **kwargs):
+    return {"data": [{"embedding": [len(text)]} for text in input]}
 
 class TestLitellmClient(unittest.TestCase):
 
@@ -27,5 +37,33 @@ class TestLitellmClient(unittest.TestCase):
         self.assertEqual(token_counts["output_tokens"], 0)
         self.assertEqual(token_counts["total_tokens"], 3)
 
+    @patch('lib.litellm_client.embedding', side_effect=fake_embedding)
+    @patch('lib.litellm_client.get_model_encoding', side_effect=lambda model: fake_encoding())
+    def test_embed_documents_batches_by_tokens(self, mock_get_model_encoding, mock_embedding):
+        embeddings = LitellmEmbeddings("openai/text-embedding-3-small", "api_key", batch_tokens=4, concurrency=3)
+        texts = ["a b", "c d", "e", "f g h i j", "k"]
+
+        result = embeddings.embed_documents(texts)
+
+        self.assertEqual(result, [[len(text)] for text in texts])
+        batches = sorted(call.kwargs["input"] for call in mock_embedding.call_args_list)
+        self.assertEqual(batches, [["a b", "c d"], ["e"], ["f g h i j"], ["k"]])
+
+    @patch('time.sleep')
+    @patch('lib.litellm_client.RETRYABLE_EMBEDDING_ERRORS', (ConnectionError,))
+    @patch('lib.litellm_client.embedding')
+    @patch('lib.litellm_client.get_model_encoding', side_effect=lambda model: fake_encoding())
+    def test_embed_documents_retries_transient_errors(self, mock_get_model_encoding, mock_embedding, mock_sleep):
+        mock_embedding.side_effect = [ConnectionError("reset"), ConnectionError("reset"), fake_embedding("model", ["ab"])]
+        embeddings = LitellmEmbeddings("openai/text-embedding-3-small", "api_key", max_retries=2)
+
+        with patch('sys.stdout'):
+            self.assertEqual(embeddings.embed_documents(["ab"]), [[2]])
+        self.assertEqual(mock_sleep.call_count, 2)
+
+        mock_embedding.side_effect = ConnectionError("reset")
+        with patch('sys.stdout'), self.assertRaises(ConnectionError):
+            embeddings.embed_documents(["ab"])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
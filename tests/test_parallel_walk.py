@@ -0,0 +1,63 @@
+import unittest
+from lib.parallel_walk import parallel_walk
+import os
+import tempfile
+
+
+class TestParallelWalk(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.startpath = self.tempdir.name
+        for top in range(6):
+            for sub in range(5):
+                for i in range(3):
+                    self.write(os.path.join(f"dir{top}", f"sub{sub}", f"file{i}.txt"), "x" * i)
+        self.write("root.txt", "root")
+        self.write(os.path.join("node_modules", "pkg", "index.js"), "ignored")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write(self, path, data):
+        full_path = os.path.join(self.startpath, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(data)
+
+    def serial_walk(self, should_descend):
+        paths = []
+        for root, dirs, files in os.walk(self.startpath):
+            rel_root = os.path.relpath(root, self.startpath)
+            dirs[:] = [d for d in dirs if should_descend(os.path.normpath(os.path.join(rel_root, d)))]
+            paths.extend(os.path.relpath(os.path.join(root, f), self.startpath) for f in files)
+        return sorted(paths)
+
+    def test_finds_same_files_as_os_walk(self):
+        should_descend = lambda directory: directory != "node_modules"
+        found = dict(parallel_walk(self.startpath, should_descend, workers=4))
+
+        self.assertEqual(sorted(found), self.serial_walk(should_descend))
+        self.assertEqual(found[os.path.join("dir3", "sub2", "file2.txt")].st_size, 2)
+        self.assertEqual(found["root.txt"].st_size, 4)
+
+    def test_does_not_follow_directory_symlinks(self):
+        os.symlink(os.path.join(self.startpath, "dir0"), os.path.join(self.startpath, "link"))
+        found = [path for path, _ in parallel_walk(self.startpath, lambda directory: True, workers=4)]
+        self.assertFalse(any(path.startswith("link") for path in found))
+
+    def test_raises_errors_from_should_descend(self):
+        def should_descend(directory):
+            raise ValueError(directory)
+
+        with self.assertRaises(ValueError):
+            list(parallel_walk(self.startpath, should_descend, workers=4))
+
+    def test_stops_workers_when_consumer_stops_early(self):
+        walk = parallel_walk(self.startpath, lambda directory: True, workers=4)
+        next(walk)
+        walk.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
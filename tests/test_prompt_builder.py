@@ -1,7 +1,7 @@
 from io import StringIO
 import unittest
 from unittest.mock import MagicMock, patch
-from lib.prompt_builder import build_prompt
+from lib.prompt_builder import build_prompt, build_fileset, print_focused_file_output_line
 
 class TestPromptBuilder(unittest.TestCase):
 
@@ -43,6 +43,7 @@ class TestPromptBuilder(unittest.TestCase):
         args.focused = False
         args.resources = ["http://example.com"]
         args.images = ["image1.jpg"]
+        args.downscale_images = False
         args.mode = "implement"
         args.model_embedding = "openai/text-embedding-3-small"
         args.dir = "startpath"
@@ -67,8 +68,41 @@ class TestPromptBuilder(unittest.TestCase):
         mock_get_files.assert_called_once()
         mock_print_files_as_tree.assert_called_once()
         mock_format_file_contents.assert_called_once()
-        mock_process_image.assert_called_once_with("image1.jpg")
+        mock_process_image.assert_called_once_with("image1.jpg", None)
         mock_requests_get.assert_called_once_with("http://example.com")
 
+    @patch('sys.stdout', new_callable=StringIO)
+    @patch("lib.prompt_builder.get_manifest")
+    @patch("lib.prompt_builder.UploadedFileFilter")
+    @patch("lib.prompt_builder.get_top_relevant_files", return_value=[])
+    @patch("lib.prompt_builder.get_files", return_value=[])
+    def test_build_fileset_chunk_context_only_in_question_mode(
+        self, mock_get_files, mock_get_top_relevant_files, mock_filter, mock_get_manifest, mock_stdout
+    ):
+        args = MagicMock()
+        args.focused = 5
+        args.focused_context = "chunk"
+        args.debug = False
+        args.ann_threshold = 0
+
+        args.mode = "question"
+        build_fileset(args, "requirements")
+        self.assertEqual(mock_get_top_relevant_files.call_args.kwargs["context"], "chunk")
+
+        args.mode = "implement"
+        build_fileset(args, "requirements")
+        self.assertEqual(mock_get_top_relevant_files.call_args.kwargs["context"], "file")
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_focused_file_output_distinguishes_fused_scores(self, mock_stdout):
+        print_focused_file_output_line({"path": "a.py", "score": 1 / 61 + 1 / 62, "lines": [(3, 9)]})
+        print_focused_file_output_line({"path": "b.py", "score": 1 / 61 + 1 / 63})
+        print_focused_file_output_line({"path": "c.py", "score": 0.8512})
+        output = mock_stdout.getvalue()
+        self.assertIn("(0.0325)", output)
+        self.assertIn("(0.0323)", output)
+        self.assertIn("(0.851)", output)
+        self.assertIn("lines 3-9", output)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,25 @@
+import unittest
+from lib.rank_fusion import reciprocal_rank_fusion, RRF_K
+
+
+class TestRankFusion(unittest.TestCase):
+
+    def test_files_ranked_by_both_methods_rise_to_the_top(self):
+        lexical = [("named.py", 12.0), ("lexical_only.py", 9.0), ("both.py", 4.0)]
+        vector = [("vector_only.py", 0.9), ("both.py", 0.8), ("named.py", 0.5)]
+
+        fused = reciprocal_rank_fusion([lexical, vector], limit=3)
+
+        self.assertEqual([path for path, _ in fused], ["named.py", "both.py", "vector_only.py"])
+        self.assertAlmostEqual(fused[0][1], 1 / (RRF_K + 1) + 1 / (RRF_K + 3))
+
+    def test_repeated_files_count_at_their_best_rank(self):
+        fused = reciprocal_rank_fusion([[("a.py", 3), ("a.py", 2), ("b.py", 1)]], limit=5)
+        self.assertEqual(fused, [("a.py", 1 / (RRF_K + 1)), ("b.py", 1 / (RRF_K + 2))])
+
+    def test_empty_rankings(self):
+        self.assertEqual(reciprocal_rank_fusion([[], []], limit=5), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
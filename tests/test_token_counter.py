@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import patch
+from lib.token_counter import TokenCounter
+
+
+class FakeEncoding:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text, disallowed_special=()):
+        self.encoded.append(text)
+        return text.split()
+
+
+class TestTokenCounter(unittest.TestCase):
+
+    def setUp(self):
+        self.encoding = FakeEncoding()
+        patcher = patch.object(TokenCounter, "_get_encoding", return_value=self.encoding)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.counter = TokenCounter("openai/gpt-4o")
+
+    def test_count_tokens(self):
+        messages = [
+            {"role": "system", "content": "be helpful"},
+            {"role": "user", "content": [
+                {"type": "text", "text": "one two three"},
+                {"type": "image_url", "image_url": {"url": "data:image/png;base64,abc"}},
+            ]},
+            {"role": "assistant", "content": "four five"},
+        ]
+        counts = self.counter.count_tokens(messages)
+        self.assertEqual(counts["content_tokens"], 7)
+        # Images are costed from their size, 1024x1024 when it cannot be read, not tokenized
+        self.assertEqual(counts["image_tokens"], 765)
+        self.assertEqual(counts["input_tokens"], 768)
+        self.assertEqual(counts["output_tokens"], 4)
+        self.assertEqual(counts["total_tokens"], 772)
+        self.assertNotIn("data:image/png;base64,abc", self.encoding.encoded)
+        self.assertEqual(counts["model"], "openai/gpt-4o")
+
+    def test_recounting_only_encodes_new_messages(self):
+        messages = [{"role": "user", "content": "files " * 1000}]
+        self.counter.count_tokens(messages)
+        messages.append({"role": "assistant", "content": "an answer"})
+        messages.append({"role": "user", "content": "a followup"})
+        self.encoding.encoded = []
+
+        counts = self.counter.count_tokens(messages)
+
+        self.assertEqual(self.encoding.encoded, ["an answer", "a followup"])
+        self.assertEqual(counts["input_tokens"], 1002)
+        self.assertEqual(counts["output_tokens"], 2)
+        self.encoding.encoded = []
+        self.assertEqual(self.counter.count_tokens(messages)["total_tokens"], 1004)
+        self.assertEqual(self.encoding.encoded, [])
+
+    def test_repeated_content_is_encoded_once(self):
+        files = "def main(): pass"
+        messages = [{"role": "user", "content": "".join([files])}]
+        self.counter.count_tokens(messages)
+        messages.append({"role": "user", "content": "".join([files])})
+
+        counts = self.counter.count_tokens(messages)
+
+        self.assertEqual(self.encoding.encoded, [files])
+        self.assertEqual(counts["input_tokens"], 6)
+
+    def test_changed_messages_are_counted_again(self):
+        messages = [
+            {"role": "user", "content": "one two"},
+            {"role": "assistant", "content": "three"},
+        ]
+        self.counter.count_tokens(messages)
+        messages[0]["content"] = "one"
+        del messages[1]
+
+        counts = self.counter.count_tokens(messages)
+
+        self.assertEqual(counts["input_tokens"], 1)
+        self.assertEqual(counts["output_tokens"], 0)
+        self.assertEqual(counts["total_tokens"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import random
+import unittest
+from unittest.mock import patch
+from lib.tokenization import count_tokens, get_model_encoding, split_at_safe_boundaries
+import tiktoken
+import tiktoken_ext.openai_public
+
+
+def offline_encoding(name):
+    # The real patterns and special tokens of an encoding, with a small vocabulary of single
+    # bytes and a few merges instead of the downloaded one
+    ranks = {bytes([i]): i for i in range(256)}
+    for token in [b"  ", b"    ", b"\n\n", b"de", b"def", b"re", b"ret", b"return", b"se", b"self", b"()", b"):", b"in"]:
+        ranks[token] = len(ranks)
+    with patch.object(tiktoken_ext.openai_public, "load_tiktoken_bpe", return_value=ranks):
+        constructor = getattr(tiktoken_ext.openai_public, name)()
+    constructor.pop("explicit_n_vocab", None)
+    return tiktoken.Encoding(**constructor)
+
+
+def sample_text(rng, lines):
+    fragments = [
+        "def main(self):", "    return self.value", "}", ")", "/path/to/file", "// comment", "# heading",
+        "", "   ", "\t", "<|endoftext|>", "naïve café 東京", "12345678", "x = 'it's'", "\r", "/*", " */",
+    ]
+    return "\n".join(rng.choice(fragments) + rng.choice(["", ")", "/", " "]) for _ in range(lines))
+
+
+class TestTokenization(unittest.TestCase):
+
+    def test_split_at_safe_boundaries(self):
+        text = "alpha\nbeta\n  gamma\n/delta \nzeta\n\neta\ntheta"
+        pieces = split_at_safe_boundaries(text, piece_chars=3)
+        self.assertEqual(pieces, ["alpha\n", "beta\n  gamma\n/delta \nzeta\n\neta\n", "theta"])
+        self.assertEqual(split_at_safe_boundaries("no newline", piece_chars=3), ["no newline"])
+
+    def test_split_pieces_rejoin(self):
+        text = sample_text(random.Random(1), 2000)
+        pieces = split_at_safe_boundaries(text, piece_chars=100)
+        self.assertGreater(len(pieces), 10)
+        self.assertEqual("".join(pieces), text)
+
+    @patch("lib.tokenization.PARALLEL_MIN_CHARS", 0)
+    @patch("lib.tokenization.TOKENIZE_PIECE_CHARS", 64)
+    def test_parallel_count_matches_serial(self):
+        for name in ["r50k_base", "cl100k_base", "o200k_base"]:
+            encoding = offline_encoding(name)
+            for seed in range(5):
+                text = sample_text(random.Random(seed), 500)
+                serial = encoding.encode(text, disallowed_special=())
+                pieces = split_at_safe_boundaries(text, piece_chars=64)
+                self.assertEqual(
+                    [token for piece in pieces for token in encoding.encode(piece, disallowed_special=())],
+                    serial,
+                )
+                self.assertEqual(count_tokens(encoding, text, workers=4), len(serial))
+
+    def test_split_matches_serial_on_random_characters(self):
+        pool = list("ab Z9_'/\n\r\t .,)(}{#é東") + ["  ", "\n\n", "'s", "'ll", "\r\n", "12345"]
+        for name in ["r50k_base", "p50k_base", "cl100k_base", "o200k_base"]:
+            encoding = offline_encoding(name)
+            for seed in range(50):
+                rng = random.Random(seed)
+                text = "".join(rng.choice(pool) for _ in range(400))
+                tokens = [
+                    token
+                    for piece in split_at_safe_boundaries(text, piece_chars=5)
+                    for token in encoding.encode(piece, disallowed_special=())
+                ]
+                self.assertEqual(tokens, encoding.encode(text, disallowed_special=()), (name, seed))
+
+    def test_small_texts_are_encoded_serially(self):
+        encoding = offline_encoding("cl100k_base")
+        with patch.object(encoding, "encode_batch") as encode_batch:
+            self.assertEqual(count_tokens(encoding, "def main():", workers=4), len(encoding.encode("def main():")))
+        encode_batch.assert_not_called()
+
+    @patch.dict("lib.tokenization._model_encoding_names", clear=True)
+    @patch.dict("lib.tokenization._encodings", clear=True)
+    @patch("tiktoken.get_encoding", side_effect=lambda name: f"<{name}>")
+    def test_get_model_encoding_loads_each_encoding_once(self, mock_get_encoding):
+        self.assertEqual(get_model_encoding("openai/gpt-4o"), "<o200k_base>")
+        self.assertEqual(get_model_encoding("gpt-4o-mini"), "<o200k_base>")
+        self.assertEqual(get_model_encoding("openai/gpt-4"), "<cl100k_base>")
+        self.assertEqual(get_model_encoding("openai/gpt-4o"), "<o200k_base>")
+        self.assertEqual([call.args[0] for call in mock_get_encoding.call_args_list], ["o200k_base", "cl100k_base"])
+
+    @patch.dict("lib.tokenization._model_encoding_names", clear=True)
+    @patch.dict("lib.tokenization._encodings", clear=True)
+    @patch("tiktoken.get_encoding", side_effect=lambda name: f"<{name}>")
+    def test_get_model_encoding_falls_back_once_per_model(self, mock_get_encoding):
+        with patch("builtins.print") as mock_print:
+            self.assertEqual(get_model_encoding("anthropic/claude-3-5-sonnet"), "<cl100k_base>")
+            self.assertEqual(get_model_encoding("anthropic/claude-3-5-sonnet"), "<cl100k_base>")
+        self.assertEqual(mock_print.call_count, 1)
+        self.assertEqual(mock_get_encoding.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
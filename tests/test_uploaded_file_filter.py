@@ -1,6 +1,13 @@
 import unittest
 from unittest.mock import patch, mock_open, Mock, MagicMock
+import os
+import tempfile
 from lib.uploaded_file_filter import UploadedFileFilter, DEFAULT_IGNORE_PATTERNS
+from lib.binary_classifier import binary_classifier
+
+
+def fake_stat(size):
+    return os.stat_result((0o100644, 0, 0, 1, 0, 0, size, 0, 0, 0, 0, 0, 0, 0, 0, 0))
 
 class TestUploadedFileFilter(unittest.TestCase):
 
@@ -10,6 +17,11 @@ class TestUploadedFileFilter(unittest.TestCase):
         self.mock_gitignore_content = "node_modules\n*.log\n"
         self.mock_file_patcher = patch('builtins.open', mock_open(read_data=self.mock_gitignore_content))
         self.mock_file = self.mock_file_patcher.start()
+        # Files exist only as stat results here, so binary checks fall through to libmagic
+        sniff_patcher = patch.object(binary_classifier, "_sniff", return_value=None)
+        sniff_patcher.start()
+        self.addCleanup(sniff_patcher.stop)
+        binary_classifier.reset()
 
     def tearDown(self):
         self.mock_file_patcher.stop()
@@ -39,13 +51,13 @@ class TestUploadedFileFilter(unittest.TestCase):
 
     @patch('magic.Magic')
     @patch('os.path.exists', return_value=True)
-    @patch('os.path.getsize')
+    @patch('os.stat')
     @patch('os.path.join', side_effect=lambda *args: '/'.join(args))
-    def test_should_upload(self, mock_join, mock_getsize, mock_exists, mock_magic):
+    def test_should_upload(self, mock_join, mock_stat, mock_exists, mock_magic):
         uff = UploadedFileFilter(self.startpath)
         
         # Set up mocks
-        mock_getsize.return_value = 500  # 500 bytes, less than default max size
+        mock_stat.return_value = fake_stat(500)  # 500 bytes, less than default max size
         mock_magic_instance = MagicMock()
         mock_magic.return_value = mock_magic_instance
         mock_magic_instance.from_file.return_value = 'text/plain'
@@ -65,9 +77,9 @@ class TestUploadedFileFilter(unittest.TestCase):
 
     @patch('magic.Magic')
     @patch('os.path.exists', return_value=True)
-    @patch('os.path.getsize')
+    @patch('os.stat')
     @patch('os.path.join', side_effect=lambda *args: '/'.join(args))
-    def test_should_upload_file_size_limit(self, mock_join, mock_getsize, mock_exists, mock_magic):
+    def test_should_upload_file_size_limit(self, mock_join, mock_stat, mock_exists, mock_magic):
         max_file_size = 1000  # 1000 bytes
         uff = UploadedFileFilter(self.startpath, max_file_size=max_file_size)
         
@@ -77,18 +89,18 @@ class TestUploadedFileFilter(unittest.TestCase):
         mock_magic_instance.from_file.return_value = 'text/plain'
         
         # Test file within size limit
-        mock_getsize.return_value = 500
+        mock_stat.return_value = fake_stat(500)
         self.assertTrue(uff.should_upload("small_file.txt"))
         
         # Test file exceeding size limit
-        mock_getsize.return_value = 1500
+        mock_stat.return_value = fake_stat(1500)
         self.assertFalse(uff.should_upload("large_file.txt"))
 
     @patch('magic.Magic')
     @patch('os.path.exists', return_value=True)
-    @patch('os.path.getsize')
+    @patch('os.stat')
     @patch('os.path.join', side_effect=lambda *args: '/'.join(args))
-    def test_select_files(self, mock_join, mock_getsize, mock_exists, mock_magic):
+    def test_select_files(self, mock_join, mock_stat, mock_exists, mock_magic):
         # Setting up MagicMock to return different MIME types based on the file name
         mime_types = {
             "file1.py": "text/x-python",
@@ -103,7 +115,7 @@ class TestUploadedFileFilter(unittest.TestCase):
         mock_magic.return_value = mock_magic_instance
         mock_magic_instance.from_file.side_effect = lambda file_name, mime=True: mime_types.get(file_name.split('/')[-1], 'application/octet-stream')
 
-        mock_getsize.return_value = 100  # Set a small file size for all files
+        mock_stat.return_value = fake_stat(100)  # Set a small file size for all files
 
         uff = UploadedFileFilter(self.startpath)
         
@@ -127,9 +139,9 @@ class TestUploadedFileFilter(unittest.TestCase):
 
     @patch('magic.Magic')
     @patch('os.path.exists', return_value=True)
-    @patch('os.path.getsize')
+    @patch('os.stat')
     @patch('os.path.join', side_effect=lambda *args: '/'.join(args))
-    def test_select_files_with_additional_patterns(self, mock_join, mock_getsize, mock_exists, mock_magic):
+    def test_select_files_with_additional_patterns(self, mock_join, mock_stat, mock_exists, mock_magic):
         # Setting up MagicMock to return different MIME types based on the file name
         mime_types = {
             "file1.py": "text/x-python",
@@ -144,7 +156,7 @@ class TestUploadedFileFilter(unittest.TestCase):
         mock_magic.return_value = mock_magic_instance
         mock_magic_instance.from_file.side_effect = lambda file_name, mime=True: mime_types.get(file_name.split('/')[-1], 'application/octet-stream')
 
-        mock_getsize.return_value = 100  # Set a small file size for all files
+        mock_stat.return_value = fake_stat(100)  # Set a small file size for all files
 
         uff = UploadedFileFilter(self.startpath, ["*.txt"])
         
@@ -166,11 +178,82 @@ class TestUploadedFileFilter(unittest.TestCase):
         # Excluded by binary check
         self.assertNotIn("image.jpg", selected)
 
+    @patch('os.path.exists', return_value=True)
+    def test_should_descend(self, mock_exists):
+        uff = UploadedFileFilter(self.startpath, ["build/"])
+        self.assertTrue(uff.should_descend("src"))
+        self.assertTrue(uff.should_descend("./src/lib"))
+        # Excluded by default patterns
+        self.assertFalse(uff.should_descend(".git"))
+        self.assertFalse(uff.should_descend("packages/app/node_modules"))
+        # Excluded by .gitignore
+        self.assertFalse(uff.should_descend("node_modules"))
+        # Excluded by additional patterns
+        self.assertFalse(uff.should_descend("./build"))
+
     @patch('os.path.exists', return_value=False)
     def test_init_without_gitignore(self, mock_exists):
         uff = UploadedFileFilter(self.startpath)
         self.assertEqual(set(uff.patterns), set(DEFAULT_IGNORE_PATTERNS))
         self.mock_file.assert_not_called()
 
+class TestNestedGitignore(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.startpath = self.tempdir.name
+        self.write(".gitignore", "*.log\n")
+        self.write("packages/app/.gitignore", "# build output\ndist/\n*.gen.py\n!keep.log\n")
+        self.write("packages/lib/.gitignore", "/local.py\n")
+        binary_classifier.reset()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write(self, path, data="contents\n"):
+        full_path = os.path.join(self.startpath, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(data)
+
+    def test_nested_gitignore_applies_beneath_its_directory(self):
+        uff = UploadedFileFilter(self.startpath)
+        for path in ["packages/app/src/main.py", "packages/app/src/api.gen.py", "packages/lib/local.py",
+                     "packages/lib/sub/local.py", "packages/app/keep.log", "packages/lib/debug.log",
+                     "other/api.gen.py"]:
+            self.write(path)
+
+        self.assertTrue(uff.should_upload("packages/app/src/main.py"))
+        self.assertFalse(uff.should_upload("packages/app/src/api.gen.py"))
+        self.assertTrue(uff.should_upload("other/api.gen.py"))
+        # Anchored patterns are relative to their own .gitignore
+        self.assertFalse(uff.should_upload("packages/lib/local.py"))
+        self.assertTrue(uff.should_upload("packages/lib/sub/local.py"))
+        # Deeper .gitignore files take precedence over the root one
+        self.assertTrue(uff.should_upload("packages/app/keep.log"))
+        self.assertFalse(uff.should_upload("packages/lib/debug.log"))
+
+    def test_nested_gitignore_prunes_directories(self):
+        uff = UploadedFileFilter(self.startpath)
+        self.assertFalse(uff.should_descend("packages/app/dist"))
+        self.assertTrue(uff.should_descend("packages/lib/dist"))
+        self.assertTrue(uff.should_descend("packages/app/src"))
+
+    def test_nested_gitignore_is_read_once(self):
+        uff = UploadedFileFilter(self.startpath)
+        with patch("builtins.open", wraps=open) as mock_file:
+            uff.should_descend("packages/app/dist")
+            uff.should_descend("packages/app/build")
+        opened = [call.args[0] for call in mock_file.call_args_list]
+        self.assertEqual(opened.count(os.path.join(self.startpath, "packages", "app", ".gitignore")), 1)
+
+    def test_nested_gitignore_cannot_reinclude_excluded_files(self):
+        self.write("sub/.gitignore", "!.env\n!secret.txt\n")
+        self.write("sub/.env")
+        self.write("sub/secret.txt")
+        uff = UploadedFileFilter(self.startpath, additional_patterns=["secret.txt"])
+        self.assertFalse(uff.should_upload("sub/.env"))
+        self.assertFalse(uff.should_upload("sub/secret.txt"))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,122 @@
+import unittest
+from lib.code_chunker import Chunk
+from lib.file_io import FileRecord
+from lib.vector_index import VectorIndex, get_vector_index
+import os
+import tempfile
+
+
+def split_chunks(path, text):
+    return [Chunk(part, line, line) for line, part in enumerate(text.split("|"), 1)]
+
+
+def fake_embed(texts):
+    # Two-dimensional vectors pointing at "a" or "b" depending on the text
+    return [[text.count("a"), text.count("b")] for text in texts]
+
+
+class TestVectorIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.startpath = self.tempdir.name
+        self.cache_dir = os.path.join(self.startpath, ".arcode.embeddings")
+        self.embedded = []
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return fake_embed(texts)
+
+    def records(self, contents):
+        records = []
+        for path, data in contents.items():
+            with open(os.path.join(self.startpath, path), "w") as f:
+                f.write(data)
+            records.append(FileRecord(self.startpath, path))
+        return records
+
+    def update(self, contents):
+        index = get_vector_index(self.cache_dir, "openai/text-embedding-3-small")
+        changed = index.update(self.records(contents), split=split_chunks, embed=self.embed)
+        return index, changed
+
+    def test_search_orders_chunks_by_cosine_similarity(self):
+        index, changed = self.update({"a.py": "aaa|ab", "b.py": "bbb"})
+        self.assertTrue(changed)
+        results = index.search([1, 0], k=2)
+        self.assertEqual([(path, lines) for path, _, lines in results], [("a.py", (1, 1)), ("a.py", (2, 2))])
+        self.assertAlmostEqual(results[0][1], 1.0)
+        self.assertEqual(index.search([0, 1], k=1)[0][0], "b.py")
+
+    def test_unchanged_files_are_not_embedded_again(self):
+        self.update({"a.py": "aaa|ab", "b.py": "bbb"})
+        self.embedded = []
+
+        index, changed = self.update({"a.py": "aaa|ab", "b.py": "bbb"})
+
+        self.assertFalse(changed)
+        self.assertEqual(self.embedded, [])
+        self.assertEqual(index.vectors.shape, (3, 2))
+
+    def test_only_changed_files_are_embedded(self):
+        self.update({"a.py": "aaa|ab", "b.py": "bbb", "c.py": "ccc"})
+        self.embedded = []
+
+        index, changed = self.update({"a.py": "aaa|ab", "b.py": "b|bb"})
+
+        self.assertTrue(changed)
+        self.assertEqual(self.embedded, ["b", "bb"])
+        self.assertEqual(sorted(index.files), ["a.py", "b.py"])
+        # The chunks of b.py's old contents and of the deleted c.py are dropped
+        self.assertEqual(index.vectors.shape, (4, 2))
+        reloaded = get_vector_index(self.cache_dir, "openai/text-embedding-3-small")
+        self.assertEqual(reloaded.search([0, 1], k=1)[0][0], "b.py")
+
+    def test_identical_chunks_are_embedded_once(self):
+        index, _ = self.update({"a.py": "license|aaa", "b.py": "license|bbb", "c.py": "license"})
+
+        self.assertEqual(self.embedded, ["license", "aaa", "bbb"])
+        self.assertEqual(index.vectors.shape, (3, 2))
+        # A shared chunk is returned for every file containing it
+        index, _ = self.update({"a.py": "abc|aaa", "b.py": "abc|bbb", "c.py": "abc"})
+        results = index.search([1, 1], k=3)
+        self.assertEqual(sorted(path for path, _, _ in results), ["a.py", "b.py", "c.py"])
+        self.assertEqual(index.keys.count(index.keys[0]), 1)
+        self.assertEqual(index.vectors.shape, (3, 2))
+
+    def test_search_above_threshold_uses_persisted_ann_index(self):
+        index, _ = self.update({"a.py": "aaa|ab", "b.py": "bbb|abb"})
+        results = index.search([1, 0], k=2, ann_threshold=4, ann_probes=1)
+
+        self.assertIsNotNone(index.ann)
+        self.assertEqual(results, index.search([1, 0], k=2, ann_threshold=None))
+        self.assertTrue(os.path.exists(os.path.join(index.directory, "ivf.npz")))
+
+        # The lists are kept as files change, assigning new chunks to their nearest centroid
+        index, _ = self.update({"a.py": "aaa|ab", "b.py": "bbb|abb|ba"})
+        self.assertIsNotNone(index.ann)
+        self.assertEqual(len(index.ann.assignments), 5)
+        self.assertEqual(index.search([0, 1], k=1, ann_threshold=4)[0][0], "b.py")
+
+    def test_search_below_threshold_does_not_build_ann_index(self):
+        index, _ = self.update({"a.py": "aaa|ab", "b.py": "bbb"})
+        index.search([1, 0], k=2, ann_threshold=4)
+        self.assertIsNone(index.ann)
+        self.assertFalse(os.path.exists(os.path.join(index.directory, "ivf.npz")))
+
+    def test_corrupt_index_loads_empty(self):
+        index, _ = self.update({"a.py": "aaa"})
+        with open(os.path.join(index.directory, "vectors.npy"), "wb") as f:
+            f.write(b"not a matrix")
+
+        reloaded = VectorIndex(index.directory)
+        reloaded.load()
+        self.assertEqual(reloaded.files, {})
+        self.assertEqual(reloaded.search([1, 0], k=1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from lib.vector_search import normalize_rows, top_k
+import numpy as np
+
+
+class TestVectorSearch(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.raw = rng.normal(size=(500, 16)).astype(np.float32)
+        self.vectors = normalize_rows(self.raw)
+        self.query = rng.normal(size=16)
+
+    def expected(self, k):
+        scores = (self.raw @ self.query) / (np.linalg.norm(self.raw, axis=1) * np.linalg.norm(self.query))
+        rows = np.argsort(-scores, kind="stable")[:k]
+        return rows, scores[rows]
+
+    def test_normalize_rows(self):
+        normalized = normalize_rows([[3, 4], [0, 0]])
+        np.testing.assert_allclose(normalized, [[0.6, 0.8], [0, 0]])
+        self.assertEqual(normalized.dtype, np.float32)
+
+    def test_top_k_matches_full_sort(self):
+        for k in [1, 10, 500, 1000]:
+            rows, scores = top_k(self.vectors, self.query, k)
+            expected_rows, expected_scores = self.expected(k)
+            np.testing.assert_array_equal(rows, expected_rows)
+            np.testing.assert_allclose(scores, expected_scores, atol=1e-6)
+
+    def test_top_k_skips_scores_below_threshold(self):
+        rows, scores = top_k(self.vectors, self.query, 500, min_score=0.3)
+        expected_rows, expected_scores = self.expected(500)
+        np.testing.assert_array_equal(rows, expected_rows[expected_scores >= 0.3])
+        self.assertTrue(all(score >= 0.3 for score in scores))
+
+    def test_top_k_on_empty_matrix(self):
+        rows, scores = top_k(np.zeros((0, 0), dtype=np.float32), self.query, 5)
+        self.assertEqual(len(rows), 0)
+        self.assertEqual(len(scores), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()